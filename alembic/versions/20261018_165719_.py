@@ -0,0 +1,44 @@
+"""add wall_time and queue_time to etl_job_results
+
+Revision ID: 20261018_165719
+Revises: 20261018_093000
+Create Date: 2026-10-18 16:57:19.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_165719"
+down_revision = "20261018_093000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "etl_job_results",
+        sa.Column(
+            "wall_time",
+            sa.Float(),
+            server_default="0",
+            nullable=False,
+            comment="ジョブの開始からコミットまでの秒数",
+        ),
+    )
+    op.add_column(
+        "etl_job_results",
+        sa.Column(
+            "queue_time",
+            sa.Float(),
+            server_default="0",
+            nullable=False,
+            comment="ジョブの実行要求から開始までの秒数",
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("etl_job_results", "queue_time")
+    op.drop_column("etl_job_results", "wall_time")
@@ -0,0 +1,60 @@
+"""
+インメモリのバックテストのベンチマーク。
+ランダムウォークで生成した日足（デフォルトは10年分）に指標を付与し、t_crossでバックテストした処理時間を計測する。
+
+python -m benchmarks.backtest [days] [repeat]
+python -m benchmarks.backtest 3650 100
+"""
+import datetime
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from magnet.domain.datastore import indicators
+from magnet.domain.trade import analyzers  # noqa: F401 アナライザを登録する
+from magnet.domain.trade import backtest
+
+
+def make_frame(days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    close = 1000000 * np.exp(np.cumsum(rng.normal(0, 0.03, days)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    start = datetime.date(2010, 1, 1)
+    frame = pd.DataFrame(
+        dict(
+            close_time=[start + datetime.timedelta(days=i) for i in range(days)],
+            open_price=open_,
+            high_price=np.maximum(open_, close) * 1.01,
+            low_price=np.minimum(open_, close) * 0.99,
+            close_price=close,
+        )
+    )
+    return indicators.compute_indicators(frame)
+
+
+def main(days: int, repeat: int):
+    frame = make_frame(days)
+    profile = SimpleNamespace(
+        analyzers=["t_cross"],
+        margin=1000000,
+        ask_limit_rate=1.2,
+        ask_stop_rate=0.95,
+        bid_limit_rate=0.85,
+        bid_stop_rate=1.05,
+    )
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = backtest.run_backtest(profile, frame)
+    sec = (time.perf_counter() - start) / repeat
+
+    print(f"{days} days: {sec * 1000:8.3f}ms per backtest {result.summary()}")
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 3650
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    main(days, repeat)
@@ -0,0 +1,75 @@
+"""
+CryptoOhlcの一括登録のベンチマーク。
+ORMオブジェクトを１件ずつセッションに追加する方法と、RepositoryBase.bulk_insertの処理時間を比較する。
+登録したデータはロールバックされる。
+
+python -m benchmarks.bulk_insert [connection_string] [size]
+python -m benchmarks.bulk_insert postgresql://postgres:password@db/sample_db 100000
+"""
+import datetime
+import sys
+import time
+from typing import Any, Dict, Iterator
+
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+
+from magnet.domain.datastore.models import CryptoOhlc
+
+
+def make_rows(provider: str, size: int) -> Iterator[Dict[str, Any]]:
+    start = datetime.date(1, 1, 1)
+    for i in range(size):
+        price = 5000000.0 + i
+        yield dict(
+            provider=provider,
+            market="bitflyer",
+            product="btcjpy",
+            periods=60 * 60 * 24,
+            open_time=start + datetime.timedelta(days=i),
+            close_time=start + datetime.timedelta(days=i + 1),
+            open_price=price,
+            high_price=price + 100,
+            low_price=price - 100,
+            close_price=price + 50,
+            volume=1.0,
+            quote_volume=1.0,
+        )
+
+
+def run_add(db, size: int) -> int:
+    for row in make_rows("benchmark_add", size):
+        db.add(CryptoOhlc(**row))
+    db.flush()
+    return size
+
+
+def run_bulk_insert(db, size: int) -> int:
+    result = CryptoOhlc.as_rep().bulk_insert(db, rows=make_rows("benchmark_bulk", size))
+    if result.errors:
+        raise Exception(result.errors)
+    return result.inserted
+
+
+def main(connection_string: str, size: int):
+    engine = sa.create_engine(connection_string, future=True)
+    CryptoOhlc.__table__.create(engine, checkfirst=True)
+    session_maker = sessionmaker(bind=engine, future=True)
+
+    for func in [run_add, run_bulk_insert]:
+        db = session_maker()
+        try:
+            start = time.perf_counter()
+            inserted = func(db, size)
+            sec = time.perf_counter() - start
+        finally:
+            db.rollback()
+            db.close()
+
+        print(f"{func.__name__:>16}: {inserted} rows {sec:8.3f}s")
+
+
+if __name__ == "__main__":
+    connection_string = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    main(connection_string, size)
@@ -0,0 +1,86 @@
+"""
+取引所APIのHTTPクライアントのベンチマーク。
+ローカルのスタブサーバに対して、リクエスト毎にhttpx.AsyncClientを生成する方法と、
+trade_api.clientsの共有クライアント（keep-alive）を利用する方法のレイテンシを比較する。
+
+python -m benchmarks.http_clients [requests] [delay_ms]
+python -m benchmarks.http_clients 1000 0
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from trade_api import clients
+
+BODY = b'{"product_code": "BTC_JPY", "ltp": 5000000.0}'
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay):
+    """keep-aliveに対応した最小限のHTTP/1.1サーバ"""
+    try:
+        while await reader.readuntil(b"\r\n\r\n"):
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(BODY), BODY)
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def request_new_client(url: str):
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url)
+    response.raise_for_status()
+
+
+async def request_shared_client(url: str):
+    response = await clients.get_client(url).get(url)
+    response.raise_for_status()
+
+
+async def measure(func, url: str, size: int):
+    latencies = []
+    for _ in range(size):
+        start = time.perf_counter()
+        await func(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{func.__name__:>22}: {size} requests "
+        f"mean {statistics.mean(latencies):7.3f}ms "
+        f"p50 {statistics.median(latencies):7.3f}ms "
+        f"p99 {p99:7.3f}ms"
+    )
+
+
+async def main(size: int, delay: float):
+    server = await asyncio.start_server(
+        lambda r, w: handle(r, w, delay), host="127.0.0.1", port=0
+    )
+    host, port = server.sockets[0].getsockname()[:2]
+    url = f"http://{host}:{port}/v1/ticker"
+
+    try:
+        for func in [request_new_client, request_shared_client]:
+            await measure(func, url, size)
+    finally:
+        await clients.shutdown()
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0
+    asyncio.run(main(size, delay))
@@ -0,0 +1,85 @@
+"""
+OHLCのインジケータ計算のベンチマーク。
+従来のOhlcクラスメソッド（行毎の計算）と、indicatorsモジュール（列単位の一括計算）の処理時間を比較し、結果が同一であることを検証する。
+
+python -m benchmarks.indicators 100000 1000000
+"""
+import datetime
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from magnet.domain.datastore import indicators
+from magnet.domain.datastore.schemas import Ohlc
+
+PARTITION = dict(provider="cryptowatch", market="bitflyer", product="btcjpy")
+
+
+def make_candles(size: int, seed: int = 0) -> pd.DataFrame:
+    """ランダムウォークによる疑似的な日足を生成する。"""
+    rng = np.random.default_rng(seed)
+    close = np.round(5000000 + np.cumsum(rng.normal(0, 30000, size)), 0)
+    close = np.maximum(close, 1)
+    open_ = np.concatenate(([close[0] - 1], close[:-1]))
+    spread = np.abs(rng.normal(0, 10000, size))
+    start = datetime.date(1, 1, 1)
+    close_time = [start + datetime.timedelta(days=i + 1) for i in range(size)]
+
+    return pd.DataFrame(
+        dict(
+            periods=60 * 60 * 24,
+            open_time=[x - datetime.timedelta(days=1) for x in close_time],
+            close_time=close_time,
+            open_price=open_,
+            high_price=np.maximum(open_, close) + spread,
+            low_price=np.minimum(open_, close) - spread,
+            close_price=close,
+            volume=rng.uniform(0, 100, size),
+            quote_volume=rng.uniform(0, 100, size),
+        )
+    )
+
+
+def run_legacy(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    arr = [Ohlc(**PARTITION, **x) for x in df.to_dict("records")]
+    it = Ohlc.compute_sma_and_cross(arr)
+    it = Ohlc.compute_wb_cs(it)
+    it = Ohlc.compute_rsi(it)
+    return [x.dict(exclude={"id"} | set(PARTITION)) for x in it]
+
+
+def run_vectorized(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return indicators.to_records(indicators.compute_indicators(df))
+
+
+def normalize(records: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Decimal("NaN")同士は等価とならないため、文字列表現で比較する。"""
+    return [{k: str(v) for k, v in x.items()} for x in records]
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes: List[int]):
+    for size in sizes:
+        df = make_candles(size)
+        legacy, legacy_sec = measure(run_legacy, df)
+        vectorized, vectorized_sec = measure(run_vectorized, df)
+
+        if normalize(legacy) != normalize(vectorized):
+            raise AssertionError(f"{size}: results are not identical.")
+
+        print(
+            f"{size:>8} candles  legacy: {legacy_sec:8.3f}s  "
+            f"vectorized: {vectorized_sec:8.3f}s  x{legacy_sec / vectorized_sec:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [10**5, 10**6])
@@ -0,0 +1,79 @@
+"""
+融合したLinqのパイプラインと、ステージ毎にジェネレータを連結したパイプラインのスループットを比較する。
+
+python -m benchmarks.linq_fusion [size]
+python -m benchmarks.linq_fusion 1000000
+"""
+import sys
+import time
+from typing import Callable, Iterable, Tuple
+
+from framework import Linq
+
+
+def unfused(iterable: Iterable[int]) -> Iterable[int]:
+    """融合前の実装と同じく、ステージ毎にジェネレータを連結する。"""
+
+    def map_(iterable, func):
+        yield from map(func, iterable)
+
+    def filter_(iterable, func):
+        for item in iterable:
+            if func(item):
+                yield item
+
+    def step_(iterable, step):
+        count = step
+        for item in iterable:
+            if count % step == 0:
+                yield item
+            count += 1
+
+    source = map_(iterable, lambda x: x + 1)
+    source = filter_(source, lambda x: x % 3 != 0)
+    source = map_(source, lambda x: x * 2)
+    source = step_(source, 2)
+    source = filter_(source, lambda x: x > 10)
+    return map_(source, lambda x: x - 1)
+
+
+def fused(iterable: Iterable[int]) -> Iterable[int]:
+    return (
+        Linq(iterable)
+        .map(lambda x: x + 1)
+        .filter(lambda x: x % 3 != 0)
+        .map(lambda x: x * 2)
+        .step(2)
+        .filter(lambda x: x > 10)
+        .map(lambda x: x - 1)
+    )
+
+
+def measure(
+    func: Callable[[Iterable[int]], Iterable[int]], size: int
+) -> Tuple[float, int]:
+    start = time.perf_counter()
+    result = sum(func(range(size)))
+    return time.perf_counter() - start, result
+
+
+def main(size: int):
+    unfused_sec, unfused_result = measure(unfused, size)
+    fused_sec, fused_result = measure(fused, size)
+    assert fused_result == unfused_result
+    print(
+        f"{size} elements: unfused {size / unfused_sec:,.0f}/s"
+        f" fused {size / fused_sec:,.0f}/s x{unfused_sec / fused_sec:.2f}"
+    )
+
+    template = fused(Linq.dummy())
+    count = max(size // 1000, 1)
+    start = time.perf_counter()
+    for _ in range(1000):
+        sum(template(range(count)))
+    sec = time.perf_counter() - start
+    print(f"template: 1000 runs of {count} elements {sec:.3f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10**6)
@@ -0,0 +1,45 @@
+"""
+Linq.map_parallelのベンチマーク。
+CPUを消費する変換を、逐次（map）とプロセスプール（map_parallel）で実行した処理時間を比較する。
+
+python -m benchmarks.linq_parallel [count] [workers]
+python -m benchmarks.linq_parallel 2000 4
+"""
+import os
+import sys
+import time
+
+from framework import Linq
+
+
+def cpu_bound(x: int) -> int:
+    total = 0
+    for i in range(20000):
+        total += (x * i) % 7
+    return total
+
+
+def measure(query) -> float:
+    start = time.perf_counter()
+    query.to_list()
+    return time.perf_counter() - start
+
+
+def main(count: int, workers: int):
+    source = range(count)
+    base = measure(Linq(source).map(cpu_bound))
+    print(f"map: {base:.3f}s")
+
+    for n in sorted({1, 2, workers}):
+        sec = measure(
+            Linq(source).map_parallel(
+                cpu_bound, executor="process", max_workers=n, chunksize=16
+            )
+        )
+        print(f"map_parallel(process, {n}): {sec:.3f}s x{base / sec:.2f}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    main(count, workers)
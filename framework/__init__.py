@@ -4,6 +4,6 @@ from typing import Any
 from framework.analyzers import AnyAnalyzer
 
 from .types import DateTimeAware
-from .utils.linq import Linq, MiniDB
+from .utils.linq import Linq, LinqAsync, MiniDB
 from .utils.udict import MappingDict as MappingDict
 from .utils.udict import UndefinedDict as udict
@@ -0,0 +1,238 @@
+"""
+要素（辞書・pydanticモデル・属性を持つオブジェクト・スカラー）を、列毎の型付き配列に１回の走査で変換する。
+要素数が分かる場合はその長さで、分からない場合は倍々に拡張しながら配列を確保する。
+要素はblock_size件毎に列へ転置し、スライス単位で配列に書き込む。
+"""
+import itertools
+import operator
+from dataclasses import fields as dataclass_fields
+from dataclasses import is_dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from pydantic import BaseModel
+
+DEFAULT_CAPACITY = 1024
+DEFAULT_BLOCK_SIZE = 4096
+
+# pydanticのフィールドの型とnumpyのdtypeの対応。対応しない型はobjectとする
+FIELD_DTYPES = {bool: "bool", int: "int64", float: "float64"}
+DOWNCAST_DTYPES = {"float64": "float32", "int64": "int32"}
+
+Fields = Union[None, Sequence[str], type]
+
+
+def resolve_fields(fields: Fields, first: Any) -> Optional[Dict[str, Optional[str]]]:
+    """
+    列名とdtype（Noneの場合は値から推論する）を返す。要素がスカラーの場合はNoneを返す。
+    fieldsにpydanticモデルを渡した場合は、フィールドの型からdtypeを決定する。
+    """
+    if isinstance(fields, type) and issubclass(fields, BaseModel):
+        return {
+            name: FIELD_DTYPES.get(field.outer_type_, "object")
+            for name, field in fields.__fields__.items()
+        }
+
+    if fields is not None:
+        return {name: None for name in fields}
+
+    if isinstance(first, BaseModel):
+        return resolve_fields(first.__class__, first)
+    elif isinstance(first, dict):
+        return {name: None for name in first}
+    elif isinstance(first, tuple) and hasattr(first, "_fields"):
+        return {name: None for name in first._fields}
+    elif is_dataclass(first):
+        return {x.name: None for x in dataclass_fields(first)}
+
+    return None
+
+
+def create_getter(names: List[str], first: Any) -> Callable[[Any], tuple]:
+    """要素から列の値のタプルを取り出す関数を返す。"""
+    if isinstance(first, dict):
+        getter = operator.itemgetter(*names)
+    else:
+        getter = operator.attrgetter(*names)
+
+    if len(names) == 1:
+        return lambda x: (getter(x),)
+    return getter
+
+
+def normalize_dtype(dtype: np.dtype) -> str:
+    """bool/整数/浮動小数点数はそれぞれbool/int64/float64に揃え、それ以外はobjectとする。"""
+    if dtype.kind == "b":
+        return "bool"
+    elif dtype.kind in "iu":
+        return "int64"
+    elif dtype.kind == "f":
+        return "float64"
+    return "object"
+
+
+def is_nullable_float(values: Sequence[Any]) -> bool:
+    """Noneと数値のみで、浮動小数点数を含む場合はTrueを返す。"""
+    has_float = False
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, (float, np.floating)):
+            has_float = True
+        elif isinstance(value, bool) or not isinstance(value, (int, np.integer)):
+            return False
+    return has_float
+
+
+class ColumnBuffer:
+    """
+    型付きの配列に値を書き込む。dtypeを指定しない場合は、最初に書き込む値から推論する。
+    値がdtypeに収まらない場合は、bool→int64→float64→objectの順に拡張する。Noneを含む整数列は、整数を保持するためobjectとする。
+    浮動小数点数の列では、Noneはnanとなる。
+    """
+
+    def __init__(self, dtype: Optional[str], capacity: int):
+        self.capacity = capacity
+        self.only_none = True  # これまでに書き込んだ値がNoneのみか
+        self.array: Optional[np.ndarray] = None
+        if dtype is not None:
+            self.array = np.empty(capacity, dtype=dtype)
+
+    def write(self, start: int, values: Sequence[Any]):
+        end = start + len(values)
+        if self.array is None:
+            dtype = self.convert(values)[0]
+            self.array = np.empty(max(self.capacity, end), dtype=dtype)
+        elif end > len(self.array):
+            self.resize(max(end, len(self.array) * 2))
+
+        if self.array.dtype.kind == "O":
+            if self.only_none:
+                self.only_none = all(x is None for x in values)
+                if not self.only_none and is_nullable_float(values):
+                    # Noneのみの列に浮動小数点数が現れた場合は、Noneをnanとしてfloat64に切り替える
+                    self.array = np.full(len(self.array), np.nan)
+                    self.array[start:end] = np.asarray(values, dtype="float64")
+                    return
+            self.write_objects(start, values)
+            return
+
+        self.only_none = False
+
+        dtype, converted = self.convert(values, self.array.dtype)
+        if dtype != self.array.dtype:
+            self.upgrade(start, dtype)
+        if converted is None:
+            self.write_objects(start, values)
+        else:
+            self.array[start:end] = converted
+
+    def convert(self, values: Sequence[Any], dtype: np.dtype = None):
+        """値を変換した配列と、その配列を保持できるdtypeを返す。"""
+        try:
+            if dtype is not None and dtype.kind == "f":
+                # Noneやnumpyの数値型を含む場合も、nanやfloatに変換する
+                return dtype, np.asarray(values, dtype=dtype)
+            converted = np.asarray(values)
+        except (TypeError, ValueError):
+            return np.dtype("object"), None
+
+        if converted.dtype.kind == "O" and is_nullable_float(values):
+            converted = np.asarray(values, dtype="float64")
+
+        if converted.ndim != 1 or converted.dtype.kind not in "biuf":
+            return np.dtype("object"), None
+
+        converted_dtype = np.dtype(normalize_dtype(converted.dtype))
+        if dtype is None or np.can_cast(converted_dtype, dtype, "safe"):
+            return dtype or converted_dtype, converted
+        return np.promote_types(dtype, converted_dtype), converted
+
+    def write_objects(self, start: int, values: Sequence[Any]):
+        array = self.array
+        for index, value in enumerate(values, start):
+            array[index] = value  # type: ignore
+
+    def upgrade(self, start: int, dtype: np.dtype):
+        array = np.empty(len(self.array), dtype=dtype)  # type: ignore
+        array[:start] = self.array[:start]  # type: ignore
+        self.array = array
+
+    def resize(self, capacity: int):
+        array = np.empty(capacity, dtype=self.array.dtype)  # type: ignore
+        array[: len(self.array)] = self.array  # type: ignore
+        self.array = array
+
+    def result(self, size: int, downcast: bool = False) -> np.ndarray:
+        if self.array is None:
+            return np.empty(0, dtype="object")
+
+        array = self.array[:size]
+        if downcast:
+            array = downcast_array(array)
+        return array
+
+
+def downcast_array(array: np.ndarray) -> np.ndarray:
+    """float64をfloat32に、int64を値が収まる場合にint32に変換する。"""
+    dtype = DOWNCAST_DTYPES.get(array.dtype.name)
+    if dtype is None:
+        return array
+
+    if dtype == "int32" and len(array):
+        info = np.iinfo(dtype)
+        if array.min() < info.min or array.max() > info.max:
+            return array
+
+    return array.astype(dtype)
+
+
+def to_columns(
+    iterable: Iterable[Any],
+    fields: Fields = None,
+    dtypes: Dict[str, str] = None,
+    downcast: bool = False,
+    size: int = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Dict[str, np.ndarray]:
+    """
+    要素を列名毎の配列に変換する。要素がスカラーの場合は、列名を空文字とする。
+    dtypesで列毎のdtypeを指定でき、指定しない列はfields（pydanticモデル）または値から推論する。
+    """
+    it = iter(iterable)
+    first = next(it, _empty)
+    if first is _empty:
+        columns = resolve_fields(fields, None) or {"": None}
+        columns.update(dtypes or {})
+        return {name: np.empty(0, dtype=x or "object") for name, x in columns.items()}
+
+    columns = resolve_fields(fields, first)
+    scalar = columns is None
+    if columns is None:
+        columns = {"": None}
+    columns.update(dtypes or {})
+
+    names = list(columns)
+    buffers = [ColumnBuffer(columns[x], size or DEFAULT_CAPACITY) for x in names]
+    getter = None if scalar else create_getter(names, first)
+
+    count = 0
+    block: List[Any] = [first]
+    while True:
+        block.extend(itertools.islice(it, block_size - len(block)))
+        if not block:
+            break
+
+        if getter is None:
+            buffers[0].write(count, block)
+        else:
+            for buffer, values in zip(buffers, zip(*map(getter, block))):
+                buffer.write(count, values)
+
+        count += len(block)
+        block.clear()
+
+    return {name: x.result(count, downcast) for name, x in zip(names, buffers)}
+
+
+_empty = object()
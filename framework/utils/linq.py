@@ -1,16 +1,27 @@
 from __future__ import annotations
 
+import array
 import asyncio
+import collections
+import concurrent.futures
 import functools
+import heapq
 import inspect
 import itertools
 import operator
+import os
+import time
 from typing import (
     Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
     Callable,
     Coroutine,
+    Dict,
     Generator,
     Generic,
+    Hashable,
     Iterable,
     Iterator,
     List,
@@ -18,16 +29,21 @@ from typing import (
     NoReturn,
     Optional,
     Protocol,
+    Sequence,
     Tuple,
     Type,
     TypeVar,
+    Union,
     cast,
 )
 
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel, parse_obj_as
 from pydantic.tools import NameFactory
 
+from . import columnar, sources, spill, stats
+
 
 class Undefined:
     pass
@@ -49,6 +65,245 @@ class GeneratorFunctionWrapper:
         return self.func()
 
 
+GROUP_AGGREGATORS = ("count", "sum", "min", "max", "mean")
+
+
+def _initial_state(kind: str):
+    if kind in ("count", "sum"):
+        return 0
+    elif kind == "mean":
+        return [0, 0]  # 合計, 件数
+    else:
+        return undefined
+
+
+def _map_chunk(func, chunk):
+    return [func(x) for x in chunk]
+
+
+def _filter_chunk(func, chunk):
+    return [x for x in chunk if func(x)]
+
+
+def _create_executor(executor, max_workers):
+    if executor == "thread":
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    elif executor == "process":
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        raise ValueError(f"executor must be 'thread' or 'process': {executor}")
+
+
+def _parallel(
+    iterable,
+    apply_chunk,
+    func,
+    executor: Union[str, concurrent.futures.Executor],
+    max_workers: Optional[int],
+    chunksize: int,
+    ordered: bool,
+    prefetch: int,
+):
+    """
+    要素をchunksize毎にまとめてexecutorへ送出し、処理済みのチャンクを展開して返す。
+    処理中のチャンク数はmax_workers * prefetchまでに制限するため、無限イテレータも遅延評価できる。
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be greater than 0.")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if isinstance(executor, concurrent.futures.Executor):
+        pool, owned = executor, False
+    else:
+        pool, owned = _create_executor(executor, max_workers), True
+
+    max_pending = max(max_workers * prefetch, 1)
+    it = iter(iterable)
+    pending: collections.deque = collections.deque()
+
+    def submit() -> bool:
+        chunk = list(itertools.islice(it, chunksize))
+        if not chunk:
+            return False
+        pending.append(pool.submit(apply_chunk, func, chunk))
+        return True
+
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                exhausted = not submit()
+
+            if not pending:
+                break
+
+            if ordered:
+                yield from pending.popleft().result()
+            else:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    pending.remove(future)
+                for future in done:
+                    yield from future.result()
+    finally:
+        # 途中で打ち切られた場合（takeなど）は、未着手のチャンクを破棄する
+        for future in pending:
+            future.cancel()
+        if owned:
+            pool.shutdown(wait=True)
+
+
+def _chunks(
+    iterable,
+    size: Optional[int] = None,
+    seconds: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    sizeof: Callable[[Any], int] = len,
+    reuse: bool = False,
+    clock: Callable[[], float] = time.monotonic,
+):
+    """
+    要素をリストにまとめて返す。size件・seconds秒・max_bytesバイトのいずれかに達した時点でリストを返す。
+    reuse=Trueの場合は同じリストを使い回すため、受け取ったリストは次の要素を取得する前に消費する必要がある。
+    """
+    it = iter(iterable)
+
+    if seconds is None and max_bytes is None:
+        if reuse:
+            buffer: List[Any] = []
+            while True:
+                buffer.extend(itertools.islice(it, size))
+                if not buffer:
+                    break
+                yield buffer
+                buffer.clear()
+        else:
+            while chunk := list(itertools.islice(it, size)):
+                yield chunk
+        return
+
+    buffer = []
+    nbytes = 0
+    started = 0.0
+
+    for item in it:
+        if max_bytes is not None:
+            item_bytes = sizeof(item)
+            if buffer and nbytes + item_bytes > max_bytes:
+                yield buffer
+                if reuse:
+                    buffer.clear()
+                else:
+                    buffer = []
+                nbytes = 0
+            nbytes += item_bytes
+
+        if not buffer:
+            started = clock()
+        buffer.append(item)
+
+        if (size is not None and len(buffer) >= size) or (
+            seconds is not None and clock() - started >= seconds
+        ):
+            yield buffer
+            if reuse:
+                buffer.clear()
+            else:
+                buffer = []
+            nbytes = 0
+
+    if buffer:
+        yield buffer
+
+
+# 融合したステージを１つのループとして実行する関数の生成器。ステージの種類の並びをキーとする。
+_fused_factories: dict = {}
+
+
+def _compile_stages(stages: List[Tuple[str, Any]]) -> Callable[[Iterable], Iterator]:
+    """
+    連続するmap/filter/take_while/stepのステージを、１つのループに融合したジェネレータ関数を返す。
+    ステージ毎のジェネレータを経由しないため、要素毎のジェネレータの再開が１回で済む。
+    """
+    signature = tuple(
+        (kind, len(arg)) if kind == "filter" else (kind, 0) for kind, arg in stages
+    )
+    factory = _fused_factories.get(signature)
+    if factory is None:
+        factory = _fused_factories[signature] = _create_fused_factory(signature)
+
+    args: List[Any] = []
+    for kind, arg in stages:
+        if kind == "filter":
+            args.extend(arg)
+        else:
+            args.append(arg)
+
+    return factory(*args)
+
+
+def _create_fused_factory(signature: Tuple[Tuple[str, int], ...]) -> Callable:
+    params: List[str] = []
+    init: List[str] = []
+    body: List[str] = []
+
+    for index, (kind, arity) in enumerate(signature):
+        if kind == "map":
+            params.append(f"f{index}")
+            body.append(f"x = f{index}(x)")
+        elif kind == "filter":
+            for i in range(arity):
+                params.append(f"f{index}_{i}")
+                body.append(f"if not f{index}_{i}(x): continue")
+        elif kind == "take_while":
+            params.append(f"f{index}")
+            body.append(f"if not f{index}(x): return")
+        elif kind == "step":
+            params.append(f"n{index}")
+            init.append(f"c{index} = 0")
+            body.append(f"i{index} = c{index}")
+            body.append(f"c{index} += 1")
+            body.append(f"if i{index} % n{index}: continue")
+        else:
+            raise ValueError(f"Unknown stage: {kind}")
+
+    lines = [f"def factory({', '.join(params)}):"]
+    lines.append("    def fused(iterable):")
+    lines.extend(f"        {x}" for x in init)
+    lines.append("        for x in iterable:")
+    lines.extend(f"            {x}" for x in body)
+    lines.append("            yield x")
+    lines.append("    return fused")
+
+    namespace: dict = {}
+    exec("\n".join(lines), namespace)
+    return namespace["factory"]
+
+
+def _sized_len(iterable) -> Optional[int]:
+    """要素数が分かるイテレータ（リストなど）の場合は、その要素数を返す。"""
+    if isinstance(iterable, LinqRoot):
+        iterable = iterable.__root__
+    if hasattr(iterable, "__len__"):
+        return len(iterable)
+    return None
+
+
+def _source_len(query) -> Optional[int]:
+    """Linq(list)のように、イテレータをそのまま返すLinqの場合は、その要素数を返す。"""
+    if (
+        isinstance(query, Linq)
+        and query._stage is None
+        and query.generator_function is iter
+    ):
+        return _sized_len(query.__root__)
+    return _sized_len(query)
+
+
 def convert_to_queryable(self):
     if isinstance(self, Linq):
         return self
@@ -75,15 +330,42 @@ class Linq(Iterable[T]):
     # class Linq(Iterable[T], Generic[T]):
     __root__: Iterable[T]
 
-    def __init__(self, __root__: Iterable[T], func: Callable = iter):
+    # 融合可能なステージ（map/filter/take_while/step）の種類と引数
+    _stage: Optional[Tuple[str, Any]] = None
+    _compiled: Optional[Tuple[Iterable, Callable]] = None
+    _template: Optional[List[Callable]] = None
+
+    def __init__(
+        self,
+        __root__: Iterable[T],
+        func: Callable = iter,
+        stage: Tuple[str, Any] = None,
+    ):
         self.__root__ = convert_to_queryable(__root__)
         self.generator_function = func
+        self._stage = stage
 
         if self.__root__ is None:
             raise ValueError(f"Not iterable: {type(__root__)} {__root__}")
 
     def __iter__(self) -> Iterator[T]:
-        return self.generator_function(self.__root__)
+        if self._stage is None:
+            return self.generator_function(self.__root__)
+
+        if self._compiled is None:
+            self._compiled = self._compile()
+        source, fused = self._compiled
+        return fused(source)
+
+    def _compile(self) -> Tuple[Iterable, Callable]:
+        """末尾から連続する融合可能なステージを辿り、その起点と融合したジェネレータ関数を返す。"""
+        stages = []
+        node: Any = self
+        while isinstance(node, Linq) and node._stage is not None:
+            stages.append(node._stage)
+            node = node.__root__
+
+        return node, _compile_stages(list(reversed(stages)))
 
     def __str__(self) -> str:
         return list(self).__str__()
@@ -101,23 +383,42 @@ class Linq(Iterable[T]):
         return ""
 
     def __call__(self, iterable: Iterable[T]) -> Linq[T]:
-        """クエリをイテレータにアタッチし、新しいLinqオブジェクトを作成する。"""
-        chains = self._get_chains()
+        """クエリ（Linq.dummy()から組み立てたテンプレート）をイテレータにアタッチし、新しいLinqオブジェクトを作成する。
+        テンプレートは最初の呼び出し時に一度だけコンパイルされる。"""
+        if self._template is None:
+            self._template = self._compile_template()
 
-        if not chains[0]._is_dummy():
+        latest = Linq(iterable)
+        for func in self._template:
+            latest = Linq(latest, func)
+
+        return latest
+
+    def _compile_template(self) -> List[Callable]:
+        nodes = []
+        node: Any = self
+        while isinstance(node, Linq) and node._get_type == "":
+            nodes.append(node)
+            node = node.__root__
+
+        if not isinstance(node, LinqDummy):
             raise Exception("ルートはdummyでなければいけません。")
 
-        del chains[0]
-        latest = Linq(iterable)
+        funcs: List[Callable] = []
+        stages: List[Tuple[str, Any]] = []
+        for node in reversed(nodes):
+            if node._stage is not None:
+                stages.append(node._stage)
+                continue
+            if stages:
+                funcs.append(_compile_stages(stages))
+                stages = []
+            funcs.append(node.generator_function)
 
-        for chain in chains:
-            query = chain.__root__
-            func = query.func
-            args = query.copy_args(latest)
-            new_query = Linq(functools.partial(func, *args))
-            latest = Linq(new_query)
+        if stages:
+            funcs.append(_compile_stages(stages))
 
-        return latest
+        return funcs
 
     # def _get_root_type(self):
     #     # not root
@@ -197,7 +498,7 @@ class Linq(Iterable[T]):
                 if is_all_true(item):
                     yield item
 
-        return Linq(self, evalute)
+        return Linq(self, evalute, stage=("filter", funcs))
 
     def filter_or(self, *funcs: Callable[[T], bool]) -> Linq[T]:
         def is_hit(target):
@@ -284,13 +585,16 @@ class Linq(Iterable[T]):
 
     def take(self, count) -> Linq:
         def evaluate(iterable):
+            if count <= 0:
+                return
+
+            # count件目を返した時点で終了し、余分な要素を取得しない
             counter = 0
-            for index, item in enumerate(iterable):
-                if counter < count:
-                    yield item
-                else:
-                    break
+            for item in iterable:
+                yield item
                 counter += 1
+                if counter >= count:
+                    break
 
         return Linq(self, evaluate)
 
@@ -315,15 +619,49 @@ class Linq(Iterable[T]):
 
         return Linq(self, evaluate)
 
-    def buffer(self, size: int) -> Linq:
-        """返す最大の配列数を制限する　リスト化した後に取ればいいからいらないかも"""
-        raise NotImplementedError()
+    def buffer(
+        self, size: int, seconds: float = None, reuse: bool = False
+    ) -> Linq[List[T]]:
+        """
+        要素をsize件毎のリストにまとめます。secondsを指定した場合は、リストの最初の要素からseconds秒を経過した時点でもリストを返します。
+        経過時間は要素を取得した時点で判定するため、要素が届かない間はリストを返しません。
+        reuseはsplitと同様です。
+        """
+        if size < 1:
+            raise ValueError("size must be greater than 0.")
+
+        def evaluate(iterable):
+            yield from _chunks(iterable, size=size, seconds=seconds, reuse=reuse)
+
+        return Linq(self, evaluate)  # type: ignore
+
+    def chunk(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[T], int] = len,
+        size: int = None,
+        reuse: bool = False,
+    ) -> Linq[List[T]]:
+        """
+        要素のバイト数（sizeofで算出）の合計がmax_bytesを超えないようにリストにまとめます。
+        max_bytesを超える要素は、単独のリストとして返します。sizeを指定した場合は、件数も制限します。
+        reuseはsplitと同様です。
+        """
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be greater than 0.")
+
+        def evaluate(iterable):
+            yield from _chunks(
+                iterable, size=size, max_bytes=max_bytes, sizeof=sizeof, reuse=reuse
+            )
+
+        return Linq(self, evaluate)  # type: ignore
 
     def take_while(self, func) -> Linq:
         def evaluate(iterable):
             yield from itertools.takewhile(func, iterable)
 
-        return Linq(self, evaluate)
+        return Linq(self, evaluate, stage=("take_while", func))
 
     def drop_while(self, func) -> Linq:
         def evaluate(iterable):
@@ -342,10 +680,21 @@ class Linq(Iterable[T]):
                     yield item
                 count += 1
 
-        return Linq(self, evaluate)
+        return Linq(self, evaluate, stage=("step", step))
 
-    def split(self):
-        raise NotImplementedError()
+    def split(self, size: int, reuse: bool = False) -> Linq[List[T]]:
+        """
+        要素をsize件毎のリストにまとめます。最後のリストはsize件未満の場合があります。
+        reuse=Trueの場合は、同じリストを使い回して要素毎・リスト毎の確保を避けます。
+        その場合、受け取ったリストは次のリストを取得する前に消費し、保持しないでください。
+        """
+        if size < 1:
+            raise ValueError("size must be greater than 0.")
+
+        def evaluate(iterable):
+            yield from _chunks(iterable, size=size, reuse=reuse)
+
+        return Linq(self, evaluate)  # type: ignore
 
     def slice(self, start: int = 0, stop: int = None, step: int = 1) -> Linq:
         def evaluate(iterable):
@@ -357,11 +706,71 @@ class Linq(Iterable[T]):
         def evalute(iterable):
             yield from map(func, iterable)
 
-        return Linq(self, evalute)  # type: ignore
+        return Linq(self, evalute, stage=("map", func))  # type: ignore
 
     def select(self: Iterable[T], func: Callable[[T], R]) -> Linq[R]:
         return Linq.map(self, func)
 
+    def map_parallel(
+        self: Iterable[T],
+        func: Callable[[T], R],
+        executor: Union[
+            Literal["thread", "process"], concurrent.futures.Executor
+        ] = "thread",
+        max_workers: int = None,
+        chunksize: int = 1,
+        ordered: bool = True,
+        prefetch: int = 2,
+    ) -> Linq[R]:
+        """
+        要素をスレッドプールまたはプロセスプールで並列に変換します。
+        CPUを消費する変換（パース・指標計算など）はexecutor="process"を指定してください。その場合、funcはpickle可能である必要があります。
+        chunksize件毎にまとめて送出し、処理中のチャンク数はmax_workers * prefetchまでに制限されます。
+        ordered=Falseの場合は、処理が完了したチャンクから順に返します。
+        executorにExecutorのインスタンスを渡した場合は、そのExecutorを利用し、終了させません。
+        """
+
+        def evaluate(iterable):
+            yield from _parallel(
+                iterable,
+                _map_chunk,
+                func,
+                executor,
+                max_workers,
+                chunksize,
+                ordered,
+                prefetch,
+            )
+
+        return Linq(self, evaluate)  # type: ignore
+
+    def filter_parallel(
+        self: Iterable[T],
+        func: Callable[[T], bool],
+        executor: Union[
+            Literal["thread", "process"], concurrent.futures.Executor
+        ] = "thread",
+        max_workers: int = None,
+        chunksize: int = 1,
+        ordered: bool = True,
+        prefetch: int = 2,
+    ) -> Linq[T]:
+        """要素をスレッドプールまたはプロセスプールで並列に判定します。引数はmap_parallelと同様です。"""
+
+        def evaluate(iterable):
+            yield from _parallel(
+                iterable,
+                _filter_chunk,
+                func,
+                executor,
+                max_workers,
+                chunksize,
+                ordered,
+                prefetch,
+            )
+
+        return Linq(self, evaluate)
+
     def map_enumerate(self, func: Callable[[int, T], R]) -> Linq[R]:
         raise NotImplementedError()
 
@@ -435,10 +844,87 @@ class Linq(Iterable[T]):
 
         return Linq(self, evalute)
 
-    def lookup(self, key_selector):
-        """指定されたキー セレクター関数および要素セレクター関数に従って、Lookup<TKey,TElement> から IEnumerable<T> を作成します。"""
-        # var result = dictionary.ToLookup(item => item.Value[0], item => item.Key);
-        raise NotImplementedError()
+    def lookup(
+        self,
+        key_selector: Callable[[T], Any],
+        element_selector: Callable[[T], R] = None,
+    ) -> Dict[Any, List[R]]:
+        """キー毎に要素（element_selectorを指定した場合はその結果）をまとめた辞書を作成します。キーは最初に出現した順に並びます。"""
+        result: Dict[Any, List[Any]] = {}
+        for item in self:
+            key = key_selector(item)
+            value = item if element_selector is None else element_selector(item)
+            values = result.get(key)
+            if values is None:
+                result[key] = [value]
+            else:
+                values.append(value)
+
+        return result
+
+    def group_by(
+        self,
+        key_selector: Callable[[T], Any],
+        **aggregators: Union[str, Tuple[str, Callable]],
+    ) -> Linq[Tuple[Any, Any]]:
+        """
+        要素をキー毎にまとめ、(キー, 要素のリスト)を最初に出現した順に返します。
+        aggregatorsを指定した場合は、要素を保持せずに１回の走査で集計し、(キー, {名前: 集計値})を返します。
+        集計は"count"、または(集計方法, セレクター)で指定します。集計方法はcount/sum/min/max/meanです。
+
+        Linq(logs).group_by(lambda x: x.product, n="count", profit=("sum", lambda x: x.fact_profit))
+        """
+        if not aggregators:
+
+            def evaluate_groups(iterable):
+                yield from Linq.lookup(iterable, key_selector).items()
+
+            return Linq(self, evaluate_groups)
+
+        specs = []
+        for name, spec in aggregators.items():
+            kind, selector = (spec, None) if isinstance(spec, str) else spec
+            if kind not in GROUP_AGGREGATORS:
+                raise ValueError(f"{name}: {kind} is not in {GROUP_AGGREGATORS}")
+            if selector is None and kind != "count":
+                raise ValueError(f"{name}: {kind} requires a selector.")
+            specs.append((name, kind, selector))
+
+        def evaluate(iterable):
+            groups: Dict[Any, List[Any]] = {}
+            for item in iterable:
+                key = key_selector(item)
+                state = groups.get(key)
+                if state is None:
+                    state = groups[key] = [_initial_state(kind) for _, kind, _ in specs]
+
+                for index, (_, kind, selector) in enumerate(specs):
+                    if kind == "count":
+                        state[index] += 1
+                        continue
+
+                    value = selector(item)
+                    if kind == "sum":
+                        state[index] += value
+                    elif kind == "mean":
+                        state[index][0] += value
+                        state[index][1] += 1
+                    elif kind == "min":
+                        if state[index] is undefined or value < state[index]:
+                            state[index] = value
+                    elif kind == "max":
+                        if state[index] is undefined or value > state[index]:
+                            state[index] = value
+
+            for key, state in groups.items():
+                result = {}
+                for (name, kind, _), value in zip(specs, state):
+                    if kind == "mean":
+                        value = value[0] / value[1]
+                    result[name] = value
+                yield key, result
+
+        return Linq(self, evaluate)
 
     def hook(self, func=lambda index, obj: print("{}: {}".format(index, obj))):
         """デバッグ等の目的のために、処理を注入します。map関数ではないため、返されたオブジェクトは無視されます。"""
@@ -494,11 +980,70 @@ class Linq(Iterable[T]):
     def concat(self, iterable) -> Linq[T]:
         raise NotImplementedError()
 
-    def join(self, iterable) -> Linq[T]:
-        raise NotImplementedError()
+    def join(
+        self,
+        inner: Iterable[Any],
+        outer_key: Callable[[T], Any],
+        inner_key: Callable[[Any], Any],
+        result: Callable[[T, Any], R] = lambda outer, inner: (outer, inner),
+        build: Literal["auto", "inner", "outer"] = "auto",
+        spill_threshold: int = None,
+    ) -> Linq[R]:
+        """
+        キーが一致する要素同士を結合します（内部結合）。一方の要素からハッシュ表を作成（build）し、もう一方を走査します。
+        buildが"inner"の場合は、結果は外側（self）の順序を保ちます。
+        "auto"の場合は、両方の要素数が分かれば少ない方からハッシュ表を作成し、分からなければ"inner"とみなします。
+        ハッシュ表の要素数がspill_thresholdを超える場合は、一時ファイルに退避しながら結合するため、結果の順序は保たれません。
+        """
+        threshold = spill_threshold or spill.DEFAULT_THRESHOLD
+        # evaluateには上流のLinqが渡されるため、要素数は評価前のselfから求める
+        outer_size = _source_len(self)
+
+        def evaluate(outer):
+            side = build
+            if side == "auto":
+                inner_size = _source_len(inner)
+                side = "inner"
+                if outer_size is not None and inner_size is not None:
+                    if outer_size < inner_size:
+                        side = "outer"
+
+            if side == "outer":
+                yield from spill.hash_join(
+                    outer,
+                    inner,
+                    outer_key,
+                    inner_key,
+                    lambda a, b: result(a, b),
+                    threshold,
+                )
+            else:
+                yield from spill.hash_join(
+                    inner,
+                    outer,
+                    inner_key,
+                    outer_key,
+                    lambda b, a: result(a, b),
+                    threshold,
+                )
 
-    def group_join(self) -> Linq[T]:
-        raise NotImplementedError()
+        return Linq(self, evaluate)
+
+    def group_join(
+        self,
+        inner: Iterable[Any],
+        outer_key: Callable[[T], Any],
+        inner_key: Callable[[Any], Any],
+        result: Callable[[T, List[Any]], R] = lambda outer, inners: (outer, inners),
+    ) -> Linq[R]:
+        """外側（self）の要素毎に、キーが一致する内側の要素のリスト（一致しない場合は空のリスト）を結合します。"""
+
+        def evaluate(outer):
+            table = Linq.lookup(inner, inner_key)
+            for item in outer:
+                yield result(item, table.get(outer_key(item), []))
+
+        return Linq(self, evaluate)
 
     def reverse(self) -> Linq[T]:
         return Linq(self, reversed)
@@ -506,24 +1051,58 @@ class Linq(Iterable[T]):
     def shuffle(self) -> Linq[T]:
         raise NotImplementedError()
 
-    def order_by_asc(self, func) -> Linq[T]:
-        raise NotImplementedError()
+    def order_by_asc(
+        self, func: Callable[[T], Any] = lambda x: x, spill_threshold: int = None
+    ) -> LinqOrdered[T]:
+        """
+        要素を昇順に安定ソートします。then_by_asc/then_by_descで第２キー以降を指定できます。
+        直後にtakeを指定した場合は、全体をソートせずにヒープで上位の要素のみを求めます。
+        要素数がspill_thresholdを超える場合は、一時ファイルに退避しながらソートします。
+        """
+        return LinqOrdered(self, [(func, False)], spill_threshold)
 
-    def order_by_desc(self, func) -> Linq[T]:
-        raise NotImplementedError()
+    def order_by_desc(
+        self, func: Callable[[T], Any] = lambda x: x, spill_threshold: int = None
+    ) -> LinqOrdered[T]:
+        """要素を降順に安定ソートします。詳細はorder_by_ascを参照してください。"""
+        return LinqOrdered(self, [(func, True)], spill_threshold)
 
-    def then_by_asc(self) -> Linq[T]:
-        raise NotImplementedError()
+    def union(self, *iterables: Iterable[T]) -> Linq[T]:
+        """要素と各イテレータの要素を、重複を除いて出現した順に返します。"""
 
-    def union(self) -> Linq[T]:
-        raise NotImplementedError()
+        def evaluate(iterable):
+            exists = set()
+            for item in itertools.chain(iterable, *iterables):
+                if item not in exists:
+                    exists.add(item)
+                    yield item
+
+        return Linq(self, evaluate)
 
     # except
-    def difference(self) -> Linq[T]:
-        raise NotImplementedError()
+    def difference(self, iterable: Iterable[T]) -> Linq[T]:
+        """iterableに含まれない要素を、重複を除いて返します。"""
+
+        def evaluate(source):
+            exists = set(iterable)
+            for item in source:
+                if item not in exists:
+                    exists.add(item)
+                    yield item
 
-    def intersect(self) -> Linq[T]:
-        raise NotImplementedError()
+        return Linq(self, evaluate)
+
+    def intersect(self, iterable: Iterable[T]) -> Linq[T]:
+        """iterableにも含まれる要素を、重複を除いて返します。"""
+
+        def evaluate(source):
+            candidates = set(iterable)
+            for item in source:
+                if item in candidates:
+                    candidates.remove(item)
+                    yield item
+
+        return Linq(self, evaluate)
 
     def element_at(self, index) -> Linq[T]:
         raise NotImplementedError()
@@ -669,18 +1248,39 @@ class Linq(Iterable[T]):
                 result += item
             return result
 
-    def average(self, selector: Callable[[T], R] = None) -> float:
-        if selector:
-            return self.map(selector).average()
-        else:
-            # return numpy.mean(self) # -> ひとつの平均しか出さない
-            return pd.Series(self).rolling(5, min_periods=1).mean()
+    def average(self, selector: Callable[[T], R] = None) -> Optional[float]:
+        """平均を要素を保持せずに求めます。要素がない場合はNoneを返します。"""
+        return stats.Mean(selector).aggregate(self)
 
-    def median(self):
-        raise NotImplementedError()
+    def variance(
+        self, selector: Callable[[T], R] = None, ddof: int = 1
+    ) -> Optional[float]:
+        """分散（ddof=1で標本分散）を要素を保持せずに求めます。"""
+        return stats.Variance(selector, ddof).aggregate(self)
 
-    def mode(self):
-        raise NotImplementedError()
+    def std(self, selector: Callable[[T], R] = None, ddof: int = 1) -> Optional[float]:
+        """標準偏差（ddof=1で標本標準偏差）を要素を保持せずに求めます。"""
+        return stats.Std(selector, ddof).aggregate(self)
+
+    def quantile(self, q: float, selector: Callable[[T], R] = None) -> Optional[float]:
+        """分位点の推定値を、P²アルゴリズムにより定数メモリで求めます。"""
+        return stats.Quantile(q, selector).aggregate(self)
+
+    def median(self, selector: Callable[[T], R] = None) -> Optional[float]:
+        """中央値の推定値を、P²アルゴリズムにより定数メモリで求めます。"""
+        return stats.Median(selector).aggregate(self)
+
+    def mode(self, selector: Callable[[T], R] = None, capacity: int = 1000) -> Any:
+        """最頻値を求めます。値の種類がcapacityを超える場合は推定値となります。"""
+        return stats.Mode(selector, capacity).aggregate(self)
+
+    def aggregate(self, **aggregators: stats.Aggregator) -> Dict[str, Any]:
+        """
+        複数の統計量を１回の走査で求めます。
+
+        Linq(latencies).aggregate(mean=stats.Mean(), p99=stats.Quantile(0.99))
+        """
+        return stats.aggregate(self, aggregators)
 
     def accumulate(
         self,
@@ -717,6 +1317,33 @@ class Linq(Iterable[T]):
 
         return succeeded + len(exceptions), succeeded, exceptions
 
+    def dispatch_batch(
+        self,
+        dispatcher: Callable[[List[Any]], Any],
+        size: int,
+        reuse: bool = True,
+    ) -> Tuple[int, int, List[Exception]]:
+        """要素をsize件毎のリストにまとめてファンクションに送出します。一括登録（COPY・executemany・バッチAPIなど）に利用します。
+        成否はリスト単位で判定され、例外が発生したリストの要素は全て失敗として数えます。
+        reuse=Trueの場合はリストを使い回すため、dispatcherは受け取ったリストを保持しないでください。
+
+        Returns:
+            Tuple[int, int, List[Exception]]: 0 - count of elements, 1 - succeeded, 2 - exceptions
+        """
+        count = 0
+        succeeded = 0
+        exceptions = []
+
+        for chunk in Linq.split(self, size, reuse=reuse):
+            count += len(chunk)
+            try:
+                dispatcher(chunk)
+                succeeded += len(chunk)
+            except Exception as e:
+                exceptions.append(e)
+
+        return count, succeeded, exceptions
+
     def dispatch_raise(self):
         raise NotImplementedError()
 
@@ -745,11 +1372,60 @@ class Linq(Iterable[T]):
     def to_dict(self):
         return dict(self)
 
-    def to_numpy(self):
-        raise NotImplementedError()
+    def to_columns(
+        self,
+        fields: columnar.Fields = None,
+        dtypes: Dict[str, str] = None,
+        downcast: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        要素を列名毎の型付き配列に１回の走査で変換します。
+        fieldsには列名のリストまたはpydanticモデルを指定します。指定しない場合は最初の要素（辞書・pydanticモデル・namedtuple・dataclass）から決定し、
+        スカラーの場合は列名を空文字とします。
+        dtypeはdtypes、pydanticモデルのフィールドの型、値の順に決定します。downcast=Trueの場合は、float64をfloat32に、int64をint32に変換します。
+        """
+        return columnar.to_columns(
+            self, fields, dtypes, downcast=downcast, size=_source_len(self)
+        )
 
-    def to_dataframe(self):
-        raise NotImplementedError()
+    def to_numpy(
+        self,
+        fields: columnar.Fields = None,
+        dtype: Union[str, Dict[str, str]] = None,
+        downcast: bool = False,
+    ) -> np.ndarray:
+        """要素がスカラーの場合は１次元配列に、それ以外の場合は列毎の構造化配列（レコード配列）に変換します。引数はto_columnsを参照してください。"""
+        dtypes = {"": dtype} if isinstance(dtype, str) else dtype
+        columns = Linq.to_columns(self, fields, dtypes, downcast)
+        if list(columns) == [""]:
+            return columns[""]
+        return np.rec.fromarrays(list(columns.values()), names=list(columns))
+
+    def to_dataframe(
+        self,
+        fields: columnar.Fields = None,
+        dtypes: Dict[str, str] = None,
+        downcast: bool = False,
+    ) -> pd.DataFrame:
+        """要素をDataFrameに変換します。要素がスカラーの場合の列名は0です。引数はto_columnsを参照してください。"""
+        columns = Linq.to_columns(self, fields, dtypes, downcast)
+        if list(columns) == [""]:
+            return pd.DataFrame({0: columns[""]}, copy=False)
+        return pd.DataFrame(columns, copy=False)
+
+    def to_arrow(
+        self,
+        fields: columnar.Fields = None,
+        dtypes: Dict[str, str] = None,
+        downcast: bool = False,
+    ):
+        """要素をpyarrow.Tableに変換します。pyarrowのインストールが必要です。引数はto_columnsを参照してください。"""
+        import pyarrow as pa
+
+        columns = Linq.to_columns(self, fields, dtypes, downcast)
+        return pa.table(
+            {name or "0": pa.array(x, from_pandas=True) for name, x in columns.items()}
+        )
 
     def to_series(self) -> pd.Series:
         return pd.Series(self)
@@ -760,9 +1436,49 @@ class Linq(Iterable[T]):
         """イテレータ全体を指定した型に解釈します。解釈は、pydanticのparse_obj_asを利用します。"""
         return parse_obj_as(type_, self, type_name=type_name)
 
-    def save(self, factory=list) -> Linq[T]:
-        """クエリ実行結果をルートイテレータとする新たなインスタンスを作成します。"""
-        raise NotImplementedError()
+    def save(self, factory: Callable[[Iterable[T]], Iterable[T]] = None) -> Linq[T]:
+        """
+        クエリ実行結果をルートイテレータとする新たなインスタンスを作成します。クエリはこの時点で一度だけ評価されます。
+        factoryを指定しない場合は、全ての要素がintまたはfloatであればarray.arrayに、それ以外はリストに格納します。
+        """
+        if factory is not None:
+            return Linq(factory(self))
+        return Linq(_compact(list(self)))
+
+    def cache(self, key: Hashable = None, spill: bool = False) -> Linq[T]:
+        """
+        最初の評価時に要素を記録し、以降の評価では記録した要素を返すLinqを作成します。
+        評価を途中で打ち切った場合も、次の評価は記録した要素に続けて評価を再開するため、クエリは一度だけ評価されます。
+        spill=Trueの場合は、要素をメモリではなく一時ファイルに記録します（要素はpickle可能である必要があります）。
+        keyを指定した場合は、同じkeyのキャッシュをプロセス内で共有し、既に存在すればこのクエリは評価されません。
+        """
+        if key is None:
+            return Linq(CachedIterable(self, spill))
+
+        cached = _caches.get(key)
+        if cached is None:
+            cached = _caches[key] = CachedIterable(self, spill)
+        return Linq(cached)
+
+    @staticmethod
+    def clear_cache(key: Hashable = None):
+        """keyを指定したキャッシュを破棄します。keyを指定しない場合は全て破棄します。"""
+        keys = list(_caches) if key is None else [key]
+        for x in keys:
+            cached = _caches.pop(x, None)
+            if cached is not None:
+                cached.close()
+
+    def tee(self, n: int = 2, max_buffer: int = None) -> Tuple[Linq[T], ...]:
+        """
+        クエリを一度だけ評価し、その要素をn個のLinqに分配します。分配したLinqは一度のみ評価できます。
+        先行するLinqと最も遅れたLinqの差はmax_bufferまでに制限され、超える場合はBufferErrorを送出します。
+        """
+        if n < 1:
+            raise ValueError("n must be greater than 0.")
+
+        buffer = TeeBuffer(iter(self), n, max_buffer)
+        return tuple(Linq(buffer.iterate(i)) for i in range(n))
 
     def attach(self, iterable: Iterable[T]) -> Linq[T]:
         raise NotImplementedError()
@@ -799,20 +1515,65 @@ class Linq(Iterable[T]):
         raise NotImplementedError()
 
     @classmethod
-    def from_text_line(cls):
-        raise NotImplementedError()
+    def from_text_line(
+        cls,
+        path: str,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        keepends: bool = False,
+    ) -> Linq[str]:
+        """ファイルを１行ずつ返します。ファイルはmmapで参照するため、ファイルの大きさに関わらずメモリを消費しません。"""
+        return cls(
+            GeneratorFunctionWrapper(
+                lambda: sources.iter_lines(path, encoding, errors, keepends)
+            )
+        )
 
     @classmethod
     def from_html(cls):
         raise NotImplementedError()
 
     @classmethod
-    def from_json(cls):
-        raise NotImplementedError()
+    def from_json(cls, path: str, lines: bool = True, encoding: str = "utf-8") -> Linq:
+        """
+        lines=True（デフォルト）の場合は、改行区切りのJSON（JSON Lines）を１行ずつ解釈して返します。
+        lines=Falseの場合はファイル全体を解釈し、配列であればその要素を返します。
+        """
+        func = sources.iter_json_lines if lines else sources.iter_json
+        return cls(GeneratorFunctionWrapper(lambda: func(path, encoding)))
 
     @classmethod
-    def from_csv(cls):
-        raise NotImplementedError()
+    def from_csv(
+        cls,
+        path: str,
+        types: sources.Converters = None,
+        header: bool = True,
+        fieldnames: Sequence[str] = None,
+        as_dict: bool = False,
+        encoding: str = "utf-8",
+        chunk_size: int = sources.DEFAULT_CHUNK_SIZE,
+        **fmtparams,
+    ) -> Linq:
+        """
+        CSVを１行ずつタプル（as_dict=Trueの場合は辞書）として返します。
+        typesに列毎の変換関数（リスト、または列名をキーとする辞書）を指定した場合は、chunk_size行毎に列単位で変換します。空文字はNoneとなります。
+
+        Linq.from_csv("ohlc.csv", types={"close_price": float, "volume": float}, as_dict=True)
+        """
+        return cls(
+            GeneratorFunctionWrapper(
+                lambda: sources.iter_csv(
+                    path,
+                    types,
+                    header,
+                    fieldnames,
+                    as_dict,
+                    encoding,
+                    chunk_size,
+                    **fmtparams,
+                )
+            )
+        )
 
     @classmethod
     def from_yml(cls):
@@ -831,18 +1592,35 @@ class Linq(Iterable[T]):
         raise NotImplementedError()
 
     @classmethod
-    def from_glob(cls):
-        raise NotImplementedError()
+    def from_glob(
+        cls,
+        pattern: str,
+        reader: Callable[[str], Iterable[Any]] = None,
+        max_workers: int = None,
+        recursive: bool = False,
+    ) -> Linq:
+        """
+        パターンに一致するファイルを、readerで読み込んだ要素を返します。readerのデフォルトはfrom_text_lineです。
+        ファイルはスレッドで並行して読み込むため、要素の順序は保証されません。max_workers=1の場合は、ファイル名の順に読み込みます。
+
+        Linq.from_glob("dumps/*.jsonl", reader=Linq.from_json)
+        """
+        if reader is None:
+            reader = cls.from_text_line
+
+        return cls(
+            GeneratorFunctionWrapper(
+                lambda: sources.iter_glob(pattern, reader, max_workers, recursive)
+            )
+        )
 
     @staticmethod
     def dummy() -> Linq:
         return LinqDummy()
 
-    # @staticmethod
-    # def asyncio(
-    #     self: Iterable[Callable[..., Coroutine]]
-    # ) -> LinqAsyncio[Callable[..., Coroutine]]:
-    #     return LinqAsyncio(self)
+    def to_async(self: Iterable[T]) -> LinqAsync[T]:
+        """非同期イテレータとして扱うLinqAsyncを作成します。"""
+        return LinqAsync(self)
 
 
 class LinqRoot(Linq):
@@ -867,42 +1645,409 @@ class LinqDummy(Linq):
         raise Exception("ダミーオブジェクトはイテレートできません。")
 
 
-# # TODO: CoroutineをCoroutineFunctionに直す
-# class LinqAsyncio(Linq[T]):
-#     def __init__(
-#         self, __root__: Iterable[Callable[..., Coroutine]], func: Callable = iter
-#     ):
-#         self.__root__ = convert_to_queryable(__root__)
-#         self.generator_function = func
-
-#         if self.__root__ is None:
-#             raise ValueError(f"Not queryable: {type(__root__)} {__root__}")
-
-#     def __aiter__(self):
-#         return self._serise().__aiter__()
-
-#     async def gather(self: Iterable[Callable[..., Coroutine]]):
-#         for co in self:
-#             if inspect.iscoroutinefunction(co):
-#                 ...
-#             else:
-#                 ...
-#         return await asyncio.gather(*map(lambda x: x(), self))
-
-#     async def _serise(self: Iterable[Callable[..., Coroutine]]):
-#         for coroutine_function in self:
-#             co = coroutine_function()
-#             result = await co
-#             yield result
-
-#     def run(self: Iterable[Callable[..., Coroutine]]):
-#         coroutine = LinqAsyncio.gather(self)
-#         try:
-#             return asyncio.run(coroutine)
-#         except RuntimeError:
-#             raise RuntimeError(
-#                 "Cannot be called from a running event loop. Use `gather` instead of `run`."
-#             )
+class _Descending:
+    """比較を反転させ、昇順のソートで降順に並べる。"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class LinqOrdered(Linq[T]):
+    """order_by_asc/order_by_descの結果。ソートのキーを保持し、then_byで追加できる。"""
+
+    def __init__(
+        self,
+        __root__: Iterable[T],
+        keys: List[Tuple[Callable[[T], Any], bool]],
+        spill_threshold: int = None,
+    ):
+        self.keys = keys
+        self.spill_threshold = spill_threshold or spill.DEFAULT_THRESHOLD
+        super().__init__(__root__, self._sort)
+
+    def _sort_key(self) -> Callable[[T], Any]:
+        if len(self.keys) == 1:
+            func, descending = self.keys[0]
+            return (lambda x: _Descending(func(x))) if descending else func
+
+        keys = self.keys
+
+        def key(x):
+            return tuple(_Descending(f(x)) if d else f(x) for f, d in keys)
+
+        return key
+
+    def _sort(self, iterable):
+        yield from spill.sort(iterable, self._sort_key(), self.spill_threshold)
+
+    def then_by_asc(self, func: Callable[[T], Any]) -> LinqOrdered[T]:
+        return LinqOrdered(
+            self.__root__, self.keys + [(func, False)], self.spill_threshold
+        )
+
+    def then_by_desc(self, func: Callable[[T], Any]) -> LinqOrdered[T]:
+        return LinqOrdered(
+            self.__root__, self.keys + [(func, True)], self.spill_threshold
+        )
+
+    def take(self, count) -> Linq[T]:
+        """ソート結果の先頭count件を、ヒープで求めます（top-k）。"""
+        key = self._sort_key()
+
+        def evaluate(iterable):
+            yield from heapq.nsmallest(count, iterable, key=key)
+
+        return Linq(self.__root__, evaluate)
+
+
+class _aclosing:
+    """ブロックを抜けた時点で非同期イテレータを閉じる。（contextlib.aclosingはpython3.10以降）"""
+
+    def __init__(self, iterable: AsyncIterable[T]):
+        self.iterator = iterable.__aiter__()
+
+    async def __aenter__(self) -> AsyncIterator[T]:
+        return self.iterator
+
+    async def __aexit__(self, *args):
+        aclose = getattr(self.iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class SyncToAsyncIterable(AsyncIterable[T]):
+    """同期イテレータを非同期イテレータとして扱う。要素の取得はイベントループ上で行われるため、ブロックするイテレータは避けてください。"""
+
+    def __init__(self, iterable: Iterable[T]):
+        self.iterable = iterable
+
+    async def __aiter__(self):
+        for item in self.iterable:
+            yield item
+
+
+def convert_to_async_queryable(source):
+    if hasattr(source, "__aiter__"):
+        return source
+
+    queryable = convert_to_queryable(source)
+    if queryable is None:
+        return None
+
+    return SyncToAsyncIterable(queryable)
+
+
+async def _await_element(element):
+    if inspect.iscoroutinefunction(element) or (
+        callable(element) and not inspect.isawaitable(element)
+    ):
+        element = element()
+    return await element
+
+
+class LinqAsync(AsyncIterable[T]):
+    """
+    非同期イテレータ（非同期ジェネレータ・Scheduler・DBストリームなど）に対するLinqです。
+    同期イテレータを渡した場合は、非同期イテレータとして扱います。
+    """
+
+    __root__: AsyncIterable[T]
+
+    def __init__(self, __root__: Any, func: Callable = None):
+        self.__root__ = convert_to_async_queryable(__root__)
+        self.generator_function = func
+
+        if self.__root__ is None:
+            raise ValueError(f"Not iterable: {type(__root__)} {__root__}")
+
+    def __aiter__(self) -> AsyncIterator[T]:
+        if self.generator_function is None:
+            return self.__root__.__aiter__()
+        return self.generator_function(self.__root__).__aiter__()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__root__!r})"
+
+    def filter(self, *funcs: Callable[[T], bool]) -> LinqAsync[T]:
+        async def evaluate(iterable):
+            async with _aclosing(iterable) as it:
+                async for item in it:
+                    if all(func(item) for func in funcs):
+                        yield item
+
+        return LinqAsync(self, evaluate)
+
+    def map(self, func: Callable[[T], R]) -> LinqAsync[R]:
+        async def evaluate(iterable):
+            async with _aclosing(iterable) as it:
+                async for item in it:
+                    yield func(item)
+
+        return LinqAsync(self, evaluate)
+
+    def map_async(
+        self,
+        func: Callable[[T], Awaitable[R]],
+        concurrency: int = 1,
+        ordered: bool = True,
+    ) -> LinqAsync[R]:
+        """
+        要素をコルーチン関数で変換します。同時に実行するコルーチンはconcurrencyまでに制限され、
+        それ以上は要素を取得しないため、無限の非同期イテレータにも適用できます。
+        ordered=Falseの場合は、完了したものから順に返します。
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than 0.")
+
+        async def evaluate(iterable):
+            pending: collections.deque = collections.deque()
+            try:
+                async with _aclosing(iterable) as it:
+                    exhausted = False
+                    while True:
+                        while not exhausted and len(pending) < concurrency:
+                            try:
+                                item = await it.__anext__()
+                            except StopAsyncIteration:
+                                exhausted = True
+                            else:
+                                pending.append(asyncio.ensure_future(func(item)))
+
+                        if not pending:
+                            break
+
+                        if ordered:
+                            yield await pending.popleft()
+                        else:
+                            done, _ = await asyncio.wait(
+                                pending, return_when=asyncio.FIRST_COMPLETED
+                            )
+                            for task in done:
+                                pending.remove(task)
+                            for task in done:
+                                yield task.result()
+            finally:
+                # 途中で打ち切られた場合や例外が発生した場合は、実行中のコルーチンをキャンセルする
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return LinqAsync(self, evaluate)
+
+    def take(self, count: int) -> LinqAsync[T]:
+        async def evaluate(iterable):
+            if count <= 0:
+                return
+            async with _aclosing(iterable) as it:
+                index = 0
+                async for item in it:
+                    yield item
+                    index += 1
+                    if index >= count:
+                        break
+
+        return LinqAsync(self, evaluate)
+
+    def buffer(self, size: int) -> LinqAsync[List[T]]:
+        """要素をsize件毎のリストにまとめます。最後のリストはsize件未満の場合があります。"""
+        if size < 1:
+            raise ValueError("size must be greater than 0.")
+
+        async def evaluate(iterable):
+            async with _aclosing(iterable) as it:
+                chunk = []
+                async for item in it:
+                    chunk.append(item)
+                    if len(chunk) >= size:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+
+        return LinqAsync(self, evaluate)
+
+    async def gather(self, concurrency: int = None) -> List[Any]:
+        """
+        要素（コルーチン・コルーチン関数・awaitable）を実行し、要素の並び順に結果を返します。
+        concurrencyを指定した場合は、同時に実行する数を制限します。
+        """
+        if concurrency is None:
+            return await asyncio.gather(
+                *[_await_element(x) async for x in self]  # type: ignore
+            )
+        return await self.map_async(_await_element, concurrency).to_list()
+
+    async def to_list(self) -> List[T]:
+        return [x async for x in self]
+
+    def to_sync(self) -> Linq[T]:
+        """
+        同期イテレータとして扱うLinqを作成します。要素は専用のイベントループで１件ずつ取得します。
+        実行中のイベントループからは呼び出せません。その場合は`async for`を利用してください。
+        """
+
+        def evaluate():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                raise RuntimeError(
+                    "Cannot be called from a running event loop. Use `async for` instead of `to_sync`."
+                )
+
+            loop = asyncio.new_event_loop()
+            iterator = self.__aiter__()
+            try:
+                while True:
+                    try:
+                        yield loop.run_until_complete(iterator.__anext__())
+                    except StopAsyncIteration:
+                        break
+            finally:
+                aclose = getattr(iterator, "aclose", None)
+                if aclose is not None:
+                    loop.run_until_complete(aclose())
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
+
+        return Linq(GeneratorFunctionWrapper(evaluate))
+
+
+def _compact(items: List[Any]) -> Iterable[Any]:
+    """全ての要素がintまたはfloatの場合は、array.arrayに格納して要素毎のオブジェクトを持たないようにする。"""
+    if not items:
+        return items
+
+    first = type(items[0])
+    if first not in (int, float) or not all(type(x) is first for x in items):
+        return items
+
+    try:
+        return array.array("q" if first is int else "d", items)
+    except OverflowError:
+        return items
+
+
+class CachedIterable(Iterable[T]):
+    """
+    sourceを一度だけ評価し、評価済みの要素は記録から返す。
+    sourceの評価中に例外が発生した場合は記録を完了とせず、以降の評価でも記録した要素を返した後に同じ例外を送出する。
+    """
+
+    def __init__(self, source: Iterable[T], to_disk: bool = False):
+        self.source = source
+        self.iterator: Optional[Iterator[T]] = None
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.store: Any = spill.SpillLog() if to_disk else []
+
+    def pull(self) -> bool:
+        """sourceから次の要素を取得して記録する。要素がない場合はFalseを返す。"""
+        if self.done:
+            return False
+        if self.error is not None:
+            raise self.error
+        if self.iterator is None:
+            self.iterator = iter(self.source)
+
+        try:
+            item = next(self.iterator)
+        except StopIteration:
+            self.done = True
+            self.iterator = None
+            return False
+        except Exception as e:
+            # 例外を送出したジェネレータは終了しているため、途中までの要素を全件とみなさないように記録する
+            self.error = e
+            self.iterator = None
+            raise
+
+        self.store.append(item)
+        return True
+
+    def __iter__(self) -> Iterator[T]:
+        store = self.store
+        if not isinstance(store, list):
+            yield from store.read(self.pull)
+            return
+
+        index = 0
+        while True:
+            if index < len(store):
+                yield store[index]
+                index += 1
+            elif not self.pull():
+                return
+
+    def close(self):
+        if not isinstance(self.store, list):
+            self.store.close()
+
+
+# Linq.cacheでkeyを指定したキャッシュ
+_caches: Dict[Hashable, CachedIterable] = {}
+
+
+class TeeBuffer:
+    """
+    １つのイテレータの要素を、複数の読み出し元に分配する。読み出し元の間の差はmax_bufferまでに制限する。
+    制限を超えて先行しようとした読み出し元はBufferErrorを送出して切り離し、他の読み出し元は全ての要素を読み出せる。
+    """
+
+    def __init__(self, iterator: Iterator[T], n: int, max_buffer: int = None):
+        self.iterator = iterator
+        self.max_buffer = max_buffer
+        self.items: collections.deque = collections.deque()
+        self.base = 0  # itemsの先頭の要素の位置
+        self.positions: List[Optional[int]] = [0] * n  # 切り離した読み出し元はNone
+        self.done = False
+
+    def iterate(self, index: int) -> Iterator[T]:
+        items = self.items
+        while True:
+            position = self.positions[index]
+            if position is None:
+                raise BufferError(f"tee buffer exceeded max_buffer: {self.max_buffer}")
+            offset = position - self.base
+            if offset < len(items):
+                item = items[offset]
+            else:
+                if self.done:
+                    return
+                # 要素を取り出した後に送出すると、他の読み出し元からもその要素が失われる
+                if self.max_buffer is not None and len(items) >= self.max_buffer:
+                    self.positions[index] = None
+                    self.release()
+                    raise BufferError(
+                        f"tee buffer exceeded max_buffer: {self.max_buffer}"
+                    )
+                try:
+                    item = next(self.iterator)
+                except StopIteration:
+                    self.done = True
+                    return
+                items.append(item)
+
+            self.positions[index] = position + 1
+            self.release()
+            yield item
+
+    def release(self):
+        """全ての読み出し元が読み終えた要素を破棄する。"""
+        active = [x for x in self.positions if x is not None]
+        oldest = min(active) if active else self.base + len(self.items)
+        while self.items and oldest > self.base:
+            self.items.popleft()
+            self.base += 1
 
 
 # TODO: どっかまともなところへ移す
@@ -1,7 +1,7 @@
 import datetime
 from asyncio import sleep
 from enum import Enum
-from typing import Iterable
+from typing import Callable, Iterable, Union
 
 from framework import DateTimeAware
 
@@ -23,9 +23,15 @@ class SchedulerType(Enum):
 
 
 class Scheduler:
+    """
+    sourceに日時を列挙する関数を指定した場合は、全件を読み込まずに反復の度に呼び出して順に返す。
+    """
+
     def __init__(
         self,
-        source: Iterable[DateTimeAware] = None,
+        source: Union[
+            Iterable[DateTimeAware], Callable[[], Iterable[DateTimeAware]]
+        ] = None,
         second: float = None,
         hour: float = None,
         day: int = None,
@@ -43,7 +49,7 @@ class Scheduler:
                 and weeks is None
             ):
                 self.type = SchedulerType.DATETIMES
-                self.source = list(source)
+                self.source = source if callable(source) else list(source)
         else:
             if second is not None:
                 if (
@@ -73,7 +79,8 @@ class Scheduler:
             raise NotImplementedError()
 
     async def iter_source(self):
-        for d in self.source:
+        source = self.source() if callable(self.source) else self.source
+        for d in source:
             await sleep(0)
             yield d
 
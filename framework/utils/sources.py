@@ -0,0 +1,207 @@
+"""
+ファイルを全て読み込まずに、要素を１件ずつ返すソース。
+テキストはmmapで行単位に分割し、CSVはchunk_size行毎に列単位で型変換する。
+"""
+import csv
+import glob as globlib
+import itertools
+import json
+import mmap
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+DEFAULT_CHUNK_SIZE = 1024
+Converters = Union[None, Sequence[Optional[Callable]], Dict[str, Callable]]
+
+
+def iter_lines(
+    path: str,
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    keepends: bool = False,
+) -> Iterator[str]:
+    """ファイルをmmapで参照し、行毎にデコードして返す。ファイル全体をメモリに読み込まない。"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                if not keepends:
+                    line = line.rstrip(b"\r\n")
+                yield line.decode(encoding, errors)
+
+
+def iter_json_lines(path: str, encoding: str = "utf-8") -> Iterator[Any]:
+    """改行区切りのJSON（JSON Lines）を１行ずつ解釈して返す。空行は無視する。"""
+    decode = json.loads
+    for line in iter_lines(path, encoding):
+        if line.strip():
+            yield decode(line)
+
+
+def iter_json(path: str, encoding: str = "utf-8") -> Iterator[Any]:
+    """JSONファイルを解釈し、配列の場合は要素を、それ以外の場合は値を返す。ファイル全体を読み込む。"""
+    with open(path, encoding=encoding) as f:
+        value = json.load(f)
+    if isinstance(value, list):
+        yield from value
+    else:
+        yield value
+
+
+def convert_column(convert: Callable, values: Sequence[str]) -> List[Any]:
+    """空文字をNoneとして、列の値を変換する。"""
+    return [None if x == "" else convert(x) for x in values]
+
+
+def iter_csv(
+    path: str,
+    types: Converters = None,
+    header: bool = True,
+    fieldnames: Sequence[str] = None,
+    as_dict: bool = False,
+    encoding: str = "utf-8",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    **fmtparams,
+) -> Iterator[Union[tuple, Dict[str, Any]]]:
+    """
+    CSVを１行ずつタプル（as_dict=Trueの場合は辞書）として返す。空行は無視する。
+    typesには列毎の変換関数のリスト、または列名と変換関数の辞書を指定する。変換はchunk_size行毎に列単位で行い、空文字はNoneとする。
+    列数が異なる行はそのままの列数で返し、存在する列のみ変換する。
+    header=Trueの場合は１行目を列名とし、fieldnamesを指定した場合はそれを列名とする。
+    """
+    with open(path, encoding=encoding, newline="") as f:
+        # 空行はcsv.readerが空のリストを返すため、取り除く
+        reader = filter(None, csv.reader(f, **fmtparams))
+
+        names: Optional[List[str]] = list(fieldnames) if fieldnames else None
+        if header:
+            first = next(reader, None)
+            if first is None:
+                return
+            if names is None:
+                names = first
+
+        if isinstance(types, dict):
+            if names is None:
+                raise ValueError("Column names are required to convert by name.")
+            converters = [types.get(x) for x in names]
+        else:
+            converters = list(types) if types is not None else []
+
+        if as_dict and names is None:
+            raise ValueError("Column names are required for as_dict.")
+
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                break
+
+            for index, convert in enumerate(converters):
+                if convert is None:
+                    continue
+                # 行を転置すると最も短い行に揃えられてしまうため、列を持つ行のみを変換する
+                targets = [row for row in rows if index < len(row)]
+                values = convert_column(convert, [row[index] for row in targets])
+                for row, value in zip(targets, values):
+                    row[index] = value
+
+            if as_dict:
+                for row in rows:
+                    yield dict(zip(names, row))  # type: ignore
+            else:
+                yield from map(tuple, rows)
+
+
+_DONE = object()
+
+
+def iter_parallel(
+    sources: Sequence[Callable[[], Iterable[Any]]],
+    max_workers: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_chunks: int = 4,
+) -> Iterator[Any]:
+    """
+    複数のソースをスレッドで並行して読み込み、読み込んだ順に要素を返す（ソース間の順序は保証しない）。
+    読み込んだ要素はchunk_size件毎に受け渡し、未処理のチャンクはmax_workers * max_chunksまでに制限される。
+    """
+    if not sources:
+        return
+
+    max_workers = max_workers or min(len(sources), os.cpu_count() or 1)
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=max_workers * max_chunks)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(source):
+        try:
+            it = iter(source())
+            while not stopped.is_set():
+                chunk = list(itertools.islice(it, chunk_size))
+                if not chunk or not put(chunk):
+                    break
+        except BaseException as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for source in sources:
+            executor.submit(produce, source)
+
+        try:
+            remaining = len(sources)
+            while remaining:
+                item = buffer.get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            # 途中で打ち切られた場合は、読み込み中のソースを停止させる
+            stopped.set()
+
+
+def iter_glob(
+    pattern: str,
+    reader: Callable[[str], Iterable[Any]] = iter_lines,
+    max_workers: int = None,
+    recursive: bool = False,
+) -> Iterator[Any]:
+    """
+    パターンに一致するファイルをreaderで読み込んで返す。
+    max_workersが2以上の場合はファイルを並行して読み込み、要素の順序は保証しない。1の場合はファイル名の順に読み込む。
+    """
+    paths = sorted(globlib.glob(pattern, recursive=recursive))
+    if max_workers == 1:
+        for path in paths:
+            yield from reader(path)
+    else:
+        yield from iter_parallel(
+            [lambda path=path: reader(path) for path in paths], max_workers
+        )
@@ -0,0 +1,166 @@
+"""
+メモリに収まらない要素を一時ファイルへ退避（spill）しながら、ソートや結合を行う。
+要素はpickleで一時ファイルに書き出すため、pickle可能である必要がある。
+"""
+import heapq
+import itertools
+import pickle
+import tempfile
+from collections import defaultdict
+from typing import Any, Callable, Iterable, Iterator, List
+
+# spillを開始するまでにメモリ上に保持する要素数
+DEFAULT_THRESHOLD = 1000000
+DEFAULT_PARTITIONS = 16
+
+
+class SpillFile:
+    """要素を一時ファイルに書き出し、書き出した順に読み出す。"""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.pickler = pickle.Pickler(self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count = 0
+
+    @classmethod
+    def dump(cls, items: Iterable[Any]) -> "SpillFile":
+        spill = cls()
+        spill.extend(items)
+        return spill
+
+    def append(self, item: Any):
+        self.pickler.dump(item)
+        # 参照を保持し続けないように、pickleのメモ化を無効にする
+        self.pickler.clear_memo()
+        self.count += 1
+
+    def extend(self, items: Iterable[Any]):
+        for item in items:
+            self.append(item)
+
+    def __iter__(self) -> Iterator[Any]:
+        self.file.flush()
+        self.file.seek(0)
+        unpickler = pickle.Unpickler(self.file)
+        for _ in range(self.count):
+            yield unpickler.load()
+
+    def close(self):
+        self.file.close()
+
+
+class SpillLog:
+    """
+    追記のみの一時ファイル。複数の読み出し元が、それぞれの位置から並行して読み出せる。
+    読み出し元が書き込み済みの要素に追いついた場合は、pullを呼び出して要素の追記を促す。
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.pickler = pickle.Pickler(self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count = 0
+
+    def append(self, item: Any):
+        self.file.seek(0, 2)
+        self.pickler.dump(item)
+        self.pickler.clear_memo()
+        self.count += 1
+
+    def read(self, pull: Callable[[], bool]) -> Iterator[Any]:
+        offset = 0
+        index = 0
+        while True:
+            if index < self.count:
+                self.file.seek(offset)
+                item = pickle.load(self.file)
+                offset = self.file.tell()
+                index += 1
+                yield item
+            elif not pull():
+                return
+
+    def close(self):
+        self.file.close()
+
+
+def sort(
+    iterable: Iterable[Any],
+    key: Callable[[Any], Any],
+    threshold: int = DEFAULT_THRESHOLD,
+) -> Iterator[Any]:
+    """
+    安定ソートした要素を返す。要素数がthresholdを超える場合は、threshold件毎にソートして一時ファイルに書き出し、
+    それらをマージする（外部マージソート）。
+    """
+    it = iter(iterable)
+    chunk = list(itertools.islice(it, threshold + 1))
+    if len(chunk) <= threshold:
+        chunk.sort(key=key)
+        yield from chunk
+        return
+
+    runs: List[SpillFile] = []
+    try:
+        while chunk:
+            chunk.sort(key=key)
+            runs.append(SpillFile.dump(chunk))
+            chunk = list(itertools.islice(it, threshold))
+
+        # heapq.mergeは同値の場合に先のイテレータを優先するため、安定ソートとなる
+        yield from heapq.merge(*runs, key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def hash_join(
+    build: Iterable[Any],
+    probe: Iterable[Any],
+    build_key: Callable[[Any], Any],
+    probe_key: Callable[[Any], Any],
+    emit: Callable[[Any, Any], Any],
+    threshold: int = DEFAULT_THRESHOLD,
+    partitions: int = DEFAULT_PARTITIONS,
+) -> Iterator[Any]:
+    """
+    build側からハッシュ表を作成し、probe側の要素毎に一致した要素をemit(build, probe)で返す。
+    build側の要素数がthresholdを超える場合は、キーのハッシュ値で両側をpartitions個に分割して一時ファイルに書き出し、
+    分割毎に結合する（grace hash join）。その場合、結果はprobe側の順序を保たない。
+    """
+    table = defaultdict(list)
+    it = iter(build)
+    count = 0
+    for item in it:
+        table[build_key(item)].append(item)
+        count += 1
+        if count > threshold:
+            break
+    else:
+        for item in probe:
+            for matched in table.get(probe_key(item), ()):
+                yield emit(matched, item)
+        return
+
+    build_parts = [SpillFile() for _ in range(partitions)]
+    probe_parts = [SpillFile() for _ in range(partitions)]
+    try:
+        for key, items in table.items():
+            build_parts[hash(key) % partitions].extend(items)
+        del table
+
+        for item in it:
+            build_parts[hash(build_key(item)) % partitions].append(item)
+
+        for item in probe:
+            probe_parts[hash(probe_key(item)) % partitions].append(item)
+
+        for build_part, probe_part in zip(build_parts, probe_parts):
+            part = defaultdict(list)
+            for item in build_part:
+                part[build_key(item)].append(item)
+            for item in probe_part:
+                for matched in part.get(probe_key(item), ()):
+                    yield emit(matched, item)
+    finally:
+        for spill in itertools.chain(build_parts, probe_parts):
+            spill.close()
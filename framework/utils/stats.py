@@ -0,0 +1,309 @@
+"""
+要素を保持せずに１回の走査で統計量を求める集計器。
+Linq.aggregateに複数の集計器を渡すと、１回の走査でそれぞれの統計量を求める。
+
+Linq(latencies).aggregate(mean=Mean(), std=Std(), p99=Quantile(0.99))
+"""
+import math
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class Aggregator:
+    """集計器の基底クラス。selectorを指定した場合は、要素にselectorを適用した値を集計する。"""
+
+    def __init__(self, selector: Callable[[Any], Any] = None):
+        self.selector = selector
+
+    def add(self, value: Any):
+        raise NotImplementedError()
+
+    def result(self) -> Any:
+        raise NotImplementedError()
+
+    def copy(self) -> "Aggregator":
+        """集計前の状態の複製を返す。"""
+        raise NotImplementedError()
+
+    def aggregate(self, iterable) -> Any:
+        """iterableの全ての要素を集計した結果を返す。この集計器の状態は変更しない。"""
+        return aggregate(iterable, {"result": self})["result"]
+
+
+class Count(Aggregator):
+    def __init__(self, selector: Callable[[Any], Any] = None):
+        super().__init__(selector)
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def result(self) -> int:
+        return self.count
+
+    def copy(self):
+        return Count(self.selector)
+
+
+class Sum(Aggregator):
+    def __init__(self, selector: Callable[[Any], Any] = None):
+        super().__init__(selector)
+        self.total = 0
+
+    def add(self, value):
+        self.total += value
+
+    def result(self):
+        return self.total
+
+    def copy(self):
+        return Sum(self.selector)
+
+
+class Min(Aggregator):
+    def __init__(self, selector: Callable[[Any], Any] = None):
+        super().__init__(selector)
+        self.value: Any = None
+
+    def add(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def result(self):
+        return self.value
+
+    def copy(self):
+        return Min(self.selector)
+
+
+class Max(Aggregator):
+    def __init__(self, selector: Callable[[Any], Any] = None):
+        super().__init__(selector)
+        self.value: Any = None
+
+    def add(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+    def result(self):
+        return self.value
+
+    def copy(self):
+        return Max(self.selector)
+
+
+class Mean(Aggregator):
+    """Welfordの方法で平均を求める。要素がない場合はNoneを返す。"""
+
+    def __init__(self, selector: Callable[[Any], Any] = None):
+        super().__init__(selector)
+        self.count = 0
+        self.mean = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.mean += (value - self.mean) / self.count
+
+    def result(self) -> Optional[float]:
+        return self.mean if self.count else None
+
+    def copy(self):
+        return Mean(self.selector)
+
+
+class Variance(Aggregator):
+    """
+    Welfordの方法で分散を求める。桁落ちしにくく、大きな値の分散も安定して求められる。
+    ddof=1（デフォルト）で標本分散、ddof=0で母分散を返す。要素数がddof以下の場合はNoneを返す。
+    """
+
+    def __init__(self, selector: Callable[[Any], Any] = None, ddof: int = 1):
+        super().__init__(selector)
+        self.ddof = ddof
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def result(self) -> Optional[float]:
+        if self.count <= self.ddof:
+            return None
+        return self.m2 / (self.count - self.ddof)
+
+    def copy(self):
+        return self.__class__(self.selector, self.ddof)
+
+
+class Std(Variance):
+    """標準偏差。詳細はVarianceを参照。"""
+
+    def result(self) -> Optional[float]:
+        variance = super().result()
+        return None if variance is None else math.sqrt(variance)
+
+
+class Quantile(Aggregator):
+    """
+    P²アルゴリズム（Jain & Chlamtac, 1985）で分位点の推定値を求める。保持する値は５つのみ。
+    ５件以下の場合は、全件から線形補間した正確な値を返す。要素がない場合はNoneを返す。
+    """
+
+    def __init__(self, q: float, selector: Callable[[Any], Any] = None):
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1.")
+        super().__init__(selector)
+        self.q = q
+        self.count = 0
+        self.heights: List[float] = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * q, 4 * q, 2 + 2 * q, 4]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, value):
+        self.count += 1
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= heights[k + 1]:
+                k += 1
+
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (
+                d <= -1 and positions[i - 1] - positions[i] < -1
+            ):
+                sign = 1 if d > 0 else -1
+                height = self._parabolic(i, sign)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, sign)
+                heights[i] = height
+                positions[i] += sign
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def result(self) -> Optional[float]:
+        heights = self.heights
+        if not heights:
+            return None
+
+        if self.count <= 5:
+            index = self.q * (len(heights) - 1)
+            lower = math.floor(index)
+            upper = min(lower + 1, len(heights) - 1)
+            return heights[lower] + (heights[upper] - heights[lower]) * (index - lower)
+
+        if self.q == 0:
+            return heights[0]
+        elif self.q == 1:
+            return heights[4]
+        return heights[2]
+
+    def copy(self):
+        return Quantile(self.q, self.selector)
+
+
+class Median(Quantile):
+    def __init__(self, selector: Callable[[Any], Any] = None):
+        super().__init__(0.5, selector)
+
+    def copy(self):
+        return Median(self.selector)
+
+
+class Mode(Aggregator):
+    """
+    Space-Savingアルゴリズムで最頻値を求める。保持する値はcapacity件までに制限される。
+    値の種類がcapacity以下の場合は正確な最頻値を返し、それを超える場合は出現回数の多い値の推定となる。
+    値を出現回数毎のバケットで管理する（stream-summary）ため、追加はO(1)で行える。
+    """
+
+    def __init__(self, selector: Callable[[Any], Any] = None, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError("capacity must be greater than 0.")
+        super().__init__(selector)
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        # 出現回数 -> その回数の値（挿入順を保つためdictを順序付き集合として使う）
+        self.buckets: Dict[int, Dict[Hashable, None]] = {}
+        self.min_count = 0
+
+    def add(self, value):
+        counts = self.counts
+        count = counts.get(value)
+        if count is None:
+            if len(counts) < self.capacity:
+                count = 0
+                self.min_count = 1
+            else:
+                # 出現回数が最も少ない値を置き換え、その回数を引き継ぐ
+                count = self.min_count
+                victim = next(iter(self.buckets[count]))
+                self.discard(victim, count)
+                del counts[victim]
+        else:
+            self.discard(value, count)
+
+        counts[value] = count + 1
+        self.buckets.setdefault(count + 1, {})[value] = None
+
+    def discard(self, value: Hashable, count: int):
+        """値をバケットから取り除く。最少回数のバケットが空になった場合、最少回数は１つ増える。"""
+        bucket = self.buckets[count]
+        del bucket[value]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = count + 1
+
+    def result(self) -> Any:
+        if not self.counts:
+            return None
+        return max(self.counts, key=self.counts.__getitem__)
+
+    def copy(self):
+        return Mode(self.selector, self.capacity)
+
+
+def aggregate(iterable, aggregators: Dict[str, Aggregator]) -> Dict[str, Any]:
+    """１回の走査で全ての集計器に要素を渡し、名前毎の集計結果を返す。渡した集計器の状態は変更しない。"""
+    states = [(name, x.copy()) for name, x in aggregators.items()]
+    plain = [x.add for _, x in states if x.selector is None]
+    selected = [(x.add, x.selector) for _, x in states if x.selector is not None]
+
+    for item in iterable:
+        for add in plain:
+            add(item)
+        for add, selector in selected:
+            add(selector(item))
+
+    return {name: x.result() for name, x in states}
@@ -92,3 +92,11 @@ async def startup_worker():
 async def shutdown_worker():
     """ワーカーを終了します"""
     await queueing.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    """取引所APIのコネクションプールをクローズします"""
+    import trade_api.clients
+
+    await trade_api.clients.shutdown()
@@ -17,7 +17,7 @@ logger = logging.getLogger(__name__)
 
 
 @app.command(help="日時ジョブスケジューラを起動し、市場情報の更新とデイリートレードを行います。")
-def start(immediate: bool =False):
+def start(immediate: bool =False, concurrency: int = 4):
     # import schedule  asyncが実装される予定だがまだ追加されていない
     from datetime import timedelta
 
@@ -32,7 +32,7 @@ def start(immediate: bool =False):
 
     async def exec_job():
         try:
-            await run_daily()
+            await run_daily(concurrency=concurrency)
         except Exception as e:
             logger.critical(traceback.format_exc())
 
@@ -49,8 +49,59 @@ def start(immediate: bool =False):
                 await exec_job()
                 break
 
+    async def run(coro):
+        import trade_api.clients
+
+        try:
+            await coro
+        finally:
+            await trade_api.clients.shutdown()
+
     if immediate:
-        asyncio.run(exec_job())
+        asyncio.run(run(exec_job()))
     else:
-        asyncio.run(main())
-
+        asyncio.run(run(main()))
+
+
+
+@app.command(help="パラメータの組み合わせ毎にバックテストを行い、結果をファイル（.csv/.parquet）に出力します。")
+def sweep(
+    provider: str = "cryptowatch",
+    market: str = "bitflyer",
+    product: str = "btcfxjpy",
+    periods: int = 60 * 60 * 24,
+    analyzers: List[str] = typer.Option(["t_cross"], help="カンマ区切りのアナライザの組み合わせ。複数指定可"),
+    margin: List[float] = typer.Option([1000000]),
+    ask_limit_rate: List[float] = typer.Option([1.2]),
+    ask_stop_rate: List[float] = typer.Option([0.95]),
+    bid_limit_rate: List[float] = typer.Option([0.85]),
+    bid_stop_rate: List[float] = typer.Option([1.05]),
+    output: str = "sweep.csv",
+    workers: int = None,
+    top: int = 10,
+):
+    from magnet.database import get_db
+    from magnet.domain.trade.backtest import load_ohlc_frame
+    from magnet.domain.trade.sweep import SUMMARY_FIELDS, run_sweep
+
+    for db in get_db():
+        frame = load_ohlc_frame(
+            db, provider=provider, market=market, product=product, periods=periods
+        )
+
+    grid = dict(
+        analyzers=[x.split(",") for x in analyzers],
+        margin=margin,
+        ask_limit_rate=ask_limit_rate,
+        ask_stop_rate=ask_stop_rate,
+        bid_limit_rate=bid_limit_rate,
+        bid_stop_rate=bid_stop_rate,
+    )
+    base = dict(provider=provider, market=market, product=product, periods=periods)
+    ranked = run_sweep(frame, base, grid, output=output, max_workers=workers)
+
+    typer.echo(f"{len(ranked)} backtests ({len(frame)} candles) -> {output}")
+    for result in ranked[:top]:
+        params = {k: v for k, v in result.items() if k not in SUMMARY_FIELDS}
+        summary = " ".join(f"{k}={result[k]:.4g}" for k in SUMMARY_FIELDS)
+        typer.echo(f"{summary} {params}")
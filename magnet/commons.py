@@ -68,3 +68,5 @@ class EtlJobResult(BaseModel):
     errors: List[Any] = []
     error_summary: str = ""
     warning: str = ""
+    wall_time: float = 0
+    queue_time: float = 0
@@ -74,6 +74,36 @@ class DatabaseConfigCreate(EnvBase):
             POSTGRES_DB=self.POSTGRES_TEST_DB,
         )
 
+    @property
+    def sqlalchemy_database_async_url(self) -> str:
+        return self.sqlalchemy_database_url.replace(
+            "postgresql://", "postgresql+asyncpg://", 1
+        )
+
+    @property
+    def sqlalchemy_database_async_test_url(self) -> str:
+        return self.sqlalchemy_database_test_url.replace(
+            "postgresql://", "postgresql+asyncpg://", 1
+        )
+
+
+class DatabasePoolConfigCreate(EnvBase):
+    POSTGRES_POOL_SIZE: int = Field(5, description="コネクションプールで保持する接続数。")
+    POSTGRES_MAX_OVERFLOW: int = Field(10, description="プールの接続数を超えて一時的に作成できる接続数。")
+    POSTGRES_POOL_RECYCLE: int = Field(1800, description="接続を再作成するまでの秒数。-1の場合は再作成しません。")
+    POSTGRES_STATEMENT_CACHE_SIZE: int = Field(
+        100,
+        description="非同期接続（asyncpg）で接続毎にキャッシュするプリペアドステートメント数。pgbouncer経由の場合は0にしてください。",
+    )
+
+    @property
+    def sqlalchemy_pool_options(self) -> dict:
+        return dict(
+            pool_size=self.POSTGRES_POOL_SIZE,
+            max_overflow=self.POSTGRES_MAX_OVERFLOW,
+            pool_recycle=self.POSTGRES_POOL_RECYCLE,
+        )
+
 
 class RabbitmqConfigCreate(EnvBase):
     RABBITMQ_HOST: str
@@ -141,6 +171,7 @@ config_create_mixins = reversed(
         ModeConfigCreate,
         ContainerConfigCreate,
         DatabaseConfigCreate,
+        DatabasePoolConfigCreate,
         RabbitmqConfigCreate,
         LogConfigCreate,
         UserAccessTokenConfigCreate,
@@ -159,6 +190,7 @@ class AllConfigCreate(*config_create_mixins):
 ModeConfig = ModeConfigCreate.prefab(name="ModeConfig", requires=...)
 ContainerConfig = ContainerConfigCreate.prefab(name="ContainerConfig", requires=...)
 DatabaseConfig = DatabaseConfigCreate.prefab(name="DatabaseConfig", requires=...)
+DatabasePoolConfig = DatabasePoolConfigCreate.prefab(name="DatabasePoolConfig")
 RabbitmqConfig = RabbitmqConfigCreate.prefab(name="RabbitmqConfig", requires=...)
 LogConfig = LogConfigCreate.prefab(name="LogConfig")
 UserAccessTokenConfig = UserAccessTokenConfig
@@ -179,6 +211,7 @@ class AllConfig(
     UserAccessTokenConfig,
     LogConfig,
     RabbitmqConfig,
+    DatabasePoolConfig,
     DatabaseConfig,
     ContainerConfig,
 ):
@@ -1,17 +1,32 @@
 import json
 import logging
-from typing import TYPE_CHECKING, Callable, Iterable
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+)
 
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy import create_engine, or_
+from sqlalchemy.engine import Row, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Query, Session, sessionmaker
+from sqlalchemy.sql import Select
 
-from .config import DatabaseConfig
+from .config import DatabaseConfig, DatabasePoolConfig
 from .utils.objects import MyQuery
 
 logger = logging.getLogger(__name__)
 
+# サーバーサイドカーソルから１度に取得する行数
+STREAM_BATCH_SIZE = 10000
+
 
 def json_dumps(dic: dict):
     dic = jsonable_encoder(dic)
@@ -42,7 +57,46 @@ def create_get_db(session_maker) -> Callable[[], Iterable[Session]]:
     return get_db
 
 
-def create_db_engine(connection_string):
+def create_get_async_db(session_maker) -> Callable[[], AsyncIterator[AsyncSession]]:
+    async def get_async_db() -> AsyncIterator[AsyncSession]:
+        db: AsyncSession = session_maker()
+        try:
+            yield db
+            await db.commit()
+        except Exception as e:
+            try:
+                await db.rollback()
+            except Exception as e:
+                logger.critical(e, exc_info=True)
+            raise
+        finally:
+            # noinspection PyBroadException
+            try:
+                await db.close()
+            except Exception as e:
+                logger.critical(e, exc_info=True)
+
+    return get_async_db
+
+
+def iter_partitions(
+    db: Session, stmt: Select, batch_size: int = STREAM_BATCH_SIZE
+) -> Iterator[List[Row]]:
+    """
+    stmtをサーバーサイドカーソルで実行し、batch_size行毎に返す。
+    列を選択した文であればORMのエンティティを生成せずidentity mapも経由しないため、結果の件数に関わらずメモリ使用量はbatch_sizeに比例する。
+    サーバーサイドカーソルに対応しないドライバ（sqliteなど）では、通常のカーソルで実行する。
+    """
+    result = db.execute(
+        stmt.execution_options(stream_results=True, max_row_buffer=batch_size)
+    )
+    try:
+        yield from result.partitions(batch_size)
+    finally:
+        result.close()
+
+
+def create_db_engine(connection_string, **pool_options):
     # TODO: トランザクション分離レベルの設定とテストをする。postgreSQLのデフォルトトランザクション分離レベルはread committedです。
     # read committedは、コミットされていないデータの最新情報やレコードを、異なるトランザクションから参照することができません。
     #  https://docs.sqlalchemy.org/en/13/dialects/postgresql.html?highlight=dialect#transaction-isolation-level
@@ -51,9 +105,8 @@ def create_db_engine(connection_string):
         connection_string,
         connect_args={"options": "-c timezone=utc"},
         json_serializer=json_dumps,
-        # コネクションプール設定
-        # poolclass=QueuePool, pool_size= max_overflow
         future=True,  # sqlalchemy2.0モードにする
+        **pool_options,  # コネクションプール設定（pool_size, max_overflow, pool_recycle）
     )
     session_maker = sessionmaker(
         autocommit=False, autoflush=False, bind=engine, query_cls=MyQuery
@@ -62,6 +115,37 @@ def create_db_engine(connection_string):
     return engine, _get_db
 
 
+def create_async_db_engine(
+    connection_string, statement_cache_size: int = 100, **pool_options
+) -> Tuple[AsyncEngine, sessionmaker]:
+    """
+    asyncpgを利用する非同期エンジンと、AsyncSessionを生成するsessionmakerを返す。
+    コミット後も取得済みの属性を参照できるように、expire_on_commit=Falseとする。
+    """
+    # asyncpgとSQLAlchemyのasyncpgドライバは、それぞれプリペアドステートメントをキャッシュする
+    url = make_url(connection_string).update_query_dict(
+        {"prepared_statement_cache_size": str(statement_cache_size)}
+    )
+    engine = create_async_engine(
+        url,
+        connect_args={
+            "server_settings": {"timezone": "utc"},
+            "statement_cache_size": statement_cache_size,
+        },
+        json_serializer=json_dumps,
+        **pool_options,
+    )
+    session_maker = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        query_cls=MyQuery,
+    )
+    return engine, session_maker
+
+
 def create_db(connection_string):
     from sqlalchemy_utils import create_database
 
@@ -82,7 +166,25 @@ def drop_db(connection_string):
 
 # initialize
 env = DatabaseConfig()
-engine, get_db = create_db_engine(env.sqlalchemy_database_url)
+pool_env = DatabasePoolConfig()
+engine, get_db = create_db_engine(
+    env.sqlalchemy_database_url, **pool_env.sqlalchemy_pool_options
+)
+
+
+@lru_cache(maxsize=None)
+def get_async_session_maker() -> sessionmaker:
+    """非同期エンジンはasyncpgを必要とするため、最初に利用する時点で生成する。"""
+    async_engine, session_maker = create_async_db_engine(
+        env.sqlalchemy_database_async_url,
+        statement_cache_size=pool_env.POSTGRES_STATEMENT_CACHE_SIZE,
+        **pool_env.sqlalchemy_pool_options,
+    )
+    return session_maker
+
+
+# コルーチンから利用するセッション。FastAPIのDependsにも指定できる
+get_async_db = create_get_async_db(lambda: get_async_session_maker()())
 
 
 if TYPE_CHECKING:
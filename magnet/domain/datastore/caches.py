@@ -0,0 +1,91 @@
+"""
+パーティション（provider, market, product, periods）毎に直近のローソク足をメモリに保持し、BOTが前日のOHLCを参照する際のクエリを省く。
+ETLは書き込んだローソク足をセッションに予約し、コミットした時点でキャッシュに反映する（ロールバックした場合は破棄する）。
+キャッシュに存在しない日付のみ、呼び出し元がデータストアに問い合わせる。
+"""
+import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .schemas import Ohlc
+
+# パーティション毎に保持するローソク足の件数
+LATEST_SIZE = 30
+PENDING_KEY = "latest_ohlc_pending"
+
+Partition = Tuple[str, str, str, int]
+
+
+def partition_key(provider: str, market: str, product: str, periods: int) -> Partition:
+    return (provider, market, product, periods)
+
+
+class LatestOhlcCache:
+    def __init__(self, size: int = LATEST_SIZE):
+        self.size = size
+        self.partitions: Dict[Partition, Dict[datetime.date, Ohlc]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, partition: Partition, open_time: datetime.date) -> Optional[Ohlc]:
+        ohlc = self.partitions.get(partition, {}).get(open_time)
+        if ohlc is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return ohlc
+
+    def put(
+        self,
+        partition: Partition,
+        rows: Iterable[Ohlc],
+        since: datetime.date = None,
+    ):
+        """
+        ローソク足を登録し、open_timeの新しい順にsize件を残す。
+        sinceを指定した場合は、データストアで洗い替えられたclose_timeがsince以降のローソク足を先に破棄する。
+        """
+        current = self.partitions.get(partition, {})
+        if since is not None:
+            current = {k: v for k, v in current.items() if v.close_time < since}
+        for ohlc in rows:
+            current[ohlc.open_time] = ohlc
+
+        latest = sorted(current, reverse=True)[: self.size]
+        self.partitions[partition] = {k: current[k] for k in latest}
+
+    def put_on_commit(
+        self,
+        db: Session,
+        partition: Partition,
+        rows: Iterable[Ohlc],
+        since: datetime.date = None,
+    ):
+        """dbのコミット後にputする。ロールバックした場合は登録しない。"""
+        db.info.setdefault(PENDING_KEY, []).append((self, partition, list(rows), since))
+
+    def invalidate(self, partition: Partition = None):
+        """partitionのローソク足を破棄する。Noneの場合は全て破棄する。"""
+        if partition is None:
+            self.partitions.clear()
+        else:
+            self.partitions.pop(partition, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(hits=self.hits, misses=self.misses, size=len(self.partitions))
+
+
+latest_ohlc_cache = LatestOhlcCache()
+
+
+@event.listens_for(Session, "after_commit")
+def apply_pending_ohlc(session: Session):
+    for cache, partition, rows, since in session.info.pop(PENDING_KEY, ()):
+        cache.put(partition, rows, since)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_pending_ohlc(session: Session):
+    session.info.pop(PENDING_KEY, None)
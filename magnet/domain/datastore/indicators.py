@@ -0,0 +1,82 @@
+"""
+OHLCのテクニカル指標を、パーティション（provider, market, product, periods）単位で一括計算する。
+行毎にpydanticオブジェクトへ書き戻すのではなく、列（numpy配列）単位で全ての指標を計算する。
+計算結果は`schemas.Ohlc`のクラスメソッド群（compute_sma_and_cross, compute_wb_cs, compute_rsi）と同一になる。
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+SMA_WINDOWS = (5, 10, 15, 20, 25, 30, 200)
+RSI_WINDOW = 14
+
+# SMA200を正しく計算するために必要な過去のローソク足の数
+WARMUP_PERIODS = max(SMA_WINDOWS)
+
+# floatで計算し、レコード化する時にDecimalへ変換する列
+DECIMAL_COLUMNS = ("wb_cs", "wb_cs_rate", "t_sma_rate", "t_rsi_14")
+QUANTIZE_COLUMNS = {"wb_cs_rate": Decimal("0.01"), "t_sma_rate": Decimal("0.01")}
+
+
+def compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    close_timeの昇順に並んだ１パーティション分のOHLCから、全ての指標を計算したフレームを返す。
+    入力フレームにはopen_priceとclose_priceが必要。入力フレームは変更されない。
+    Decimal列はfloatのまま保持されるため、レコードとして取り出す場合はto_recordsを利用すること。
+    """
+    result = df.reset_index(drop=True)
+    close = result["close_price"].astype("float64")
+    open_ = result["open_price"].astype("float64")
+    columns: Dict[str, Any] = {}
+
+    # 単純移動平均
+    for window in SMA_WINDOWS:
+        columns[f"t_sma_{window}"] = close.rolling(window, min_periods=1).mean()
+
+    # ゴールデンクロス・デッドクロス検知　前回と同じクロス状態は0とする
+    sma_5 = columns["t_sma_5"].to_numpy()
+    sma_25 = columns["t_sma_25"].to_numpy()
+    cross = (sma_5 > sma_25).astype("int64") - (sma_5 < sma_25).astype("int64")
+    previous = np.concatenate((np.zeros(1, dtype="int64"), cross[:-1]))
+    columns["t_cross"] = np.where(cross == previous, 0, cross)
+    columns["t_sma_rate"] = sma_5 * 2 / (sma_5 + sma_25)
+
+    # 陽線陰線
+    wb_cs = close - open_
+    columns["wb_cs"] = wb_cs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["wb_cs_rate"] = np.where(open_ != 0, close / open_, 0.0)
+
+    # RSI 上げ幅の合計÷(上げ幅の合計+下げ幅の合計)
+    up = wb_cs.mask(wb_cs < 0, 0.0)
+    down = wb_cs.mask(wb_cs > 0, 0.0).abs()
+    up_sma = up.rolling(RSI_WINDOW, min_periods=1).mean()
+    down_sma = down.rolling(RSI_WINDOW, min_periods=1).mean()
+    rs = (up_sma / (up_sma + down_sma)).round(2)
+    columns["t_rsi_14"] = rs.replace([np.inf, -np.inf], 0.5)  # 無限は0.5とする
+
+    for name, values in columns.items():
+        result[name] = values
+
+    return result
+
+
+def to_decimal(values: Iterable[float], point: Decimal = None) -> List[Decimal]:
+    """pydanticの代入時の変換（Decimal(str(v))）と同一の規則でDecimalへ変換し、指定があれば四捨五入する。"""
+    if point is None:
+        return [Decimal(str(v)) for v in values]
+    else:
+        return [Decimal(str(v)).quantize(point, rounding=ROUND_HALF_UP) for v in values]
+
+
+def to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """compute_indicatorsの結果を、モデルにそのまま渡せる辞書のリストに変換する。"""
+    columns = {name: df[name].tolist() for name in df.columns}
+    for name in DECIMAL_COLUMNS:
+        if name in columns:
+            columns[name] = to_decimal(columns[name], QUANTIZE_COLUMNS.get(name))
+
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
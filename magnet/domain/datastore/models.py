@@ -1,12 +1,14 @@
 import datetime
-from typing import Iterator, Literal
+from typing import Iterator, List, Literal, Sequence, Union
 
+import pandas as pd
 import sqlalchemy as sa
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Query
 
 from framework import DateTimeAware
 
-from ...database import Base, Session
+from ...database import STREAM_BATCH_SIZE, Base, Session, iter_partitions
 
 
 class CryptoPair(Base):
@@ -68,6 +70,14 @@ class CryptoOhlc(Base, CryptoBase):
     __table_args__ = (
         sa.UniqueConstraint("provider", "market", "product", "periods", "close_time"),
         sa.Index("uix_query", "provider", "market", "product", "periods"),
+        sa.Index(
+            "ix_query_open_time",
+            "provider",
+            "market",
+            "product",
+            "periods",
+            "open_time",
+        ),
     )
 
     @classmethod
@@ -82,8 +92,9 @@ class CryptoOhlc(Base, CryptoBase):
         after: DateTimeAware = DateTimeAware(2010, 1, 1),
         until: datetime.date = None,
         order_by: Literal["asc", "desc"] = "asc",
+        batch_size: int = STREAM_BATCH_SIZE,
     ) -> Iterator[DateTimeAware]:
-        """指定した領域内の日付を返す。"""
+        """指定した領域内のローソク足の開始日（open_time）を返す。サーバーサイドカーソルでbatch_size行毎に読み込む。"""
         if provider != "cryptowatch":
             raise ValueError()
 
@@ -91,26 +102,110 @@ class CryptoOhlc(Base, CryptoBase):
             raise ValueError()
 
         if order_by == "asc":
-            sort = cls.start_time.asc()
+            sort = cls.open_time.asc()
         elif order_by == "desc":
-            sort = cls.start_time.desc()
+            sort = cls.open_time.desc()
         else:
             raise ValueError()
 
-        query = db.query(cls.start_time).filter(
+        stmt = sa.select(cls.__table__.c.open_time).where(
             cls.provider == provider,
             cls.market == market,
             cls.product == product,
             cls.periods == 60 * 60 * 24,
-            cls.start_time >= after,
+            cls.open_time >= after,
         )
         if until is not None:
-            query = query.filter(cls.start_time < until)
+            stmt = stmt.where(cls.open_time < until)
 
         def date_to_datetime(dt):
             return DateTimeAware.combine(dt, DateTimeAware.min.time())
 
-        return (date_to_datetime(x.start_time) for x in query.order_by(sort))
+        return (
+            date_to_datetime(open_time)
+            for rows in iter_partitions(db, stmt.order_by(sort), batch_size)
+            for (open_time,) in rows
+        )
+
+    @classmethod
+    def Q_select_last_close_time(
+        cls,
+        db: Session,
+        *,
+        provider: str,
+        market: str,
+        product: str,
+        periods: int,
+    ) -> Union[datetime.date, None]:
+        """パーティション内で最新のclose_timeを返す。レコードが存在しない場合はNoneを返す。"""
+        return (
+            db.query(sa.func.max(cls.close_time))
+            .filter(
+                cls.provider == provider,
+                cls.market == market,
+                cls.product == product,
+                cls.periods == periods,
+            )
+            .scalar()
+        )
+
+    @classmethod
+    def Q_select_warmup(
+        cls,
+        db: Session,
+        *,
+        provider: str,
+        market: str,
+        product: str,
+        periods: int,
+        until: datetime.date,
+        limit: int,
+    ) -> "List[CryptoOhlc]":
+        """指標の再計算に必要な、指定日より前の直近limit件をclose_timeの昇順で返す。"""
+        query = (
+            db.query(cls)
+            .filter(
+                cls.provider == provider,
+                cls.market == market,
+                cls.product == product,
+                cls.periods == periods,
+                cls.close_time < until,
+            )
+            .order_by(cls.close_time.desc())
+            .limit(limit)
+        )
+        return list(reversed(query.all()))
+
+    @classmethod
+    def where_close_date_range(
+        cls,
+        provider: str,
+        market: str,
+        product: str,
+        periods: int,
+        after: DateTimeAware = DateTimeAware(2010, 1, 1),
+        until: datetime.date = None,
+    ) -> list:
+        """パーティション内のclose_timeがafter以上until以下の行を選択する条件を返す。"""
+        conditions = [
+            cls.provider == provider,
+            cls.market == market,
+            cls.product == product,
+            cls.periods == periods,
+            cls.close_time >= after,
+        ]
+        if until is not None:
+            conditions.append(cls.close_time <= until)
+        return conditions
+
+    @classmethod
+    def sort_close_time(cls, order_by: Literal["asc", "desc"] = "asc"):
+        if order_by == "asc":
+            return cls.close_time.asc()
+        elif order_by == "desc":
+            return cls.close_time.desc()
+        else:
+            raise Exception()
 
     # TODO: closetimeは難しいのでstart_timeに移植して削除する
     @classmethod
@@ -126,25 +221,67 @@ class CryptoOhlc(Base, CryptoBase):
         until: datetime.date = None,
         order_by: Literal["asc", "desc"] = "asc",
     ) -> "Query[CryptoOhlc]":
-        # m = models.CryptoOhlc
-        if order_by == "asc":
-            sort = cls.close_time.asc()
-        elif order_by == "desc":
-            sort = cls.close_time.desc()
-        else:
-            raise Exception()
-
+        """
+        ORMのエンティティを返すクエリ。全件を読み込むとパーティションの全行がidentity mapに保持されるため、
+        大きな範囲を走査する場合はQ_stream_close_date_rangeを利用する。
+        """
+        sort = cls.sort_close_time(order_by)
         query = db.query(cls).filter(
-            cls.provider == provider,
-            cls.market == market,
-            cls.product == product,
-            cls.periods == periods,
-            cls.close_time >= after,
+            *cls.where_close_date_range(
+                provider, market, product, periods, after=after, until=until
+            )
         )
-        if until is not None:
-            query = query.filter(cls.close_time <= until)
         return query.order_by(sort)
 
+    @classmethod
+    def Q_stream_close_date_range_batches(
+        cls,
+        db: Session,
+        *,
+        provider: str,
+        market: str,
+        product: str,
+        periods: int,
+        after: DateTimeAware = DateTimeAware(2010, 1, 1),
+        until: datetime.date = None,
+        order_by: Literal["asc", "desc"] = "asc",
+        columns: Sequence[str] = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> Iterator[List[Row]]:
+        """
+        Q_select_close_date_rangeと同じ範囲の列のみを、サーバーサイドカーソルでbatch_size行毎のタプルのリストとして返す。
+        columnsを省略した場合は、id以外の全ての列を返す。
+        """
+        if columns is None:
+            selected = [c for c in cls.__table__.columns if c.key != "id"]
+        else:
+            selected = [cls.__table__.columns[x] for x in columns]
+
+        stmt = (
+            sa.select(*selected)
+            .where(
+                *cls.where_close_date_range(
+                    provider, market, product, periods, after=after, until=until
+                )
+            )
+            .order_by(cls.sort_close_time(order_by))
+        )
+        return iter_partitions(db, stmt, batch_size)
+
+    @classmethod
+    def Q_stream_close_date_range(cls, db: Session, **kwargs) -> Iterator[Row]:
+        """Q_stream_close_date_range_batchesの結果を、１行ずつタプルとして返す。"""
+        for rows in cls.Q_stream_close_date_range_batches(db, **kwargs):
+            yield from rows
+
+    @classmethod
+    def Q_stream_close_date_range_frames(
+        cls, db: Session, **kwargs
+    ) -> Iterator[pd.DataFrame]:
+        """Q_stream_close_date_range_batchesの結果を、batch_size行毎のDataFrameとして返す。"""
+        for rows in cls.Q_stream_close_date_range_batches(db, **kwargs):
+            yield pd.DataFrame.from_records(rows, columns=rows[0]._fields)
+
 
 class WebArchiveBase:
     id = sa.Column(sa.Integer, primary_key=True)
@@ -195,3 +332,9 @@ class EtlJobResult(Base):
     errors = sa.Column(sa.JSON, nullable=False, default=[])
     error_summary = sa.Column(sa.Text, nullable=False)
     warning = sa.Column(sa.Text, nullable=False)
+    wall_time = sa.Column(
+        sa.Float, nullable=False, default=0, comment="ジョブの開始からコミットまでの秒数"
+    )
+    queue_time = sa.Column(
+        sa.Float, nullable=False, default=0, comment="ジョブの実行要求から開始までの秒数"
+    )
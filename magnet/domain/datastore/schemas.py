@@ -7,6 +7,7 @@ import numpy as np
 from framework import DateTimeAware, Linq
 
 from ...commons import BaseModel
+from . import indicators
 
 
 # どこも使ってないかも
@@ -56,6 +57,19 @@ class Ohlc(CryptoBase):
     class Config:
         orm_mode = True
 
+    @classmethod
+    def compute_indicators(cls, ohlc_arr: Iterable["Ohlc"]) -> "List[Ohlc]":
+        """
+        compute_sma_and_cross compute_wb_cs compute_rsiと同じ指標を、列単位で一括計算する。
+        計算はindicators.compute_indicatorsで行い、Ohlcは結果の受け渡し時のみ生成する。
+        """
+        df = Linq(ohlc_arr).to_dataframe(cls)
+        if df.empty:
+            return []
+
+        records = indicators.to_records(indicators.compute_indicators(df))
+        return [cls.construct(**x) for x in records]
+
     @classmethod
     def compute_wb_cs(cls, ohlc_arr: Iterable["Ohlc"]) -> "Iterable[Ohlc]":
         """
@@ -1,11 +1,10 @@
-from typing import List
-
 from fastapi import Depends
 
 from pandemic import APIRouter
 
 from ...commons import PagenationQuery
 from ...database import Session, get_db
+from ...utils.serializers import FastJSONResponse
 from . import models, schemas
 
 router = APIRouter()
@@ -15,11 +14,11 @@ DummyService = models.Dummy.as_service()
 
 class Dummy:
     @staticmethod
-    @router.get("/")
+    @router.get("/", response_class=FastJSONResponse)
     async def index(
         db: Session = Depends(get_db), *, q: PagenationQuery
-    ) -> List[schemas.Dummy]:
-        return DummyService.index(db, skip=q.skip, limit=q.limit)
+    ) -> FastJSONResponse:
+        return FastJSONResponse(DummyService.index(db, skip=q.skip, limit=q.limit))
 
     @staticmethod
     @router.post("/")
@@ -2,11 +2,16 @@ import asyncio
 import logging
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict, List, Literal, Type
+from typing import TYPE_CHECKING, Dict, Hashable, List, Literal, Type
+
+import numpy as np
 
 from .models import TradeProfile
 from .schemas import BuyAndSellSignal, DealMessage, PreOrder, TradeResult
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +25,10 @@ class BrokerImpl(HasName):
     def __init__(self, broker):
         self.client = broker
 
+    def get_account(self) -> Hashable:
+        """口座の識別子を返す。同じ口座への発注は直列化される。"""
+        return self.get_name()
+
     def get_test_broker(self):
         return TestBroker(self)
 
@@ -33,6 +42,9 @@ class BrokerImpl(HasName):
     async def get_ticker(self, product_code):
         raise NotImplementedError()
 
+    async def get_board(self, product_code):
+        raise NotImplementedError()
+
     async def order_test(self):
         raise NotImplementedError()
 
@@ -77,6 +89,31 @@ class BrokerImpl(HasName):
         raise NotImplementedError()
 
 
+_account_locks: Dict[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Lock]] = {}
+
+
+def get_account_lock(broker: BrokerImpl) -> asyncio.Lock:
+    """口座毎のロックを返す。証拠金を二重に使用しないように、同じ口座の取引はこのロックで直列化する。"""
+    # ロックはイベントループに紐づくため、ループ毎に管理する
+    loop = asyncio.get_running_loop()
+    locks = _account_locks.get(loop)
+    if locks is None:
+        discard_closed_loops()
+        locks = _account_locks[loop] = {}
+
+    account = broker.get_account()
+    lock = locks.get(account)
+    if lock is None:
+        lock = locks[account] = asyncio.Lock()
+    return lock
+
+
+def discard_closed_loops():
+    """終了したイベントループのロックを破棄し、ループへの参照を解放する。"""
+    for loop in [x for x in _account_locks if x.is_closed()]:
+        del _account_locks[loop]
+
+
 @dataclass
 class TopicProvider(HasName):
     profile: TradeProfile
@@ -121,6 +158,21 @@ class Analyzer(HasName):
 
         return msg
 
+    def analyze_frame(self, frame: "pd.DataFrame") -> "np.ndarray":
+        """
+        バックテスト用に、OHLCのフレームの各行（前日のローソク足）に対する判断を一括で算出する。
+        判断は 買:1 売:-1 クローズ:0 判断なし:nan のfloat配列で返す。
+        """
+        raise NotImplementedError()
+
+    def signals(self, frame: "pd.DataFrame") -> "np.ndarray":
+        """analyze_frameの結果を返す。invert（反転）オプションが有効な時は、買いと売りを反転させる。"""
+        signals = np.asarray(self.analyze_frame(frame), dtype="float64")
+        if not self.invert:
+            return signals
+
+        return signals * -1 + 0.0  # -0.0を0.0にする
+
 
 class TestBroker:
     def __init__(self, broker: BrokerImpl):
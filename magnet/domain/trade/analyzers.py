@@ -1,6 +1,8 @@
 # from .stream import BuyAndSellSignal, DealMessage, Topic
 import random
 
+import numpy as np
+
 from pytrade.stream import BuyAndSellSignal, DealMessage
 
 from .abc import Analyzer
@@ -22,6 +24,9 @@ class EmptyAnalyzer(Analyzer):
     async def analyze(self, topic):
         return None
 
+    def analyze_frame(self, frame):
+        return np.full(len(frame), np.nan)
+
 
 @AnalyzersRepository.register
 class AlwaysBuyAnalyzer(Analyzer):
@@ -39,6 +44,9 @@ class AlwaysBuyAnalyzer(Analyzer):
             target_price=last_traded_price,
         )
 
+    def analyze_frame(self, frame):
+        return np.ones(len(frame))
+
 
 @AnalyzersRepository.register
 class AlwaysCloseAnalyzer(Analyzer):
@@ -50,6 +58,9 @@ class AlwaysCloseAnalyzer(Analyzer):
     async def analyze(self, topic):
         return DealMessage(buy_and_sell=BuyAndSellSignal.CLOSE, reason="always_close")
 
+    def analyze_frame(self, frame):
+        return np.zeros(len(frame))
+
 
 @AnalyzersRepository.register
 class TransitionalAnalyzer(Analyzer):
@@ -88,6 +99,10 @@ class TransitionalAnalyzer(Analyzer):
         else:
             raise Exception()
 
+    def analyze_frame(self, frame):
+        # 分析の度に buy sell close と遷移する
+        return np.resize([1.0, -1.0, 0.0], len(frame))
+
 
 @AnalyzersRepository.register
 class TCrossAnalyzer(Analyzer):
@@ -119,3 +134,9 @@ class TCrossAnalyzer(Analyzer):
         return DealMessage(
             buy_and_sell=decision, reason="t_cross", target_price=ohlc.close_price
         )
+
+    def analyze_frame(self, frame):
+        t_cross = frame["t_cross"].to_numpy()
+        if not np.isin(t_cross, [-1, 0, 1]).all():
+            raise Exception()
+        return np.where(t_cross == 0, np.nan, t_cross).astype("float64")
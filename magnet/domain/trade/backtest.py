@@ -0,0 +1,254 @@
+"""
+TradeProfileのバックテストをメモリ上で行う。
+CryptoOhlcのパーティションを一度だけ読み込み、各Analyzerの判断をanalyze_frameで一括算出した後、
+配列を１回走査してエントリー・反対売買・リミット/ストップの約定を再現する。
+
+判断のタイミングはBotと同じく、各ローソク足の確定時（close_time）に前日のローソク足から判断し、その終値で成行約定するとみなす。
+リミット/ストップは、エントリー後のローソク足の高値・安値で判定し、同一足で両方に達した場合はストップを優先する。
+窓を開けて価格を超えた場合は、始値で約定するとみなす。
+"""
+from dataclasses import dataclass, field
+from decimal import ROUND_DOWN, Decimal
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from framework import DateTimeAware
+
+from ...database import Session
+from ..datastore.models import CryptoOhlc
+from .abc import Analyzer
+from .models import TradeLog
+from .repository import AnalyzersRepository
+
+OHLC_COLUMNS = ("open_price", "high_price", "low_price", "close_price")
+
+
+def load_ohlc_frame(
+    db: Session, *, provider: str, market: str, product: str, periods: int
+) -> pd.DataFrame:
+    """パーティション全体をclose_timeの昇順で読み込む。"""
+    m = CryptoOhlc
+    columns = [c for c in m.__table__.columns if c.key not in ("id",)]
+    query = (
+        db.query(*columns)
+        .filter(
+            m.provider == provider,
+            m.market == market,
+            m.product == product,
+            m.periods == periods,
+        )
+        .order_by(m.close_time.asc())
+    )
+    frame = pd.DataFrame(query.all(), columns=[c.key for c in columns])
+    for name in ("wb_cs", "wb_cs_rate", "t_sma_rate", "t_rsi_14"):
+        frame[name] = frame[name].astype("float64")
+    return frame
+
+
+def combine_signals(signals: Sequence[np.ndarray], size: int) -> np.ndarray:
+    """Bot.make_decisionと同様に、analyzersの並び順で最初に判断したシグナルを採用する。"""
+    result = np.full(size, np.nan)
+    for x in signals:
+        result = np.where(np.isnan(result), x, result)
+    return result
+
+
+def calc_amount(budget: float, price: float, min_unit: float = 0.01) -> float:
+    """PreOrder.calc_amountと同じく、予算内で発注可能な数量を最小単位で切り捨てて返す。"""
+    if price <= 0:
+        return 0.0
+    amount = Decimal(str(budget)) / Decimal(str(price))
+    return float(amount.quantize(Decimal(str(min_unit)), rounding=ROUND_DOWN))
+
+
+def to_datetime(value) -> DateTimeAware:
+    value = pd.Timestamp(value)
+    return DateTimeAware(value.year, value.month, value.day)
+
+
+@dataclass
+class BacktestResult:
+    trades: List[Dict[str, Any]]
+    close_time: np.ndarray
+    equity: np.ndarray = field(repr=False)
+
+    @property
+    def fact_profit(self) -> float:
+        return float(sum(x["fact_profit"] for x in self.trades))
+
+    @property
+    def max_drawdown(self) -> float:
+        """資産曲線の最大下落幅"""
+        if len(self.equity) == 0:
+            return 0.0
+        return float((np.maximum.accumulate(self.equity) - self.equity).max())
+
+    @property
+    def win_rate(self) -> float:
+        if not self.trades:
+            return 0.0
+        return sum(x["fact_profit"] > 0 for x in self.trades) / len(self.trades)
+
+    def summary(self) -> Dict[str, Any]:
+        return dict(
+            trades=len(self.trades),
+            fact_profit=self.fact_profit,
+            max_drawdown=self.max_drawdown,
+            win_rate=self.win_rate,
+        )
+
+    def to_trade_logs(self, profile) -> List[TradeLog]:
+        """バックテストの結果をTradeLogに変換する。"""
+        logs = []
+        for trade in self.trades:
+            values = {
+                k: Decimal(str(v)) if isinstance(v, float) else v
+                for k, v in trade.items()
+                if k not in ("profit", "profit_rate", "fact_profit", "fact_profit_rate")
+            }
+            values["entry_at"] = to_datetime(trade["entry_at"])
+            values["counter_at"] = to_datetime(trade["counter_at"])
+            log = TradeLog(
+                profile_id=profile.id,
+                profile_version=profile.version,
+                profile_name=profile.name,
+                is_back_test=True,
+                provider=profile.provider,
+                market=profile.market,
+                product=profile.product,
+                periods=profile.periods,
+                **values,
+            )
+            log.update_properties()
+            logs.append(log)
+        return logs
+
+
+def simulate(
+    frame: pd.DataFrame,
+    signals: np.ndarray,
+    *,
+    margin: float,
+    ask_limit_rate: float = None,
+    ask_stop_rate: float = None,
+    bid_limit_rate: float = None,
+    bid_stop_rate: float = None,
+    commission_rate: float = 0.0,
+) -> BacktestResult:
+    """シグナルに従って売買を再現する。"""
+    close_time = frame["close_time"].to_numpy()
+    open_, high, low, close = (
+        frame[x].to_numpy(dtype="float64").tolist() for x in OHLC_COLUMNS
+    )
+    signals = signals.tolist()
+    rates = {1: (ask_limit_rate, ask_stop_rate), -1: (bid_limit_rate, bid_stop_rate)}
+
+    trades: List[Dict[str, Any]] = []
+    equity = np.empty(len(close))
+    realized = 0.0
+
+    side = 0
+    size = entry_price = entry_index = limit_price = stop_price = None
+    entry_reason = ""
+
+    def exit_position(index: int, price: float, reason: str):
+        nonlocal side, realized
+        entry_commission = entry_price * size * commission_rate
+        counter_commission = price * size * commission_rate
+        profit = (price - entry_price) * side
+        fact_profit = profit * size - entry_commission - counter_commission
+        trades.append(
+            dict(
+                side=side,
+                size=size,
+                entry_at=close_time[entry_index],
+                counter_at=close_time[index],
+                entry_price=entry_price,
+                entry_commission=entry_commission,
+                entry_other_commission=0.0,
+                entry_reason=entry_reason,
+                counter_price=price,
+                counter_commission=counter_commission,
+                counter_other_commission=0.0,
+                counter_reason=reason,
+                profit=profit,
+                profit_rate=price / entry_price if side == 1 else entry_price / price,
+                fact_profit=fact_profit,
+                fact_profit_rate=fact_profit / (entry_price * size),
+            )
+        )
+        realized += fact_profit
+        side = 0
+
+    for i in range(len(close)):
+        # エントリー後の足でリミット・ストップを判定する
+        if side and i > entry_index and limit_price is not None:
+            if side == 1:
+                if low[i] <= stop_price:
+                    exit_position(i, min(open_[i], stop_price), "stop")
+                elif high[i] >= limit_price:
+                    exit_position(i, max(open_[i], limit_price), "limit")
+            else:
+                if high[i] >= stop_price:
+                    exit_position(i, max(open_[i], stop_price), "stop")
+                elif low[i] <= limit_price:
+                    exit_position(i, min(open_[i], limit_price), "limit")
+
+        signal = signals[i]
+        if signal == signal and signal != side:  # nanは判断なし
+            price = close[i]
+            if side:
+                exit_position(i, price, "signal")
+
+            if signal != 0 and (amount := calc_amount(margin, price)) > 0:
+                side = int(signal)
+                size = amount
+                entry_price = price
+                entry_index = i
+                entry_reason = "signal"
+                limit_rate, stop_rate = rates[side]
+                if limit_rate is None or stop_rate is None:
+                    limit_price = stop_price = None
+                else:
+                    limit_price = price * limit_rate
+                    stop_price = price * stop_rate
+
+        unrealized = (close[i] - entry_price) * side * size if side else 0.0
+        equity[i] = realized + unrealized
+
+    return BacktestResult(trades=trades, close_time=close_time, equity=equity)
+
+
+def to_float(value):
+    return None if value is None else float(value)
+
+
+def run_backtest(
+    profile,
+    frame: pd.DataFrame,
+    analyzers: List[Analyzer] = None,
+    margin: float = None,
+    commission_rate: float = 0.0,
+) -> BacktestResult:
+    """
+    profileの設定（analyzers、margin、リミット・ストップ率）でバックテストを行う。
+    profileはTradeProfileまたは同じ属性を持つオブジェクトを受け付ける。
+    """
+    if analyzers is None:
+        analyzers = [
+            AnalyzersRepository.instantiate(analyzer_name=x) for x in profile.analyzers
+        ]
+
+    signals = combine_signals([x.signals(frame) for x in analyzers], len(frame))
+    return simulate(
+        frame,
+        signals,
+        margin=float(profile.margin if margin is None else margin),
+        ask_limit_rate=to_float(profile.ask_limit_rate),
+        ask_stop_rate=to_float(profile.ask_stop_rate),
+        bid_limit_rate=to_float(profile.bid_limit_rate),
+        bid_stop_rate=to_float(profile.bid_stop_rate),
+        commission_rate=commission_rate,
+    )
@@ -1,20 +1,120 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass, field
 from decimal import Decimal
-from typing import Any, List, Literal, Set, Type, Union
-
+from types import SimpleNamespace
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    NamedTuple,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+import sqlalchemy as sa
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import select
 
 from framework import DateTimeAware
 
-from ...database import get_db
-from .abc import Analyzer, BrokerImpl, TopicProvider
+from ...database import get_async_session_maker
+from .abc import Analyzer, BrokerImpl, TopicProvider, get_account_lock
 from .models import TradeBot, TradeLog, TradeProfile
 from .repository import AnalyzersRepository, BrokerRepository, TopicRepository
 from .schemas import BuyAndSellSignal, DealMessage, PreOrder, RemainOrder, TradeResult
 
 
+class TradeUnitOfWork:
+    """
+    取引サイクル全体で１つのセッションを利用し、TradeBotの状態遷移をまとめて書き込む。
+    stageした状態遷移はすぐにbot.stateへ反映し、データベースにはcommit時に１つのUPDATEで書き込む。
+    取引所への発注・キャンセルの結果は失うと復元できないため、受理した直後にcommitする。
+    例外が発生した場合は、commitしていない状態遷移を破棄してbot.stateを戻す。
+    それらはブローカーから再取得・再計算できるため、次のサイクルでやり直せばよい。
+    """
+
+    def __init__(self, bot: "Bot", db: AsyncSession):
+        self.bot = bot
+        self.db = db
+        self.values: Dict[str, Any] = {}
+        self.objects: List[Any] = []
+        self.committed = self.snapshot(bot.state)
+
+    @staticmethod
+    def snapshot(state: TradeBot) -> Dict[str, Any]:
+        return {c.key: getattr(state, c.key) for c in TradeBot.__table__.columns}
+
+    @staticmethod
+    def to_column_value(key: str, value):
+        """データベースから読み込んだ場合と同じ値にする。JSON列はjsonable_encoderで変換する。"""
+        if isinstance(TradeBot.__table__.c[key].type, sa.JSON):
+            return jsonable_encoder(value)
+        return value
+
+    async def __aenter__(self) -> "TradeUnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self.commit()
+            else:
+                await self.rollback()
+        finally:
+            await self.db.close()
+
+    def stage(self, **values):
+        """状態遷移を保留し、bot.stateに反映する。値が変わらない列は書き込まない。"""
+        state = self.bot.state
+        for key, value in values.items():
+            value = self.to_column_value(key, value)
+            if key not in self.values and getattr(state, key) == value:
+                continue
+            setattr(state, key, value)
+            self.values[key] = value
+
+    def add(self, obj):
+        """commit時に登録するレコードを追加する。"""
+        self.objects.append(obj)
+
+    async def commit(self):
+        """保留中のレコードと状態遷移を書き込み、コミットする。何も保留していない場合は何もしない。"""
+        if not self.values and not self.objects:
+            return
+
+        self.db.add_all(self.objects)
+        if self.values:
+            await self.db.execute(self.bot.state.stmt_update(**self.values))
+        await self.db.commit()
+
+        self.values = {}
+        self.objects = []
+        self.committed = self.snapshot(self.bot.state)
+
+    async def rollback(self):
+        self.values = {}
+        self.objects = []
+        for key, value in self.committed.items():
+            setattr(self.bot.state, key, value)
+        await self.db.rollback()
+
+
+class BotGraph(NamedTuple):
+    """profileから構築した、自動売買に必要なインスタンス"""
+
+    broker: BrokerImpl
+    topics: List[TopicProvider]
+    analyzers: List[Analyzer]
+
+
 @dataclass
 class Bot:
     profile: TradeProfile
@@ -22,14 +122,19 @@ class Bot:
     broker: BrokerImpl = field(init=False)
     topics: List[TopicProvider] = field(init=False)
     analyzers: List[Analyzer] = field(init=False)
+    session_maker: Callable[[], AsyncSession] = field(default=None, repr=False)
+    graph: BotGraph = field(default=None, repr=False)
 
     def __post_init__(self):
-        broker, topics, analyzers = self.build(self.profile)
-        self.check_conflict_alias(topics)
+        if self.graph is None:
+            self.graph = self.compile(self.profile)
+        self.broker, self.topics, self.analyzers = self.graph
 
-        self.broker = broker
-        self.topics = topics
-        self.analyzers = analyzers
+    @classmethod
+    def compile(cls, profile: TradeProfile) -> BotGraph:
+        broker, topics, analyzers = cls.build(profile)
+        cls.check_conflict_alias(topics)
+        return BotGraph(broker, topics, analyzers)
 
     @staticmethod
     def check_conflict_alias(topics: List[TopicProvider]):
@@ -78,29 +183,25 @@ class Bot:
 
         return broker, topics, analyzers
 
-    async def cancel_order(self):
+    def begin(self) -> TradeUnitOfWork:
+        """取引サイクルを開始する。"""
+        session_maker = self.session_maker or get_async_session_maker()
+        return TradeUnitOfWork(self, session_maker())
+
+    async def cancel_order(self, uow: TradeUnitOfWork):
         """エントリーに付属する注文（リミットストップ）をキャンセルする"""
         broker = self.broker
-        profile = self.profile
         state = self.state
 
         # リミットストップなどの注文をキャンセルする
         # キャンセルは冪等性なので何度実行してもよい
-        for db in get_db():
-            entry_accepted_cancel_data = await broker.cancel(state.entry_order_accepted)
+        entry_accepted_cancel_data = await broker.cancel(state.entry_order_accepted)
+        uow.stage(entry_cancel_order_accepted=entry_accepted_cancel_data)
+        await uow.commit()
 
-            new_state = db.execute(
-                state.stmt_update(
-                    entry_cancel_order_accepted=entry_accepted_cancel_data,
-                ).returning(TradeBot)
-            ).one()
-
-        self.state = TradeBot(**new_state)
-
-    async def finalize_entry_order(self):
+    async def finalize_entry_order(self, uow: TradeUnitOfWork):
         """エントリー注文が全て約定・キャンセルされてことを確認し、結果を確定させる"""
         broker = self.broker
-        profile = self.profile
         state = self.state
 
         # すでにファイナライズ済みなら終了
@@ -111,20 +212,11 @@ class Bot:
             self.state.entry_order_accepted
         )
         trade_result = await broker.finalize(status_data)
-        for db in get_db():
-            new_state = db.execute(
-                state.stmt_update(
-                    entry_order_finalized=trade_result,
-                ).returning(TradeBot)
-            ).one()
-            state = new_state
-
-        self.state = TradeBot(**new_state)
+        uow.stage(entry_order_finalized=trade_result)
 
-    async def finalize_counter_order(self):
+    async def finalize_counter_order(self, uow: TradeUnitOfWork):
         """カウンター注文が全て約定・キャンセルされてことを確認し、結果を確定させる"""
         broker = self.broker
-        profile = self.profile
         state = self.state
 
         # すでにファイナライズ済みなら終了
@@ -135,15 +227,7 @@ class Bot:
             self.state.counter_order_accepted
         )
         trade_result = await broker.finalize(status_data)
-        for db in get_db():
-            new_state = db.execute(
-                state.stmt_update(
-                    counter_order_finalized=trade_result,
-                ).returning(TradeBot)
-            ).one()
-            state = new_state
-
-        self.state = TradeBot(**new_state)
+        uow.stage(counter_order_finalized=trade_result)
 
     def get_remain(self) -> Union[PreOrder, None]:
         state = self.state
@@ -160,26 +244,16 @@ class Bot:
         remain = TradeResult.parse_obj(state.entry_order_finalized).get_remain()
         return remain
 
-    async def finalize(self):
+    def finalize(self, uow: TradeUnitOfWork):
         """エントリー注文とカウンター注文をマージし、ファイナライズを更新する。"""
         state = self.state
-        broker = self.broker
-
-        entry_order_finalized = state.entry_order_finalized
-        counter_order_finalized = state.counter_order_finalized
 
         result = TradeResult.merge_from_dict(
-            entry_order_finalized, counter_order_finalized
+            state.entry_order_finalized, state.counter_order_finalized
         )
-        for db in get_db():
-            new_state = db.execute(
-                state.stmt_update(finalized=result).returning(TradeBot)
-            ).one()
-            state = new_state
+        uow.stage(finalized=result)
 
-        self.state = TradeBot(**new_state)
-
-    def record_trade_and_clear_state(self):
+    def record_trade_and_clear_state(self, uow: TradeUnitOfWork):
         """トレード結果をDBに登録する"""
         state = self.state
         finalized = TradeResult.parse_obj(state.finalized)
@@ -210,7 +284,7 @@ class Bot:
         )
 
         log = TradeLog(
-            profile_version=1,  # TODO:
+            profile_version=self.profile.version,
             profile_id=state.profile_id,
             profile_name="",  # TODO:
             is_back_test=False,  # TODO:
@@ -222,13 +296,12 @@ class Bot:
         )
         log.update_properties()
 
-        for db in get_db():
-            log = log.create(db)
-            new_state = db.execute(state.stmt_reset().returning(TradeBot)).one()
-
-        self.state = TradeBot(**new_state)
+        uow.add(log)
+        uow.stage(**state.reset_values())
 
-    async def entry_order(self, order: PreOrder, current_dt: DateTimeAware):
+    async def entry_order(
+        self, uow: TradeUnitOfWork, order: PreOrder, current_dt: DateTimeAware
+    ):
         """
         ブローカーに注文を依頼し、受理レスポンスをエントリー売買として記録する。
         """
@@ -238,28 +311,24 @@ class Bot:
         state = self.state
         localized_order = self.broker.localize_order(order)
 
-        from sqlalchemy import insert
-
         from .models import TradeOrder
 
-        for db in get_db():
-            accepted_data = await self.broker.order(localized_order)
+        accepted_data = await self.broker.order(localized_order)
 
-            values = state.dict()
-            del values["id"]
-            values["product_code"] = order.product_code
-            values["entry_at"] = current_dt
-            values["entry_order"] = order.dict()
-            values["entry_order_accepted"] = accepted_data
+        values = state.dict()
+        del values["id"]
+        values["product_code"] = order.product_code
+        values["entry_at"] = current_dt
+        values["entry_order"] = order.dict()
+        values["entry_order_accepted"] = accepted_data
 
-            stmt = insert(TradeOrder).values(
-                **values,
-            )
-            new_state = db.execute(stmt)
-
-        # self.state = TradeBot(**new_state)  # 投げっぱなしなので状態として管理しない
+        # 投げっぱなしなので状態として管理しない
+        uow.add(TradeOrder(**values))
+        await uow.commit()
 
-    async def entry_order_continuous(self, order: PreOrder, current_dt: DateTimeAware):
+    async def entry_order_continuous(
+        self, uow: TradeUnitOfWork, order: PreOrder, current_dt: DateTimeAware
+    ):
         """
         ブローカーに注文を依頼し、受理レスポンスをエントリー売買として記録する。
         また、その注文をドテン売買など連続的な注文として扱う。
@@ -270,47 +339,34 @@ class Bot:
         state = self.state
         localized_order = self.broker.localize_order(order)
 
-        for db in get_db():
-            accepted_data = await self.broker.order(localized_order)
-            # accepted_data = {}
-            new_state = db.execute(
-                state.stmt_reset()
-                .values(
-                    product_code=order.product_code,
-                    entry_at=current_dt,
-                    entry_order=order.dict(),
-                    entry_order_accepted=accepted_data,
-                )
-                .returning(TradeBot)
-            ).one()
-
-        self.state = TradeBot(**new_state)
+        accepted_data = await self.broker.order(localized_order)
+        # accepted_data = {}
+        uow.stage(
+            **{
+                **state.reset_values(),
+                "product_code": order.product_code,
+                "entry_at": current_dt,
+                "entry_order": order.dict(),
+                "entry_order_accepted": accepted_data,
+            }
+        )
+        await uow.commit()
 
-    async def counter_order(self, order: PreOrder, current_dt: DateTimeAware):
+    async def counter_order(
+        self, uow: TradeUnitOfWork, order: PreOrder, current_dt: DateTimeAware
+    ):
         """ブローカーに注文を依頼し、受理レスポンスを反対売買として記録する"""
-        state = self.state
         localized_order = self.broker.localize_order(order)
         counter_order_accepted = await self.broker.order(localized_order)
-        self.record_counter_order(localized_order, counter_order_accepted, current_dt)
-
-    def record_counter_order(
-        self, localized_order, counter_order_accepted, current_dt: DateTimeAware
-    ):
-        state = self.state
-        for db in get_db():
-            new_state = db.execute(
-                state.stmt_update(
-                    counter_at=current_dt,
-                    counter_order=localized_order,
-                    counter_order_accepted=counter_order_accepted,
-                ).returning(TradeBot)
-            ).one()
-            state = new_state
-
-        self.state = TradeBot(**new_state)
+        uow.stage(
+            counter_at=current_dt,
+            counter_order=localized_order,
+            counter_order_accepted=counter_order_accepted,
+        )
+        await uow.commit()
 
     def finalize_counter_order_as_empty(
-        self, product_code: str, current_dt: DateTimeAware
+        self, uow: TradeUnitOfWork, product_code: str, current_dt: DateTimeAware
     ):
         state = self.state
         product_code_localized = self.broker.localize_product_code(product_code)
@@ -324,31 +380,20 @@ class Bot:
             return
 
         result = TradeResult(product_code_localized=product_code_localized)
-
-        for db in get_db():
-            new_state = db.execute(
-                state.stmt_update(
-                    counter_at=current_dt,
-                    counter_order_finalized=result.dict(),
-                ).returning(TradeBot)
-            ).one()
-            state = new_state
-
-        self.state = TradeBot(**new_state)
+        uow.stage(counter_at=current_dt, counter_order_finalized=result.dict())
 
     async def get_topics(self, curretn_dt: DateTimeAware):
-        topics = {}
-        for topic in self.topics:
-            result = await topic.get_topic(curretn_dt)
-            topics[topic.get_alias()] = result
-
-        return topics
+        """全てのトピックを並行して取得する。"""
+        results = await asyncio.gather(
+            *[topic.get_topic(curretn_dt) for topic in self.topics]
+        )
+        return {topic.get_alias(): x for topic, x in zip(self.topics, results)}
 
     async def analyze_topics(self, topics) -> Union[DealMessage, None]:
-        decisons = []
-        for analyze in self.analyzers:
-            result = await analyze(topics)
-            decisons.append(result)
+        # 判断の優先順位はanalyzersの並び順のため、gatherで順序を維持する
+        decisons = await asyncio.gather(
+            *[analyze(topics) for analyze in self.analyzers]
+        )
 
         # NoneやNoなど不要なメッセージを除去する
         filterd_decisions = self.filter_decisions(decisons)
@@ -371,6 +416,17 @@ class Bot:
         return await self.trade(curretn_dt, decision)
 
     async def trade(self, current_dt: DateTimeAware, decision: DealMessage):
+        """
+        同じ口座を利用するBOTの取引は、口座毎のロックで直列化する。
+        取引サイクル全体で１つのTradeUnitOfWorkを利用し、状態遷移は取引所の呼び出し毎にまとめて書き込む。
+        """
+        async with get_account_lock(self.broker):
+            async with self.begin() as uow:
+                return await self.trade_in_account(uow, current_dt, decision)
+
+    async def trade_in_account(
+        self, uow: TradeUnitOfWork, current_dt: DateTimeAware, decision: DealMessage
+    ):
         broker = self.broker
         profile = self.profile
         state = self.state
@@ -391,8 +447,8 @@ class Bot:
 
         if not state.is_empty:
 
-            await self.cancel_order()
-            await self.finalize_entry_order()
+            await self.cancel_order(uow)
+            await self.finalize_entry_order(uow)
             remain = self.get_remain()
             if remain:
                 counter_order = PreOrder(
@@ -404,14 +460,16 @@ class Bot:
                     stop_rate=None,
                 )
 
-                await self.counter_order(counter_order, current_dt)
+                await self.counter_order(uow, counter_order, current_dt)
             else:
                 if not self.state.counter_order_finalized:
-                    self.finalize_counter_order_as_empty(state.product_code, current_dt)
+                    self.finalize_counter_order_as_empty(
+                        uow, state.product_code, current_dt
+                    )
 
-            await self.finalize_counter_order()
-            await self.finalize()
-            self.record_trade_and_clear_state()
+            await self.finalize_counter_order(uow)
+            self.finalize(uow)
+            self.record_trade_and_clear_state(uow)
 
         # 新たな文脈のトレードを行う場合は、常にエンプティな状態を前提とする
         state = self.state
@@ -448,9 +506,9 @@ class Bot:
         )
 
         if state.is_stop_reverse:
-            await self.entry_order_continuous(order, current_dt)
+            await self.entry_order_continuous(uow, order, current_dt)
         else:
-            await self.entry_order(order, current_dt)
+            await self.entry_order(uow, order, current_dt)
 
         print(self.state)
 
@@ -475,3 +533,66 @@ class Bot:
             filterd.append(x)
 
         return filterd
+
+
+class BotRegistry:
+    """
+    TradeProfileから構築したBotGraphを、profile_id毎に保持する。
+    保持しているversionとTradeProfile.versionが異なる場合、またはinvalidateされた場合に再構築する。
+    TradeProfileは更新の度にversionが増えるため、他のプロセスで更新された場合も再構築される。
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, Tuple[int, Any, BotGraph]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def snapshot(profile):
+        """セッションを閉じた後も参照できるように、TradeProfileの列の値を複製する。"""
+        if isinstance(profile, TradeProfile):
+            return SimpleNamespace(**profile.dict())
+        return profile
+
+    def get(
+        self, profile_id: int, version: int, load: Callable[[], TradeProfile]
+    ) -> Tuple[Any, BotGraph]:
+        """(profile, graph)を返す。保持していない場合は、loadで読み込んだTradeProfileから構築する。"""
+        entry = self.entries.get(profile_id)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1], entry[2]
+
+        self.misses += 1
+        profile = self.snapshot(load())
+        graph = Bot.compile(profile)
+        self.entries[profile_id] = (profile.version, profile, graph)
+        return profile, graph
+
+    def create_bot(
+        self,
+        profile_id: int,
+        version: int,
+        state: TradeBot,
+        load: Callable[[], TradeProfile],
+    ) -> Bot:
+        profile, graph = self.get(profile_id, version, load)
+        return Bot(profile, state, graph=graph)
+
+    def invalidate(self, profile_id: int = None):
+        """profile_idのBotGraphを破棄する。Noneの場合は全て破棄する。"""
+        if profile_id is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(profile_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(hits=self.hits, misses=self.misses, size=len(self.entries))
+
+
+bot_registry = BotRegistry()
+
+
+@event.listens_for(TradeProfile, "after_update")
+def invalidate_bot_graph(mapper, connection, target: TradeProfile):
+    bot_registry.invalidate(target.id)
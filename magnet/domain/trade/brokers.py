@@ -22,6 +22,9 @@ class BitflyerBroker(BrokerImpl):
             api_secret=api_secret or APICredentialBitflyer().API_BITFLYER_API_SECRET,
         )
 
+    def get_account(self):
+        return (self.get_name(), self.client.api_key)
+
     async def get_markets(self):
         """取り扱っている商品などを取得する。主にデバッグ用"""
         return await self.client.get_markets()
@@ -109,6 +112,9 @@ class BitflyerBroker(BrokerImpl):
     async def get_ticker(self, product_code):
         return await self.client.get_ticker(product_code)
 
+    async def get_board(self, product_code):
+        return await self.client.get_board(product_code)
+
     def localize_product_code(self, product_code: str) -> str:
         dic = {"btcjpy": "BTC_JPY", "btcfxjpy": "FX_BTC_JPY"}
         return dic[product_code]
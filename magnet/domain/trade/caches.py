@@ -0,0 +1,109 @@
+"""
+ティッカーや板情報のように、複数のBOTが同時に参照する市場情報を短時間だけメモリに保持する。
+ttl秒以内の値はそのまま返し、ttlを過ぎてもstale_ttl秒以内であれば古い値を返しつつバックグラウンドで再取得する（stale-while-revalidate）。
+同一キーの取得が処理中の場合は、その結果を待ち合わせる。
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    fetched_at: float
+
+
+class MarketDataCache:
+    def __init__(
+        self,
+        ttl: float = 1.0,
+        stale_ttl: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.entries: Dict[Hashable, CacheEntry] = {}
+        self.fetching: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = self.clock() - entry.fetched_at
+            if age <= self.ttl:
+                self.hits += 1
+                return entry.value
+            if age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self.refresh(key, fetch)
+                return entry.value
+
+        if (id(asyncio.get_running_loop()), key) in self.fetching:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        return await asyncio.shield(self.refresh(key, fetch))
+
+    def refresh(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> "asyncio.Future[Any]":
+        """値を再取得する。既に再取得中の場合は、そのFutureを返す。"""
+        fetching_key = (id(asyncio.get_running_loop()), key)
+        future = self.fetching.get(fetching_key)
+        if future is not None:
+            return future
+
+        async def run():
+            value = await fetch()
+            self.entries[key] = CacheEntry(value, self.clock())
+            return value
+
+        def done(future: "asyncio.Future[Any]"):
+            self.fetching.pop(fetching_key, None)
+            if not future.cancelled() and future.exception() is not None:
+                # 待ち合わせている呼び出し元がいない場合でも、例外を握りつぶさずに記録する
+                logger.warning(f"Failed to refresh {key}: {future.exception()}")
+
+        future = self.fetching[fetching_key] = asyncio.ensure_future(run())
+        future.add_done_callback(done)
+        return future
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """取得要求の内訳を返す。hits・stale_hits・coalescedは、取得を待たずに（または相乗りして）応答できた件数。"""
+        saved = self.hits + self.stale_hits + self.coalesced
+        requests = saved + self.misses
+        return dict(
+            hits=self.hits,
+            stale_hits=self.stale_hits,
+            coalesced=self.coalesced,
+            misses=self.misses,
+            hit_rate=saved / requests if requests else 0.0,
+            size=len(self.entries),
+        )
+
+
+market_cache = MarketDataCache()
+
+
+async def get_ticker(broker, market: str, product_code: str):
+    """(market, product_code)毎にキャッシュしたティッカーを返す。"""
+    return await market_cache.get(
+        ("ticker", market, product_code), lambda: broker.get_ticker(product_code)
+    )
+
+
+async def get_board(broker, market: str, product_code: str):
+    """(market, product_code)毎にキャッシュした板情報を返す。"""
+    return await market_cache.get(
+        ("board", market, product_code), lambda: broker.get_board(product_code)
+    )
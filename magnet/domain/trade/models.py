@@ -48,6 +48,9 @@ class TradeProfile(Base):
     bid_limit_rate = sa.Column(sa.DECIMAL, nullable=True)
     bid_stop_rate = sa.Column(sa.DECIMAL, nullable=True)
 
+    # 更新の度にversionを増やす。BOTはversion毎に構築済みのインスタンスを再利用する
+    __mapper_args__ = {"version_id_col": version}
+
     # order_at = sa.Column(sa.DateTime(timezone=True), nullable=False)
     # order_price = sa.Column(sa.DECIMAL, nullable=False)
     # order_unit = sa.Column(sa.DECIMAL, nullable=False)
@@ -142,7 +145,12 @@ class TradeBase:
         return self.entry_order["side"]
 
     def stmt_reset(self):
-        return self.stmt_update(
+        return self.stmt_update(**self.reset_values())
+
+    @staticmethod
+    def reset_values() -> dict:
+        """取引の文脈を初期化する値を返す。"""
+        return dict(
             # id
             # profile_id
             # is_active
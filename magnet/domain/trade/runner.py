@@ -0,0 +1,36 @@
+"""
+複数のBOTを並行して取引させる。
+同時に取引するBOTの数はconcurrencyで制限する。同じ口座への発注はBot.tradeで直列化されるため、ここでは考慮しない。
+"""
+import asyncio
+from typing import Any, List, Union
+
+from framework import DateTimeAware
+
+from .bot import Bot
+
+DEFAULT_CONCURRENCY = 8
+
+
+async def deal_concurrently(
+    bots: List[Bot],
+    current_dt: DateTimeAware = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> List[Union[Any, BaseException]]:
+    """
+    全てのBOTを同じ時刻の文脈で取引させ、BOTの並び順に結果を返す。
+    BOTで発生した例外は他のBOTに影響させず、結果として返す。
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be greater than 0.")
+
+    if current_dt is None:
+        current_dt = DateTimeAware.utcnow()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def deal(bot: Bot):
+        async with semaphore:
+            return await bot.deal_at(current_dt)
+
+    return await asyncio.gather(*[deal(bot) for bot in bots], return_exceptions=True)
@@ -0,0 +1,213 @@
+"""
+TradeProfileのパラメータの組み合わせ（グリッド）毎に、プロセスプールでバックテストを行う。
+OHLCのフレームは共有メモリに一度だけ配置し、ワーカープロセスはそれを複製せずに参照する。
+結果は完了した順にCSVまたはParquet（pyarrowが必要）へ書き出し、最後に順位付けした結果を返す。
+"""
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import analyzers  # noqa: F401 ワーカープロセスでアナライザを登録する
+from .backtest import run_backtest
+
+SWEEPABLE_FIELDS = (
+    "analyzers",
+    "margin",
+    "ask_limit_rate",
+    "ask_stop_rate",
+    "bid_limit_rate",
+    "bid_stop_rate",
+)
+SUMMARY_FIELDS = ("trades", "fact_profit", "max_drawdown", "win_rate")
+
+
+def expand_grid(grid: Dict[str, Sequence[Any]]) -> Iterator[Dict[str, Any]]:
+    """パラメータ毎の候補から、全ての組み合わせを生成する。"""
+    for key in grid:
+        if key not in SWEEPABLE_FIELDS:
+            raise ValueError(f"{key} is not sweepable: {SWEEPABLE_FIELDS}")
+
+    keys = list(grid)
+    for values in itertools.product(*[grid[k] for k in keys]):
+        yield dict(zip(keys, values))
+
+
+@dataclass
+class SharedFrameSpec:
+    name: str
+    shape: Tuple[int, int]
+    columns: List[str]
+
+
+class SharedFrame:
+    """
+    フレームを共有メモリに配置する。
+    先頭にclose_timeをint64（datetime64[ns]）の配列として、続けて数値列をfloat64の２次元配列として配置する。
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        numeric = frame.select_dtypes("number").drop(columns=["id"], errors="ignore")
+        close_time = pd.to_datetime(frame["close_time"]).to_numpy("datetime64[ns]")
+        values = numeric.to_numpy("float64")
+
+        size = close_time.nbytes + values.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        buf = self.shm.buf
+        shared_time = np.ndarray(close_time.shape, dtype="int64", buffer=buf)
+        shared_time[:] = close_time.view("int64")
+        offset = close_time.nbytes
+        shared_values = np.ndarray(values.shape, "float64", buffer=buf, offset=offset)
+        shared_values[:] = values
+        self.spec = SharedFrameSpec(
+            name=self.shm.name,
+            shape=values.shape,
+            columns=["close_time", *numeric.columns],
+        )
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def attach_frame(
+    spec: SharedFrameSpec,
+) -> Tuple[shared_memory.SharedMemory, pd.DataFrame]:
+    """共有メモリのフレームを参照する。数値列は複製されない。"""
+    shm = shared_memory.SharedMemory(name=spec.name)
+    close_time = np.ndarray(spec.shape[:1], dtype="int64", buffer=shm.buf)
+    offset = close_time.nbytes
+    values = np.ndarray(spec.shape, dtype="float64", buffer=shm.buf, offset=offset)
+    close_time.flags.writeable = False
+    values.flags.writeable = False
+    frame = pd.DataFrame(values, columns=spec.columns[1:], copy=False)
+    frame.insert(0, "close_time", close_time.view("datetime64[ns]"))
+    return shm, frame
+
+
+# ワーカープロセス毎の状態
+_worker: Dict[str, Any] = {}
+
+
+def init_worker(spec: SharedFrameSpec, base: Dict[str, Any]):
+    shm, frame = attach_frame(spec)
+    _worker.update(shm=shm, frame=frame, base=base)
+
+
+def run_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    profile = SimpleNamespace(**{**_worker["base"], **params})
+    result = run_backtest(profile, _worker["frame"])
+    return {**params, **result.summary()}
+
+
+def rank_results(
+    results: Iterable[Dict[str, Any]], rank_by: str = "fact_profit"
+) -> List[Dict[str, Any]]:
+    """rank_byの降順（同値の場合はドローダウンの昇順）に順位を付ける。"""
+    ranked = sorted(results, key=lambda x: (-x[rank_by], x["max_drawdown"]))
+    return [{"rank": i, **x} for i, x in enumerate(ranked, 1)]
+
+
+class ResultWriter:
+    """結果を拡張子に応じてCSVまたはParquetへ逐次書き出す。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.writer: Any = None
+        self.file: Any = None
+
+    @staticmethod
+    def to_row(result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            k: ",".join(v) if isinstance(v, (list, tuple)) else v
+            for k, v in result.items()
+        }
+
+    def write(self, results: List[Dict[str, Any]]):
+        if not results:
+            return
+
+        rows = [self.to_row(x) for x in results]
+        if self.path.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pylist(rows)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(str(self.path), table.schema)
+            self.writer.write_table(table.cast(self.writer.schema))
+        else:
+            if self.writer is None:
+                self.file = open(self.path, "w", newline="")
+                self.writer = csv.DictWriter(self.file, fieldnames=list(rows[0]))
+                self.writer.writeheader()
+            self.writer.writerows(rows)
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        elif self.writer is not None:
+            self.writer.close()
+
+
+def run_sweep(
+    frame: pd.DataFrame,
+    base: Dict[str, Any],
+    grid: Dict[str, Sequence[Any]],
+    output: Path = None,
+    max_workers: int = None,
+    chunksize: int = None,
+    batch_size: int = 1000,
+    rank_by: str = "fact_profit",
+) -> List[Dict[str, Any]]:
+    """
+    baseのプロファイルに対して、gridの全ての組み合わせでバックテストを行い、順位付けした結果を返す。
+    outputを指定した場合は、結果をbatch_size件毎に書き出す。
+    """
+    params = list(expand_grid(grid))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunksize is None:
+        # プロセス間通信の回数を抑えつつ、ワーカー間で負荷を分散させる
+        chunksize = max(len(params) // (max_workers * 4), 1)
+
+    writer = ResultWriter(output) if output is not None else None
+    results: List[Dict[str, Any]] = []
+    batch: List[Dict[str, Any]] = []
+
+    try:
+        with SharedFrame(frame) as shared:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=init_worker,
+                initargs=(shared.spec, base),
+            ) as executor:
+                for result in executor.map(run_params, params, chunksize=chunksize):
+                    results.append(result)
+                    batch.append(result)
+                    if writer is not None and len(batch) >= batch_size:
+                        writer.write(batch)
+                        batch = []
+
+        if writer is not None:
+            writer.write(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rank_results(results, rank_by)
@@ -1,13 +1,15 @@
 from datetime import date, timedelta
 from functools import partial
 
-from sqlalchemy.sql import text
+from sqlalchemy import select
 
 from framework import DateTimeAware
 
-from ...database import get_db
+from ...database import get_async_db
+from ..datastore.caches import latest_ohlc_cache, partition_key
 from ..datastore.models import CryptoOhlc
 from ..datastore.schemas import Ohlc
+from . import caches
 from .abc import TopicProvider
 from .repository import TopicRepository
 
@@ -38,7 +40,10 @@ class CurrentTickerProvider(TopicProvider):
     def __post_init__(self):
         mapping = {"btcfxjpy": "FX_BTC_JPY"}
         product = mapping.get(self.profile.product)
-        self._get_topic = partial(self.broker.get_ticker, product)
+        # 同じ商品を扱うBOT間でティッカーを共有する
+        self._get_topic = partial(
+            caches.get_ticker, self.broker, self.profile.market, product
+        )
 
     async def get_topic(self, current_dt):
         return await self._get_topic()
@@ -46,30 +51,35 @@ class CurrentTickerProvider(TopicProvider):
 
 @TopicRepository.register
 class YesterdayOhlcProvider(TopicProvider):
-    """前日の分析済みOHLCを取得する"""
+    """前日の分析済みOHLCを取得する。ETLが更新した直近のローソク足はキャッシュから返す。"""
 
     _name = "yesterday_ohlc"
 
     def __post_init__(self):
-        self._sql = text(
-            f"SELECT * FROM {CryptoOhlc.__tablename__} where open_time = :open_time"
-        )
+        p = self.profile
+        self._partition = partition_key(p.provider, p.market, p.product, p.periods)
 
     async def get_topic(self, current_dt: DateTimeAware):
         yesterday = date(current_dt.year, current_dt.month, current_dt.day) - timedelta(
             days=1
         )
+        ohlc = latest_ohlc_cache.get(self._partition, yesterday)
+        if ohlc is not None:
+            return ohlc
+
         p = self.profile
-        for db in get_db():
-            stmt = db.query(CryptoOhlc).filter(
+        async for db in get_async_db():
+            stmt = select(CryptoOhlc).where(
                 CryptoOhlc.provider == p.provider,
                 CryptoOhlc.market == p.market,
                 CryptoOhlc.product == p.product,
                 CryptoOhlc.periods == p.periods,
                 CryptoOhlc.open_time == yesterday,
             )
-            yesterday_ohlc = stmt.one_or_none()
+            yesterday_ohlc = (await db.execute(stmt)).scalar_one_or_none()
             if yesterday_ohlc is None:
                 return None
             else:
-                return Ohlc.from_orm(yesterday_ohlc)
+                ohlc = Ohlc.from_orm(yesterday_ohlc)
+                latest_ohlc_cache.put(self._partition, [ohlc])
+                return ohlc
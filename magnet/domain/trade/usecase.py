@@ -8,7 +8,7 @@ from pytrade.portfolio import AskBid, PositionStatus
 
 from ...commons import BaseModel, intellisense
 from ...database import Session
-from .bot import Bot
+from .bot import Bot, bot_registry
 from .models import TradeBot, TradeProfile
 from .repository import AnalyzersRepository, BrokerRepository, TopicRepository
 
@@ -86,12 +86,31 @@ class ScheduleBot(BaseModel):
         """
         bot = self.get(db)
         bot.update(db, is_active=is_active)
+        bot_registry.invalidate(self.profile_id)
         return bot
 
+    def build(self, db: Session) -> Bot:
+        """
+        BOTの状態とプロファイルのversionを読み込み、BOTを生成する。
+        構築済みのブローカー・トピック・アナライザはversion毎に再利用し、プロファイルはversionが変わった場合のみ読み込む。
+        """
+        if not (
+            row := db.query(TradeBot, TradeProfile.version)
+            .join(TradeProfile, TradeProfile.id == TradeBot.profile_id)
+            .filter(TradeBot.profile_id == self.profile_id)
+            .one_or_none()
+        ):
+            raise Exception("not found.")
+
+        state, version = row
+        # BOTの状態はTradeUnitOfWorkで更新するため、このセッションから切り離す
+        db.expunge(state)
+        return bot_registry.create_bot(
+            self.profile_id, version, state, lambda: GetBotProfile.do(self, db)
+        )
+
     async def deal(self, db: Session):
-        profile = GetBotProfile.do(self, db)
-        state = self.get(db)
-        bot = Bot(profile, state)
+        bot = self.build(db)
         result = await bot.deal_at_now()
         # result = await bot.deal_at_now()
         # result = await bot.deal_at_now()
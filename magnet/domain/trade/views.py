@@ -37,6 +37,13 @@ async def deal_bot(profile_id: int, db=Depends(get_db)):
     return await action.deal(db)
 
 
+@router.get("/market_cache", description="ティッカー・板情報のキャッシュのヒット数を取得する。")
+async def get_market_cache_stats():
+    from .caches import market_cache
+
+    return market_cache.stats()
+
+
 @router.post("/etl/load_all")
 async def load_all():
     """株・為替・暗号通貨等のデータを最新化する"""
@@ -5,10 +5,12 @@ from fastapi.param_functions import Path
 from jwt import PyJWTError
 from pydantic import SecretStr, ValidationError, validator
 from pydantic.fields import Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 
 from ...commons import BaseModel, intellisense
-from ...database import get_db
+from ...database import get_async_db
 from .models import DenyToken, User, UserRoles
 from .schemas import Token, TokenData
 from .utils import (
@@ -31,7 +33,7 @@ credentials_exception = HTTPException(
 async def get_valid_token(
     security_scopes: SecurityScopes,
     token: str = Depends(oauth2_schema),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> TokenData:
     if await is_deny_token(db, token):
         raise HTTPException(
@@ -55,11 +57,11 @@ async def get_valid_token(
 async def get_current_user(
     security_scopes: SecurityScopes,
     token: str = Depends(oauth2_schema),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     token_data = await get_valid_token(security_scopes, token, db)
 
-    user = User.L_get_by_name(db, name=token_data.user_name)
+    user = await db.run_sync(User.L_get_by_name, name=token_data.user_name)
     if not user:
         raise credentials_exception
 
@@ -80,8 +82,9 @@ async def get_current_user(
     return user
 
 
-async def is_deny_token(db: Session, token: str) -> bool:
-    if deny := db.query(DenyToken.id).filter(DenyToken.token == token).one_or_none():
+async def is_deny_token(db: AsyncSession, token: str) -> bool:
+    stmt = select(DenyToken.id).where(DenyToken.token == token)
+    if deny := (await db.execute(stmt)).one_or_none():
         return True
     else:
         return False
@@ -90,7 +93,7 @@ async def is_deny_token(db: Session, token: str) -> bool:
 async def get_current_user_id(
     security_scopes: SecurityScopes,
     token: str = Depends(oauth2_schema),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> int:
     user = await get_current_user(security_scopes, token, db)
     return user.id
@@ -168,16 +171,12 @@ class TryLogin(BaseModel):
 async def logout_user(
     security_scopes: SecurityScopes,
     token: str = Depends(oauth2_schema),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     token_data = await get_valid_token(security_scopes, token, db)
-    if not (
-        result := db.query(DenyToken.id)
-        .filter(DenyToken.token == token_data.token)
-        .one_or_none()
-    ):
+    if not await is_deny_token(db, token_data.token):
         token = DenyToken(token=token_data.token, user_name=token_data.user_name)
-        token.create(db)
+        await token.create(db)
     # TODO: 何を返せばいいのかよく分からない
     # TODO: そもそもフロントエンド側のログアウトはトークンを破棄すればよいのでログアウト処理自体いらない
     return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
@@ -2,12 +2,14 @@ import datetime
 import traceback
 from typing import Literal
 
+import pandas as pd
 from sqlalchemy.orm import Session
 
 from framework import DateTimeAware, Linq
 
 from ..commons import BaseModel, BulkResult
-from ..domain.datastore import models, schemas
+from ..domain.datastore import indicators, models, schemas
+from ..domain.datastore.caches import latest_ohlc_cache, partition_key
 from ..utils.notify import broadcast
 from .executor import daily
 
@@ -30,17 +32,18 @@ async def daily_update_crypto_pair(db: Session) -> BulkResult:
     query = (
         Linq(data)
         # .map(lambda x: schemas.Pairs(provider=provider, symbol=x.symbol).dict())  # type: ignore
-        .map(lambda x: m(provider=provider, symbol=x.symbol))
+        .map(lambda x: dict(provider=provider, symbol=x.symbol))
     )
 
     # load
     deleted = db.query(m).filter(m.provider == provider).delete()
 
-    count, succeeded, exceptions = query.dispatch(db.add)
-    if exceptions:
-        raise Exception(exceptions)
+    result = m.as_rep().bulk_insert(db, rows=query)
+    if result.errors:
+        raise Exception(result.errors)
 
-    return BulkResult(deleted=deleted, inserted=succeeded, errors=exceptions)
+    result.deleted = deleted
+    return result
 
 
 @daily
@@ -60,17 +63,18 @@ async def daily_update_crypto_markets(db: Session) -> BulkResult:
     query = (
         Linq(data)
         # .map(lambda x: schemas.Pairs(provider=provider, symbol=x.symbol).dict())  # type: ignore
-        .map(lambda x: m(provider=provider, **x.dict()))
+        .map(lambda x: dict(provider=provider, **x.dict()))
     )
 
     # load
     deleted = db.query(m).filter(m.provider == provider).delete()
 
-    count, succeeded, exceptions = query.dispatch(db.add)
-    if exceptions:
-        raise Exception(exceptions)
+    result = m.as_rep().bulk_insert(db, rows=query)
+    if result.errors:
+        raise Exception(result.errors)
 
-    return BulkResult(deleted=deleted, inserted=succeeded, errors=exceptions)
+    result.deleted = deleted
+    return result
 
 
 class JobBase(BaseModel):
@@ -80,107 +84,179 @@ class JobBase(BaseModel):
 
 
 class CryptoWatchOhlcExtractor(JobBase):
-    """指定し市場通過ピリオドをcryptowatchから取得し、データストアに保存する。"""
+    """
+    指定し市場通過ピリオドをcryptowatchから取得し、データストアに保存する。
+    incrementalが有効な場合は、保存済みの最新のローソク足以降のみを取得し、その末尾だけを洗い替える。
+    保存済みのデータが存在しない場合は、afterから全件を取得する。
+    """
 
     provider: Literal["cryptowatch"]
     market: Literal["bitflyer", "binance"]
     product: Literal["btcjpy", "btcfxjpy", "btcusdt"]
     periods: int
     after: DateTimeAware = DateTimeAware(2010, 1, 1)
+    incremental: bool = True
 
     @property
     def description(self):
         return f"{self.provider} {self.market} {self.product} {self.periods}"
 
+    @property
+    def partition(self) -> dict:
+        return self.dict(include={"provider", "market", "product", "periods"})
+
     async def __call__(self, db: Session) -> BulkResult:
         from trade_api.exchanges.cryptowatch import CryptowatchAPI
 
+        m = models.CryptoOhlc
+        partition = self.partition
+
+        last_close_time = None
+        if self.incremental:
+            last_close_time = m.Q_select_last_close_time(db, **partition)
+
+        if last_close_time is None:
+            after = self.after
+        else:
+            # 最新のローソク足は確定前の可能性があるため、取得し直す
+            after = DateTimeAware(
+                last_close_time.year, last_close_time.month, last_close_time.day
+            )
+
         data = await CryptowatchAPI().list_ohlc(
             market=self.market,
             product=self.product,
             periods=self.periods,
-            after=self.after,
+            after=after,
         )
 
-        diff = datetime.timedelta(days=-1)
-        partition = self.dict(exclude={"after"})
         # transform
-        query = Linq(data).map(
-            lambda x: schemas.Ohlc(
-                **partition,  # type: ignore
-                close_time=x.close_time,
-                open_time=x.close_time + diff,
-                open_price=x.open_price,
-                high_price=x.high_price,
-                low_price=x.low_price,
-                close_price=x.close_price,
-                volume=x.volume,
-                quote_volume=x.quote_volume,
-            )
-        )
+        df = self.to_frame(data)
+        if df.empty:
+            return BulkResult()
 
         # analyze
-        it = schemas.Ohlc.compute_sma_and_cross(query)
-        it = schemas.Ohlc.compute_wb_cs(it)
-        it = schemas.Ohlc.compute_rsi(it)
+        # 移動平均などを再計算するため、取得したローソク足の直前のローソク足を保存済みのデータから補う
+        since = df["close_time"].min()
+        warmup = pd.DataFrame()
+        if last_close_time is not None:
+            warmup = pd.DataFrame(
+                [
+                    dict(
+                        close_time=x.close_time,
+                        open_price=x.open_price,
+                        close_price=x.close_price,
+                    )
+                    for x in m.Q_select_warmup(
+                        db,
+                        **partition,
+                        until=since,
+                        limit=indicators.WARMUP_PERIODS,
+                    )
+                ]
+            )
 
-        # load
-        m = models.CryptoOhlc
+        if not warmup.empty:
+            df = pd.concat([warmup, df], ignore_index=True)
 
-        deleted = (
-            db.query(models.CryptoOhlc)
-            .filter(
-                m.provider == self.provider,
-                m.market == self.market,
-                m.product == self.product,
-                m.periods == self.periods,
-            )
-            .filter(m.close_time >= self.after)
-            .delete()
+        df = indicators.compute_indicators(df)
+        rows = indicators.to_records(df.iloc[len(warmup) :])
+
+        # load
+        query = db.query(m).filter(
+            m.provider == self.provider,
+            m.market == self.market,
+            m.product == self.product,
+            m.periods == self.periods,
         )
 
-        count, succeeded, exceptions = (
-            Linq(it).map(lambda x: m(**x.dict())).dispatch(lambda x: db.add(x))
+        if last_close_time is None:
+            deleted = query.filter(m.close_time >= self.after).delete()
+            since = self.after.date()
+        else:
+            deleted = query.filter(m.close_time >= since).delete()
+
+        result = m.as_rep().bulk_insert(
+            db, rows=Linq(rows).map(lambda x: {**partition, **x})
         )
-        db.flush()
         ignored = db.query(models.CryptoOhlc).filter(m.close_price == 0).delete()
         warning = f"終値0円は不正なレコードとして無視されました" if ignored else ""
 
-        if exceptions:
-            raise Exception(exceptions)
+        if result.errors:
+            raise Exception(result.errors)
+
+        # BOTが参照する直近のローソク足を、コミット後にキャッシュへ反映する
+        latest = [
+            schemas.Ohlc(**partition, **x)
+            for x in rows[-latest_ohlc_cache.size :]
+            if x["close_price"] != 0
+        ]
+        latest_ohlc_cache.put_on_commit(
+            db, partition_key(**partition), latest, since=since
+        )
 
         return BulkResult(
             deleted=deleted,
-            inserted=succeeded - ignored,
+            inserted=result.inserted - ignored,
             ignored=ignored,
-            errors=exceptions,
+            errors=result.errors,
             warning=warning,
         )
 
+    @staticmethod
+    def to_frame(data) -> pd.DataFrame:
+        diff = datetime.timedelta(days=-1)
+        return pd.DataFrame(
+            [
+                dict(
+                    close_time=x.close_time.date(),
+                    open_time=(x.close_time + diff).date(),
+                    open_price=x.open_price,
+                    high_price=x.high_price,
+                    low_price=x.low_price,
+                    close_price=x.close_price,
+                    volume=x.volume,
+                    quote_volume=x.quote_volume,
+                )
+                for x in data
+            ]
+        )
+
 
 class SystemTradeBot(JobBase):
     """test用bot"""
 
     # profile_id: int
+    concurrency: int = 8
 
     async def __call__(self, db: Session) -> BulkResult:
         from magnet.domain.trade.models import TradeBot
+        from magnet.domain.trade.runner import deal_concurrently
         from magnet.domain.trade.usecase import ScheduleBot
 
+        def format_exception(e: BaseException):
+            return "".join(traceback.TracebackException.from_exception(e).format())
+
         errors = []
+        bots = []
 
+        # 共有しているセッションを並行して利用しないように、BOTの構築は逐次に行う
         query = db.query(TradeBot).filter(TradeBot.is_active == True)
         for bot in query:
             try:
-                await ScheduleBot(profile_id=bot.profile_id).deal(db)
+                bots.append(ScheduleBot(profile_id=bot.profile_id).build(db))
             except Exception as e:
-                tb = "".join(traceback.TracebackException.from_exception(e).format())
-                errors.append(tb)
+                errors.append(format_exception(e))
+
+        results = await deal_concurrently(bots, concurrency=self.concurrency)
+        for result in results:
+            if isinstance(result, BaseException):
+                errors.append(format_exception(result))
 
         return BulkResult(errors=errors)
 
 
-daily(
+bitflyer_btcjpy = daily(
     CryptoWatchOhlcExtractor(
         provider="cryptowatch",
         market="bitflyer",
@@ -191,7 +267,7 @@ daily(
 )
 
 
-daily(
+bitflyer_btcfxjpy = daily(
     CryptoWatchOhlcExtractor(
         provider="cryptowatch",
         market="bitflyer",
@@ -221,7 +297,9 @@ daily(
     )
 )
 
-daily(SystemTradeBot())
+# 最新のチャートで売買するため、チャートの取得後に実行する
+# BOTはbitflyerで売買するため、他の取引所のチャートの取得に失敗しても売買は止めない
+daily(SystemTradeBot(), depends=[bitflyer_btcjpy, bitflyer_btcfxjpy])
 
 
 @daily
@@ -1,65 +1,172 @@
+"""
+登録されたジョブをasyncioで並行実行する。
+同時実行数はconcurrencyで制限され、依存関係（depends）を宣言したジョブは依存先のジョブが完了した後に実行される。
+ジョブ毎にセッションを作成するため、コミット・ロールバックはジョブ単位で独立している。
+"""
+import asyncio
 import inspect
-from typing import Any, Callable, Coroutine, List, TypeVar
+import time
+import traceback
+from typing import Any, Callable, Coroutine, Dict, Iterable, List, Tuple, TypeVar
 
 from sqlalchemy.orm import Session
-from typer.models import Context
 
 from ..commons import BulkResult, EtlJobResult
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..domain.datastore.models import EtlJobResult as EtlJobResultDatabase
 
 F = TypeVar("F", bound=Callable)
 
+DEFAULT_CONCURRENCY = 4
+
 daily_jobs: List[Callable[..., Coroutine[Session, Any, BulkResult]]] = []
 monthly_jobs: List[Callable[..., Coroutine[Session, Any, BulkResult]]] = []
 yearly_jobs: List[Callable[..., Coroutine[Session, Any, BulkResult]]] = []
 
+# id(ジョブ) -> 依存先（ジョブ または ジョブのクラス）
+job_dependencies: Dict[int, Tuple[Any, ...]] = {}
 
-async def run_daily():
-    results: List[EtlJobResult] = []
 
-    for func in daily_jobs:
-        for db in get_db():
-            result = await func(db)
-            try:
-                db.commit()
-            except Exception as e:
-                db.rollback()
-                result.error_summary = str(e)
+def get_job_info(func) -> Tuple[str, str]:
+    if inspect.isfunction(func):
+        return func.__name__, func.__doc__ or ""
+    else:
+        return func.__class__.__name__, func.description  # type: ignore
 
-            if inspect.isfunction(func):
-                name = func.__name__
-                description = func.__doc__ or ""
-            else:
-                name = func.__class__.__name__
-                description = func.description  # type: ignore
 
-            if hasattr(result, "dict"):
-                result_dict = result.dict()
+def resolve_dependencies(jobs: List[Callable]) -> Dict[int, List[int]]:
+    """
+    ジョブ毎の依存先を、jobs内のインデックスに解決する。
+    依存先にクラスを指定した場合は、そのクラスのインスタンスである全てのジョブに依存する。
+    """
+    graph: Dict[int, List[int]] = {}
+    for i, job in enumerate(jobs):
+        depends = []
+        for dep in job_dependencies.get(id(job), ()):
+            if inspect.isclass(dep):
+                matched = [j for j, x in enumerate(jobs) if isinstance(x, dep)]
             else:
-                if result is None:
-                    result_dict = {}
-            results.append(
-                EtlJobResult(name=name, description=description, **result_dict)
-            )
+                matched = [j for j, x in enumerate(jobs) if x is dep]
+                if not matched:
+                    raise ValueError(f"{get_job_info(dep)[0]} is not registered.")
+            depends.extend(j for j in matched if j != i)
+        graph[i] = depends
+
+    # 循環参照がないことを確認する
+    resolved = set()
+    remaining = dict(graph)
+    while remaining:
+        ready = [i for i, deps in remaining.items() if resolved.issuperset(deps)]
+        if not ready:
+            names = [get_job_info(jobs[i])[0] for i in remaining]
+            raise ValueError(f"Circular dependency detected: {names}")
+        for i in ready:
+            resolved.add(i)
+            del remaining[i]
+
+    return graph
+
+
+async def run_job(func, get_db=get_db) -> Tuple[BulkResult, bool]:
+    """ジョブを専用のセッションで実行し、結果と成否を返す。失敗した場合はロールバックする。"""
+    result = BulkResult()
+    succeeded = True
 
     for db in get_db():
-        for info in results:
-            db.add(EtlJobResultDatabase(**info.dict()))
+        try:
+            result = await func(db) or BulkResult()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            succeeded = False
+            result.error_summary = str(e)
+            tb = "".join(traceback.TracebackException.from_exception(e).format())
+            result.errors = [*result.errors, tb]
+
+    return result, succeeded
+
+
+async def run_jobs(
+    jobs: List[Callable],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    get_db=get_db,
+) -> List[EtlJobResult]:
+    """
+    ジョブを並行実行し、登録順に結果を返す。
+    依存先のジョブが失敗した場合、そのジョブは実行せずにスキップする。
+    queue_timeは実行開始を要求してからジョブが開始されるまで（依存先の完了待ちと同時実行数の空き待ち）の秒数、
+    wall_timeはジョブの開始からコミットまでの秒数を表す。
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be greater than 0.")
+
+    graph = resolve_dependencies(jobs)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: Dict[int, "asyncio.Task[Tuple[EtlJobResult, bool]]"] = {}
+    enqueued_at = time.perf_counter()
+
+    async def run(index: int) -> Tuple[EtlJobResult, bool]:
+        func = jobs[index]
+        name, description = get_job_info(func)
+        depends = [await tasks[i] for i in graph[index]]
+
+        if all(succeeded for _, succeeded in depends):
+            async with semaphore:
+                started_at = time.perf_counter()
+                result, succeeded = await run_job(func, get_db)
+        else:
+            started_at = time.perf_counter()
+            result = BulkResult(error_summary="依存するジョブが失敗したため、スキップしました。")
+            succeeded = False
+
+        finished_at = time.perf_counter()
+        info = EtlJobResult(
+            name=name,
+            description=description,
+            wall_time=finished_at - started_at,
+            queue_time=started_at - enqueued_at,
+            **result.dict(),
+        )
+        return info, succeeded
+
+    # 全てのタスクを作成してから実行するため、依存先のタスクは必ず存在する
+    for index in range(len(jobs)):
+        tasks[index] = asyncio.ensure_future(run(index))
+
+    return [info for info, _ in await asyncio.gather(*tasks.values())]
+
+
+async def run_daily(concurrency: int = DEFAULT_CONCURRENCY):
+    results = await run_jobs(daily_jobs, concurrency=concurrency)
+
+    async for db in get_async_db():
+        db.add_all([EtlJobResultDatabase(**info.dict()) for info in results])
 
     return results
 
 
-def daily(func: F) -> F:
-    daily_jobs.append(func)
+def register(jobs: List[Callable], func, depends: Iterable[Any]):
+    if func is None:
+        return lambda func: register(jobs, func, depends)
+
+    jobs.append(func)
+    depends = tuple(depends)
+    if depends:
+        job_dependencies[id(func)] = depends
     return func
 
 
-def monthly(func: F) -> F:
-    monthly_jobs.append(func)
-    return func
+def daily(func: F = None, *, depends: Iterable[Any] = ()) -> F:
+    """
+    日次ジョブとして登録する。dependsには先に完了している必要があるジョブ、またはジョブのクラスを指定する。
+    `@daily`、`@daily(depends=[...])`、`daily(job, depends=[...])`のいずれでも利用できる。
+    """
+    return register(daily_jobs, func, depends)
 
 
-def yearly(func: F) -> F:
-    yearly_jobs.append(func)
-    return func
+def monthly(func: F = None, *, depends: Iterable[Any] = ()) -> F:
+    return register(monthly_jobs, func, depends)
+
+
+def yearly(func: F = None, *, depends: Iterable[Any] = ()) -> F:
+    return register(yearly_jobs, func, depends)
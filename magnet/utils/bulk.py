@@ -0,0 +1,132 @@
+"""
+大量レコードを一括登録する。
+PostgreSQLではCOPY FROM STDINにテキスト形式のバッファを渡し、その他のデータベースではinsert文をバッチ実行する。
+レコードはチャンク単位で登録され、チャンク毎にセーブポイントを設けるため、失敗したチャンクのみが取り消される。
+"""
+import io
+import itertools
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Table, insert
+from sqlalchemy.orm import Session
+
+from ..commons import BulkResult
+
+DEFAULT_CHUNK_SIZE = 10000
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(iterable)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+def get_column_defaults(table: Table) -> Dict[str, Any]:
+    """python側で評価されるカラムのデフォルト値を返す。COPYではデフォルト値が評価されないため、事前に補う。"""
+    defaults = {}
+    for column in table.columns:
+        default = column.default
+        if default is None:
+            continue
+        if default.is_scalar:
+            defaults[column.key] = default.arg
+        elif default.is_callable:
+            defaults[column.key] = default.arg(None)
+
+    return defaults
+
+
+def normalize_rows(
+    table: Table, rows: List[Dict[str, Any]], defaults: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """全てのレコードが同じカラムを持つように、デフォルト値を補う。"""
+    keys = set(defaults)
+    for row in rows:
+        keys.update(row)
+
+    columns = [c.key for c in table.columns if c.key in keys]
+    return [{k: row.get(k, defaults.get(k)) for k in columns} for row in rows]
+
+
+def to_copy_value(value) -> str:
+    """COPYのテキスト形式に変換する。NoneはNULL（\\N）とする。"""
+    if value is None:
+        return "\\N"
+    elif isinstance(value, bool):
+        return "t" if value else "f"
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(jsonable_encoder(value), ensure_ascii=False)
+    else:
+        value = str(value)
+
+    return value.translate(COPY_ESCAPES)
+
+
+def copy_rows(db: Session, table: Table, rows: List[Dict[str, Any]]) -> int:
+    """PostgreSQLのCOPY FROM STDIN（テキスト形式）でレコードを登録する。"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join([to_copy_value(row[k]) for k in columns]))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    preparer = db.get_bind().dialect.identifier_preparer
+    stmt = "COPY {} ({}) FROM STDIN".format(
+        preparer.format_table(table),
+        ", ".join(preparer.quote(table.columns[x].name) for x in columns),
+    )
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(stmt, buffer)
+    finally:
+        cursor.close()
+
+    return len(rows)
+
+
+def insert_rows(db: Session, table: Table, rows: List[Dict[str, Any]]) -> int:
+    """insert文をバッチ実行してレコードを登録する。"""
+    db.execute(insert(table), rows)
+    return len(rows)
+
+
+def bulk_insert(
+    db: Session,
+    table: Table,
+    rows: Iterable[Dict[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> BulkResult:
+    """
+    レコードをチャンク単位で一括登録する。メモリ上には１チャンク分のレコードのみ保持する。
+    失敗したチャンクは取り消され、その内容はBulkResult.errorsに格納される。
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be greater than 0.")
+
+    db.flush()
+    if db.get_bind().dialect.name == "postgresql":
+        load = copy_rows
+    else:
+        load = insert_rows
+
+    defaults = get_column_defaults(table)
+    inserted = 0
+    ignored = 0
+    errors = []
+
+    for index, chunk in enumerate(chunked(rows, chunk_size)):
+        chunk = normalize_rows(table, chunk, defaults)
+        savepoint = db.begin_nested()
+        try:
+            inserted += load(db, table, chunk)
+            savepoint.commit()
+        except Exception as e:
+            savepoint.rollback()
+            ignored += len(chunk)
+            errors.append(f"chunk {index} ({len(chunk)} rows): {e}")
+
+    return BulkResult(inserted=inserted, ignored=ignored, errors=errors)
@@ -1,6 +1,7 @@
-from functools import lru_cache
+from functools import lru_cache, wraps
 from typing import (
     TYPE_CHECKING,
+    Callable,
     ClassVar,
     Generic,
     Iterable,
@@ -8,6 +9,7 @@ from typing import (
     Literal,
     Protocol,
     Sequence,
+    Tuple,
     Type,
     TypeVar,
     Union,
@@ -19,13 +21,35 @@ from typing import (
 from fastapi import HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy import Column, event, inspect, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import Query, Session, load_only, make_transient
 from sqlalchemy.sql.expression import insert
 
 from framework import undefined
 
+if TYPE_CHECKING:
+    from ..commons import BulkResult
+
 T = TypeVar("T")
+F = TypeVar("F", bound=Callable)
+
+
+def accept_async_session(func: F) -> F:
+    """
+    dbにAsyncSessionが渡された場合は、AsyncSession.run_syncで同期処理を実行するコルーチンを返す。
+    同期のSessionと同じ処理を、await rep.get(async_db, id=1)のように非同期のセッションでも利用できる。
+    """
+
+    @wraps(func)
+    def wrapper(self_or_cls, db, *args, **kwargs):
+        if isinstance(db, AsyncSession):
+            return db.run_sync(
+                lambda session: func(self_or_cls, session, *args, **kwargs)
+            )
+        return func(self_or_cls, db, *args, **kwargs)
+
+    return wrapper  # type: ignore
 
 
 # dummy
@@ -101,11 +125,19 @@ class PRepository(Protocol[T]):
         raise NotImplementedError()
 
     @staticmethod
-    def bulk_insert(db: Session, *, rows: Iterable[dict]):
+    def bulk_insert(
+        db: Session, *, rows: Iterable[dict], chunk_size: int = 10000
+    ) -> "BulkResult":
+        """レコードをチャンク単位で一括登録する。失敗したチャンクはBulkResult.errorsに格納される。"""
         raise NotImplementedError()
 
 
 class RepositoryBase(PRepository[T]):
+    """
+    queryとindex以外の操作は、AsyncSessionを渡した場合にコルーチンを返す（accept_async_sessionを参照）。
+    Queryは同期のセッションでのみ実行できるため、非同期のセッションではselect文をexecuteする。
+    """
+
     def __init__(self, model: Type[T]) -> None:
         raise RuntimeError("can't instatntiate.")
 
@@ -118,17 +150,20 @@ class RepositoryBase(PRepository[T]):
         return db.query(cls.as_model()).offset(skip).limit(limit)
 
     @classmethod
+    @accept_async_session
     def exist(cls, db: Session, *, id: int) -> bool:
         m = cls.as_model()
         obj = db.query(m.id).filter(m.id == id).one_or_none()  # type: ignore
         return obj is not None
 
     @classmethod
+    @accept_async_session
     def get(cls, db: Session, *, id: int) -> Union[T, None]:
         m = cls.as_model()
         return db.query(m).filter(m.id == id).one_or_none()
 
     @classmethod
+    @accept_async_session
     def create(cls, db: Session, **data) -> T:
         """レコードを作成する。idの指定は許容されない。"""
         id = data.pop("id", None)
@@ -138,6 +173,7 @@ class RepositoryBase(PRepository[T]):
         return obj
 
     @classmethod
+    @accept_async_session
     def insert(cls, db: Session, **data) -> T:
         """レコードを作成する。idの指定が許容される。idが指定されない場合は、新たなidが発行される"""
         obj = cls.as_model()(**data)
@@ -146,11 +182,13 @@ class RepositoryBase(PRepository[T]):
         return obj
 
     @classmethod
+    @accept_async_session
     def update(cls, db: Session, *, id: int, **data) -> Union[T, None]:
         """deprecated. use patch."""
         return cls.patch(db, id=id, **data)
 
     @classmethod
+    @accept_async_session
     def patch(cls, db: Session, *, id: int, **data) -> Union[T, None]:
         """レコードが存在する場合は、そのレコードを部分更新する。"""
         # if not "id" in data:
@@ -164,6 +202,7 @@ class RepositoryBase(PRepository[T]):
         return obj
 
     @classmethod
+    @accept_async_session
     def upsert(cls, db: Session, *, id: int, **data) -> Union[T, None]:
         """レコードが存在する場合は、そのレコードを部分更新する。存在しない場合は、レコードを作成する。"""
         obj = cls.patch(db, id=id, **data)
@@ -172,6 +211,7 @@ class RepositoryBase(PRepository[T]):
         return cls.insert(db, id=id, **data)
 
     @classmethod
+    @accept_async_session
     def put(cls, db: Session, *, id: int, **data) -> T:
         """指定されたidのレコードを、新たなデータでレコードを完全に置き換える。"""
         if id is not None:
@@ -181,6 +221,7 @@ class RepositoryBase(PRepository[T]):
         return obj
 
     @classmethod
+    @accept_async_session
     def delete(cls, db: Session, *, id: int) -> int:
         """指定されたidのレコードを削除する"""
         m = cls.as_model()
@@ -188,6 +229,7 @@ class RepositoryBase(PRepository[T]):
         return count
 
     @classmethod
+    @accept_async_session
     def duplicate(cls, db: Session, *, id: int) -> Union[T, None]:
         """指定されたidのレコードを複製する"""
         obj = cls.get(db, id=id)
@@ -202,8 +244,17 @@ class RepositoryBase(PRepository[T]):
         return obj
 
     @classmethod
-    def bulk_insert(cls, db: Session, *, rows: Iterable[dict]):
-        raise NotImplementedError()
+    def bulk_insert(
+        cls, db: Session, *, rows: Iterable[dict], chunk_size: int = 10000
+    ) -> "BulkResult":
+        """
+        レコードをチャンク単位で一括登録する。PostgreSQLではCOPYを、その他のデータベースではinsertのバッチ実行を利用する。
+        登録したオブジェクトはセッションに追加されない。失敗したチャンクはBulkResult.errorsに格納される。
+        """
+        from .bulk import bulk_insert
+
+        table = cls.as_model().__table__  # type: ignore
+        return bulk_insert(db, table, rows, chunk_size=chunk_size)
 
 
 class PService(Protocol[T]):
@@ -403,6 +454,12 @@ class MyQuery(Query):
 from inflector import Inflector
 
 
+@lru_cache(maxsize=None)
+def get_column_keys(cls: type) -> Tuple[str, ...]:
+    """モデルの列の属性名を返す。mapperの参照はクラス毎に一度だけ行う。"""
+    return tuple(c.key for c in inspect(cls).column_attrs)
+
+
 class Entity:
     @declared_attr
     def __tablename__(cls):
@@ -429,12 +486,14 @@ class Entity:
         else:
             return select(cls)
 
+    @accept_async_session
     def create(self, db: Session):
         """インスタンスを作成し、フラッシュする。idなどが発行されるが、コミットまで状態は確定していない。"""
         db.add(self)
         db.flush()
         return self
 
+    @accept_async_session
     def update(self, db: Session, **update):
         """インスタンスを更新し、他オブジェクトも含む変更をデータベースにフラッシュする。コミットまで状態は確定しない。"""
         if inspect(self).transient:
@@ -457,14 +516,18 @@ class Entity:
         #     False, "fetch", "evaluate"
         # ] = False,  # Falseはメモリ内オブジェクトを同期しない
     ):
-        """update文のwhereを組み立てます。なお、valuesを複数使用すると値は最後の値が有効になります。"""
+        """
+        update文のwhereを組み立てます。なお、valuesを複数使用すると値は最後の値が有効になります。
+        AsyncSessionでは、await db.execute(obj.stmt_update(...))のように実行します。
+        """
         return (
             update(self.__class__)
-            .where(self.identify)
+            .where(self.identify())
             .execution_options(synchronize_session=False)
             .values
         )
 
+    @accept_async_session
     def delete(self, db: Session) -> Literal[1]:
         """インスタンスを削除し、他オブジェクトも含む変更をデータベースにフラッシュする。コミットまで状態は確定しない。"""
         db.delete(self)
@@ -494,7 +557,12 @@ class Entity:
         return cls.as_rep().as_service()
 
     def dict(self, excludes=set()):
-        dic = {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
+        # 読み込み済みの値はインスタンスの__dict__から直接取得し、未読み込みの列のみ属性経由で読み込む
+        loaded = self.__dict__
+        dic = {
+            k: loaded[k] if k in loaded else getattr(self, k)
+            for k in get_column_keys(type(self))
+        }
         for name in excludes:
             dic.pop(name, None)
         return dic
@@ -0,0 +1,84 @@
+"""
+ORMのエンティティやpydanticのモデルを、jsonable_encoderを経由せずにJSONへ変換する。
+変換関数は型毎に一度だけ解決し、jsonable_encoderと同じ値を出力する。
+orjsonがインストールされている場合はorjsonで、ない場合は標準のjsonで変換する。
+"""
+import datetime
+import decimal
+import enum
+import json
+import uuid
+from functools import lru_cache
+from operator import attrgetter, methodcaller
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from .objects import Entity
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# jsonable_encoder（pydanticのENCODERS_BY_TYPE）と同じ変換を行う
+ENCODERS: Dict[type, Callable[[Any], Any]] = {
+    decimal.Decimal: float,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    datetime.time: datetime.time.isoformat,
+    datetime.timedelta: datetime.timedelta.total_seconds,
+    uuid.UUID: str,
+    bytes: bytes.decode,
+    set: list,
+    frozenset: list,
+}
+
+
+@lru_cache(maxsize=None)
+def get_encoder(cls: type) -> Callable[[Any], Any]:
+    """JSONで表現できない型の変換関数を返す。サブクラスは継承元の変換関数を利用する。"""
+    for base in cls.__mro__:
+        if base in ENCODERS:
+            return ENCODERS[base]
+    if issubclass(cls, Entity):
+        return methodcaller("dict")
+    if issubclass(cls, BaseModel):
+        return methodcaller("dict", by_alias=True)
+    if issubclass(cls, enum.Enum):
+        return attrgetter("value")
+    return jsonable_encoder
+
+
+def default(obj: Any) -> Any:
+    return get_encoder(type(obj))(obj)
+
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=default, option=OPTIONS)
+
+else:  # pragma: no cover
+
+    def dumps(content: Any) -> bytes:
+        return json.dumps(
+            content,
+            default=default,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    エンティティやそのリストをそのまま渡せるJSONResponse。
+    エンドポイントからこのレスポンスを返すと、FastAPIによるjsonable_encoderでの変換を省略できる。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -63,13 +63,16 @@ class CryptoWatchScheduler(Scheduler):
         from magnet.database import get_db
         from magnet.domain.datastore.models import CryptoOhlc
 
-        for db in get_db():
-            query = CryptoOhlc.Q_select_start_time(
-                db,
-                provider="cryptowatch",
-                market=market,
-                product=product,
-                periods=60 * 60 * 24,
-                order_by="asc",
-            )
-        return super().__init__(query)
+        def source():
+            # 日付はサーバーサイドカーソルで順に読み込み、全件をメモリに保持しない
+            for db in get_db():
+                yield from CryptoOhlc.Q_select_start_time(
+                    db,
+                    provider="cryptowatch",
+                    market=market,
+                    product=product,
+                    periods=60 * 60 * 24,
+                    order_by="asc",
+                )
+
+        return super().__init__(source)
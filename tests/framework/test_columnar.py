@@ -0,0 +1,86 @@
+import datetime
+from collections import namedtuple
+from typing import Optional
+
+import numpy as np
+import pytest
+from pydantic import BaseModel
+
+from framework import Linq
+
+
+class Row(BaseModel):
+    id: Optional[int]
+    name: str
+    price: float
+    size: int
+    closed: bool
+    at: datetime.date
+
+
+def create_rows(count):
+    return [
+        Row(
+            id=None if i == 0 else i,
+            name=f"n{i}",
+            price=i / 2,
+            size=i,
+            closed=i % 2 == 0,
+            at=datetime.date(2021, 1, 1),
+        )
+        for i in range(count)
+    ]
+
+
+def test_to_numpy_scalar():
+    assert Linq([1, 2, 3]).to_numpy().dtype == np.int64
+    assert Linq([1, 2.5, None]).to_numpy().tolist()[:2] == [1, 2.5]
+    assert np.isnan(Linq([1, 2.5, None]).to_numpy()[2])
+    assert Linq([1, 2, 3]).to_numpy(downcast=True).dtype == np.int32
+    assert Linq([2**40]).to_numpy(downcast=True).dtype == np.int64
+    assert Linq([1, 2]).to_numpy(dtype="float32").dtype == np.float32
+    assert Linq(["a", None]).to_numpy().tolist() == ["a", None]
+    assert Linq([]).to_numpy().tolist() == []
+
+    # 要素数が分からないイテレータは、配列を拡張しながら変換する
+    arr = Linq(iter(range(10000))).map(lambda x: x * 2).to_numpy()
+    assert arr.dtype == np.int64
+    assert arr.tolist() == list(range(0, 20000, 2))
+
+
+def test_to_dataframe_model():
+    df = Linq(create_rows(5000)).to_dataframe(Row)
+    assert list(df.columns) == ["id", "name", "price", "size", "closed", "at"]
+    assert df["id"].tolist()[:2] == [None, 1]
+    assert df["price"].dtype == np.float64
+    assert df["size"].dtype == np.int64
+    assert df["closed"].dtype == np.bool_
+    assert df["at"][0] == datetime.date(2021, 1, 1)
+
+    df = Linq(create_rows(10)).to_dataframe(["price", "size"], downcast=True)
+    assert list(df.dtypes) == [np.float32, np.int32]
+
+
+def test_to_dataframe_infer():
+    Point = namedtuple("Point", ["x", "y"])
+    df = Linq([Point(1, 2.0), Point(3, None)]).to_dataframe()
+    assert df["x"].tolist() == [1, 3]
+    assert df["y"].dtype == np.float64
+
+    df = Linq([{"a": 1, "b": "x"}, {"a": 2.5, "b": "y"}]).to_dataframe()
+    assert df["a"].tolist() == [1, 2.5]
+    assert df["b"].tolist() == ["x", "y"]
+
+    df = Linq([1, 2]).to_dataframe()
+    assert df[0].tolist() == [1, 2]
+
+    arr = Linq([{"a": 1, "b": 2.0}]).to_numpy()
+    assert arr.a.tolist() == [1]
+    assert arr.b.tolist() == [2.0]
+
+
+def test_to_arrow():
+    pytest.importorskip("pyarrow")
+    table = Linq(create_rows(3)).to_arrow(Row)
+    assert table.column("id").to_pylist() == [None, 1, 2]
+    assert table.column("price").to_pylist() == [0, 0.5, 1]
@@ -364,3 +364,382 @@ def test_iterator():
     arr = list(query_1)
     print(arr)
     assert Linq(arr).compare([1, 2]).all()
+
+
+def is_even(x):
+    return x % 2 == 0
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_linq_parallel(executor):
+    query = Linq(range(100)).map_parallel(
+        operator.neg, executor=executor, max_workers=2, chunksize=7
+    )
+    assert_same_iterator(query)
+    assert query.to_list() == [-x for x in range(100)]
+
+    query = Linq(range(100)).filter_parallel(
+        is_even, executor=executor, max_workers=2, chunksize=7
+    )
+    assert query.to_list() == list(range(0, 100, 2))
+
+    query = Linq(range(100)).map_parallel(
+        operator.neg, executor=executor, max_workers=2, chunksize=7, ordered=False
+    )
+    assert sorted(query) == sorted(-x for x in range(100))
+
+
+def test_linq_parallel_lazy():
+    """処理中のチャンク数は制限されるため、無限イテレータも評価できる。"""
+    consumed = []
+
+    def source():
+        while True:
+            consumed.append(1)
+            yield len(consumed)
+
+    query = Linq(source()).map_parallel(
+        lambda x: x * 2, max_workers=2, chunksize=3, prefetch=2
+    )
+    assert query.take(5).to_list() == [2, 4, 6, 8, 10]
+    assert len(consumed) <= 2 * 2 * 3 + 3
+
+    with pytest.raises(ZeroDivisionError):
+        Linq([1, 0]).map_parallel(lambda x: 1 / x).to_list()
+
+    with pytest.raises(ValueError):
+        Linq([1]).map_parallel(lambda x: x, executor="unknown").to_list()
+
+
+def test_linq_split():
+    query = Linq(range(7)).split(3)
+    assert_same_iterator(query)
+    assert query.to_list() == [[0, 1, 2], [3, 4, 5], [6]]
+    assert Linq([]).split(3).to_list() == []
+
+    # 使い回されるリストは、次のリストを取得する前に消費する
+    chunks = [tuple(x) for x in Linq(range(7)).split(3, reuse=True)]
+    assert chunks == [(0, 1, 2), (3, 4, 5), (6,)]
+    assert len({id(x) for x in Linq(range(7)).split(3, reuse=True)}) == 1
+
+    with pytest.raises(ValueError):
+        Linq(range(7)).split(0)
+
+
+def test_linq_buffer():
+    class Clock:
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    clock = Clock()
+
+    def source():
+        for i in range(6):
+            clock.now = i * 0.4
+            yield i
+
+    assert Linq(range(5)).buffer(2).to_list() == [[0, 1], [2, 3], [4]]
+
+    from framework.utils.linq import _chunks
+
+    # 経過時間（1秒）または件数（3件）に達した時点でリストを返す
+    assert list(_chunks(source(), size=3, seconds=1.0, clock=clock)) == [
+        [0, 1, 2],
+        [3, 4, 5],
+    ]
+    assert list(_chunks(source(), size=10, seconds=0.3, clock=clock)) == [
+        [0, 1],
+        [2, 3],
+        [4, 5],
+    ]
+
+
+def test_linq_chunk():
+    words = ["aa", "bbb", "c", "dddddd", "e", "f"]
+    assert Linq(words).chunk(4).to_list() == [
+        ["aa"],
+        ["bbb", "c"],
+        ["dddddd"],
+        ["e", "f"],
+    ]
+    assert Linq(words).chunk(100, size=4).to_list() == [
+        ["aa", "bbb", "c", "dddddd"],
+        ["e", "f"],
+    ]
+
+
+def test_linq_dispatch_batch():
+    received = []
+
+    def sink(rows):
+        if 3 in rows:
+            raise ValueError(rows)
+        received.append(sum(rows))
+
+    count, succeeded, exceptions = Linq(range(7)).dispatch_batch(sink, 3)
+    assert (count, succeeded, len(exceptions)) == (7, 4, 1)
+    assert received == [0 + 1 + 2, 6]
+
+
+def test_linq_fusion():
+    query = (
+        Linq(range(100))
+        .map(lambda x: x + 1)
+        .filter(lambda x: x % 2 == 0, lambda x: x % 3 != 0)
+        .step(2)
+        .take_while(lambda x: x < 80)
+        .map(str)
+    )
+    expected = [str(x) for x in range(1, 101) if x % 2 == 0 and x % 3 != 0][::2]
+    expected = [x for x in expected if int(x) < 80]
+    assert_same_iterator(query)
+    assert query.to_list() == expected
+
+    # 融合できない演算子を挟んだ場合も、前後のステージがそれぞれ融合される
+    query = Linq(range(10)).map(lambda x: x * 2).skip(2).filter(lambda x: x % 4 == 0)
+    assert query.to_list() == [4, 8, 12, 16]
+
+
+def test_linq_template():
+    template = Linq.dummy().map(lambda x: x * 2).skip(1).filter(lambda x: x > 4)
+    assert template([1, 2, 3, 4]).to_list() == [6, 8]
+    compiled = template._template
+    assert template(range(5)).to_list() == [6, 8]
+    assert template._template is compiled
+
+    with pytest.raises(Exception):
+        Linq([1]).map(lambda x: x)([1])
+
+
+def test_linq_join():
+    users = [(1, "a"), (2, "b"), (3, "c")]
+    logs = [(1, 10), (3, 30), (1, 11), (4, 40)]
+
+    query = Linq(logs).join(users, lambda x: x[0], lambda x: x[0])
+    assert_same_iterator(query)
+    assert query.to_list() == [
+        ((1, 10), (1, "a")),
+        ((3, 30), (3, "c")),
+        ((1, 11), (1, "a")),
+    ]
+
+    # 少ない方からハッシュ表を作成した場合も、結果の組み合わせは変わらない
+    for build in ["auto", "inner", "outer"]:
+        query = Linq(logs).join(
+            users,
+            lambda x: x[0],
+            lambda x: x[0],
+            lambda log, user: (user[1], log[1]),
+            build=build,
+        )
+        assert sorted(query) == [("a", 10), ("a", 11), ("c", 30)]
+
+    # 閾値を超える場合は、一時ファイルに退避しながら結合する
+    left = [(i % 50, i) for i in range(1000)]
+    right = [(i, str(i)) for i in range(0, 100, 2)]
+    expected = sorted((a[1], b[1]) for a in left for b in right if a[0] == b[0])
+    query = Linq(left).join(
+        right,
+        lambda x: x[0],
+        lambda x: x[0],
+        lambda a, b: (a[1], b[1]),
+        build="outer",
+        spill_threshold=10,
+    )
+    assert sorted(query) == expected
+
+
+def test_linq_join_auto_build(monkeypatch):
+    from framework.utils import spill
+
+    built = []
+    hash_join = spill.hash_join
+
+    def spy(build, probe, *args):
+        build = list(build)
+        built.append(len(build))
+        return hash_join(build, probe, *args)
+
+    monkeypatch.setattr(spill, "hash_join", spy)
+    small = [1, 2]
+    large = list(range(1000))
+
+    # 要素数が分かる場合は、少ない方からハッシュ表を作成する
+    assert Linq(small).join(large, lambda x: x, lambda x: x).count() == 2
+    assert built[-1] == 2
+    assert Linq(large).join(small, lambda x: x, lambda x: x).count() == 2
+    assert built[-1] == 2
+    assert Linq(small).join(Linq(large), lambda x: x, lambda x: x).count() == 2
+    assert built[-1] == 2
+
+    # 要素数が分からない場合は、内側から作成する
+    query = Linq(small).map(lambda x: x).join(large, lambda x: x, lambda x: x)
+    assert query.count() == 2
+    assert built[-1] == 1000
+
+
+def test_linq_group():
+    logs = [("btc", 10), ("eth", 5), ("btc", -4), ("eth", 1), ("xrp", 2)]
+
+    assert Linq(logs).lookup(lambda x: x[0], lambda x: x[1]) == {
+        "btc": [10, -4],
+        "eth": [5, 1],
+        "xrp": [2],
+    }
+
+    query = Linq(logs).group_by(lambda x: x[0])
+    assert query.to_list()[0] == ("btc", [("btc", 10), ("btc", -4)])
+
+    query = Linq(logs).group_by(
+        lambda x: x[0],
+        n="count",
+        total=("sum", lambda x: x[1]),
+        low=("min", lambda x: x[1]),
+        high=("max", lambda x: x[1]),
+        avg=("mean", lambda x: x[1]),
+    )
+    assert query.to_dict() == {
+        "btc": dict(n=2, total=6, low=-4, high=10, avg=3),
+        "eth": dict(n=2, total=6, low=1, high=5, avg=3),
+        "xrp": dict(n=1, total=2, low=2, high=2, avg=2),
+    }
+
+    with pytest.raises(ValueError):
+        Linq(logs).group_by(lambda x: x[0], total="median")
+
+    query = Linq(["a", "b"]).group_join(logs, lambda x: x, lambda x: x[0][0])
+    assert query.to_list() == [("a", []), ("b", [("btc", 10), ("btc", -4)])]
+
+
+def test_linq_order_by():
+    rows = [(2, "b"), (1, "c"), (2, "a"), (1, "a"), (3, "b")]
+
+    assert Linq([3, 1, 2]).order_by_asc().to_list() == [1, 2, 3]
+    assert Linq(rows).order_by_desc(lambda x: x[0]).to_list() == [
+        (3, "b"),
+        (2, "b"),
+        (2, "a"),
+        (1, "c"),
+        (1, "a"),
+    ]
+
+    query = Linq(rows).order_by_asc(lambda x: x[0]).then_by_desc(lambda x: x[1])
+    expected = [(1, "c"), (1, "a"), (2, "b"), (2, "a"), (3, "b")]
+    assert query.to_list() == expected
+    assert query.take(3).to_list() == expected[:3]
+
+    query = Linq(rows).order_by_desc(lambda x: x[1]).then_by_asc(lambda x: x[0])
+    assert query.take(2).to_list() == [(1, "c"), (2, "b")]
+
+    # 閾値を超える場合は、一時ファイルに退避しながらソートする（安定ソート）
+    rows = [(i % 7, i) for i in range(1000)]
+    query = Linq(rows).order_by_asc(lambda x: x[0], spill_threshold=64)
+    assert query.to_list() == sorted(rows, key=lambda x: x[0])
+    query = Linq(rows).order_by_desc(lambda x: x[0], spill_threshold=64)
+    assert query.to_list() == sorted(rows, key=lambda x: x[0], reverse=True)
+
+
+def test_linq_set():
+    assert Linq([1, 2, 2, 3]).union([3, 4], [5, 1]).to_list() == [1, 2, 3, 4, 5]
+    assert Linq([1, 2, 2, 3, 4]).difference([2, 4]).to_list() == [1, 3]
+    assert Linq([1, 2, 2, 3, 4]).intersect([4, 2, 5]).to_list() == [2, 4]
+
+
+class CountingSource:
+    """評価された回数を記録する。"""
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.evaluated = 0
+
+    def __iter__(self):
+        self.evaluated += 1
+        yield from self.iterable
+
+
+def test_linq_save():
+    import array
+
+    source = CountingSource([1, 2, 3])
+    query = Linq(source).map(lambda x: x * 2).save()
+    assert source.evaluated == 1
+    assert isinstance(query.__root__.__root__, array.array)
+    assert query.to_list() == [2, 4, 6]
+    assert query.max() == 6
+    assert source.evaluated == 1
+
+    assert Linq([1.5, 2]).save().to_list() == [1.5, 2]
+    assert Linq([2**70]).save().to_list() == [2**70]
+    assert Linq(["a"]).save(tuple).to_list() == ["a"]
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_linq_cache(spill):
+    source = CountingSource(range(10))
+    query = Linq(source).map(lambda x: x * 2).cache(spill=spill)
+    assert source.evaluated == 0
+
+    # 途中で打ち切った場合も、次の評価は続きから再開する
+    assert query.take(3).to_list() == [0, 2, 4]
+    a, b = iter(query), iter(query)
+    assert [next(a), next(a)] == [0, 2]
+    assert [next(b) for _ in range(5)] == [0, 2, 4, 6, 8]
+    assert list(a) == [4, 6, 8, 10, 12, 14, 16, 18]
+    assert query.count() == 10
+    assert query.max() == 18
+    assert source.evaluated == 1
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_linq_cache_error(spill):
+    def source():
+        yield 1
+        yield 2
+        raise OSError("failed")
+
+    query = Linq(source).cache(spill=spill)
+    for _ in range(2):
+        # 途中までの要素を全件とみなさず、以降の評価でも同じ例外を送出する
+        it = iter(query)
+        assert [next(it), next(it)] == [1, 2]
+        with pytest.raises(OSError):
+            next(it)
+
+
+def test_linq_cache_key():
+    source = CountingSource([1, 2])
+    try:
+        assert Linq(source).cache(key="test").to_list() == [1, 2]
+        assert Linq(source).cache(key="test").to_list() == [1, 2]
+        assert source.evaluated == 1
+    finally:
+        Linq.clear_cache("test")
+
+    assert Linq(source).cache(key="test").to_list() == [1, 2]
+    assert source.evaluated == 2
+    Linq.clear_cache()
+
+
+def test_linq_tee():
+    source = CountingSource(range(5))
+    a, b = Linq(source).tee()
+    assert a.take(2).to_list() == [0, 1]
+    assert b.to_list() == [0, 1, 2, 3, 4]
+    assert a.to_list() == [2, 3, 4]
+    assert source.evaluated == 1
+
+    a, b = Linq(range(10)).tee(max_buffer=3)
+    with pytest.raises(BufferError):
+        a.to_list()
+    # 先行した読み出し元が切り離されても、遅れた読み出し元は全ての要素を読み出せる
+    assert b.to_list() == list(range(10))
+
+    a, b, c = Linq(range(10)).tee(3, max_buffer=2)
+    with pytest.raises(BufferError):
+        a.to_list()
+    assert [(x, y) for x, y in zip(b, c)] == [(x, x) for x in range(10)]
+
+    a, b = Linq(range(10)).tee(max_buffer=1)
+    assert [(x, y) for x, y in zip(a, b)] == [(x, x) for x in range(10)]
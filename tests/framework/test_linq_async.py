@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from framework import Linq, LinqAsync
+
+
+async def aiterate(count):
+    for i in range(count):
+        await asyncio.sleep(0)
+        yield i
+
+
+def test_linq_async():
+    async def main():
+        query = (
+            LinqAsync(aiterate(10)).filter(lambda x: x % 2 == 0).map(lambda x: x * 2)
+        )
+        assert await query.to_list() == [0, 4, 8, 12, 16]
+
+        # 同期イテレータは何度でも評価できる
+        query = Linq([1, 2, 3]).to_async().map(lambda x: x * 2)
+        assert await query.to_list() == [2, 4, 6]
+        assert await query.to_list() == [2, 4, 6]
+
+        query = LinqAsync(range(5)).buffer(2)
+        assert await query.to_list() == [[0, 1], [2, 3], [4]]
+
+        query = LinqAsync(range(5)).take(2)
+        assert await query.to_list() == [0, 1]
+
+    asyncio.run(main())
+
+
+def test_linq_async_map_async():
+    running = 0
+    max_running = 0
+
+    async def work(x):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01 * (5 - x % 5))
+        running -= 1
+        return x * 10
+
+    async def main():
+        query = LinqAsync(range(20)).map_async(work, concurrency=4)
+        assert await query.to_list() == [x * 10 for x in range(20)]
+        assert max_running == 4
+
+        query = LinqAsync(range(20)).map_async(work, concurrency=4, ordered=False)
+        result = await query.to_list()
+        assert result != sorted(result)
+        assert sorted(result) == [x * 10 for x in range(20)]
+
+    asyncio.run(main())
+
+
+def test_linq_async_bounded():
+    """実行中のコルーチンはconcurrencyまでに制限されるため、無限の非同期イテレータも評価できる。"""
+    consumed = []
+
+    async def infinite():
+        i = 0
+        while True:
+            consumed.append(i)
+            yield i
+            i += 1
+
+    async def work(x):
+        await asyncio.sleep(0.01)
+        return x
+
+    async def main():
+        query = LinqAsync(infinite()).map_async(work, concurrency=3).take(5)
+        assert await query.to_list() == [0, 1, 2, 3, 4]
+        assert len(consumed) == 7
+        # 打ち切られた時点で実行中のコルーチンは残らない
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(main())
+
+
+def test_linq_async_gather():
+    async def double(x):
+        await asyncio.sleep(0)
+        return x * 2
+
+    async def main():
+        assert await LinqAsync([double(1), double(2)]).gather() == [2, 4]
+        factories = [lambda i=i: double(i) for i in range(5)]
+        assert await LinqAsync(factories).gather(concurrency=2) == [0, 2, 4, 6, 8]
+
+    asyncio.run(main())
+
+
+def test_linq_async_to_sync():
+    query = LinqAsync(aiterate(5)).map(lambda x: x + 1).to_sync()
+    assert query.take(3).to_list() == [1, 2, 3]
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            LinqAsync(aiterate(5)).to_sync().to_list()
+
+    asyncio.run(main())
+
+    with pytest.raises(ValueError):
+        LinqAsync(None)
@@ -0,0 +1,19 @@
+"""
+融合したLinqのパイプラインが、ステージ毎にジェネレータを連結したパイプラインと同じ結果を返すことを確認する。
+処理時間の比較はbenchmarks/linq_fusion.pyで行う。
+"""
+from benchmarks.linq_fusion import fused, unfused
+from framework import Linq
+
+SIZE = 10000
+
+
+def test_linq_fusion():
+    assert sum(fused(range(SIZE))) == sum(unfused(range(SIZE)))
+    assert list(fused(range(100))) == list(unfused(range(100)))
+
+
+def test_linq_fusion_template():
+    template = fused(Linq.dummy())
+    for size in (0, 10, 100):
+        assert sum(template(range(size))) == sum(unfused(range(size)))
@@ -24,6 +24,24 @@ def test_by_datetimes():
         assert results[31].day == 32
 
 
+def test_by_datetimes_function():
+    calls = []
+
+    def source():
+        calls.append(1)
+        yield from (DateTimeAware(2010, 1, x) for x in range(1, 32))
+
+    async def main():
+        scheduler = Scheduler(source)
+        assert calls == []
+        return [x async for x in scheduler], [x async for x in scheduler]
+
+    first, second = asyncio.run(main())
+    assert len(first) == 31
+    assert first == second
+    assert len(calls) == 2
+
+
 def test_by_seconds():
     async def main():
         results = []
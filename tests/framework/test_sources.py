@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from framework import Linq
+
+
+def test_from_text_line(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("abc\nあいう\r\n\nlast", encoding="utf-8")
+
+    query = Linq.from_text_line(str(path))
+    assert query.to_list() == ["abc", "あいう", "", "last"]
+    assert query.to_list() == ["abc", "あいう", "", "last"]
+    assert query.take(1).to_list() == ["abc"]
+
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    assert Linq.from_text_line(str(path)).to_list() == []
+
+
+def test_from_json(tmp_path):
+    path = tmp_path / "a.jsonl"
+    path.write_text('{"id": 1}\n\n{"id": 2}\n')
+    assert Linq.from_json(str(path)).map(lambda x: x["id"]).to_list() == [1, 2]
+
+    path = tmp_path / "a.json"
+    path.write_text(json.dumps([{"id": 1}, {"id": 2}]))
+    assert Linq.from_json(str(path), lines=False).to_list() == [{"id": 1}, {"id": 2}]
+
+
+def test_from_csv(tmp_path):
+    path = tmp_path / "a.csv"
+    rows = ["time,price,memo"] + [f"{i},{i / 2},m{i}" for i in range(2500)]
+    rows.append('2500,,"multi\nline"')
+    path.write_text("\n".join(rows) + "\n")
+
+    query = Linq.from_csv(
+        str(path), types={"time": int, "price": float}, chunk_size=100
+    )
+    result = query.to_list()
+    assert len(result) == 2501
+    assert result[1] == (1, 0.5, "m1")
+    assert result[-1] == (2500, None, "multi\nline")
+
+    query = Linq.from_csv(str(path), types=[int], as_dict=True)
+    assert query.first() == {"time": 0, "price": "0.0", "memo": "m0"}
+
+    query = Linq.from_csv(str(path), header=False)
+    assert query.first() == ("time", "price", "memo")
+
+    with pytest.raises(ValueError):
+        Linq.from_csv(str(path), header=False, as_dict=True).to_list()
+
+
+def test_from_csv_blank_and_ragged_rows(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("a,b\n1,2\n3,4\n\n5,6\n")
+    query = Linq.from_csv(str(path), types=[int, int])
+    assert query.to_list() == [(1, 2), (3, 4), (5, 6)]
+
+    # 列数が異なる行があっても、他の行の列は切り詰めない
+    path.write_text("a,b\n1,x\n3\n5,y,z\n")
+    query = Linq.from_csv(str(path), types={"a": int, "b": str.upper})
+    assert query.to_list() == [(1, "X"), (3,), (5, "Y", "z")]
+
+
+def test_from_glob(tmp_path):
+    for i in range(5):
+        path = tmp_path / f"{i}.jsonl"
+        path.write_text("\n".join(json.dumps(i * 1000 + x) for x in range(1000)))
+
+    pattern = str(tmp_path / "*.jsonl")
+    query = Linq.from_glob(pattern, reader=Linq.from_json, max_workers=3)
+    assert sorted(query) == list(range(5000))
+    assert query.take(10).len() == 10
+
+    query = Linq.from_glob(pattern, reader=Linq.from_json, max_workers=1)
+    assert query.to_list() == list(range(5000))
+
+    assert Linq.from_glob(str(tmp_path / "*.none")).to_list() == []
+
+
+def test_from_glob_error(tmp_path):
+    (tmp_path / "a.jsonl").write_text("{")
+    with pytest.raises(json.JSONDecodeError):
+        Linq.from_glob(str(tmp_path / "*.jsonl"), reader=Linq.from_json).to_list()
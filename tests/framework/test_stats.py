@@ -0,0 +1,82 @@
+import random
+import statistics
+
+import pytest
+
+from framework import Linq
+from framework.utils import stats
+
+
+def test_stats_small():
+    assert Linq([]).average() is None
+    assert Linq([1, 2, 3, 4]).average() == 2.5
+    assert Linq([{"v": 1}, {"v": 3}]).average(lambda x: x["v"]) == 2
+    assert Linq([4, 7, 13, 16]).variance() == statistics.variance([4, 7, 13, 16])
+    assert Linq([4, 7, 13, 16]).std(ddof=0) == statistics.pstdev([4, 7, 13, 16])
+    assert Linq([1]).variance() is None
+
+    # ５件以下は正確な値を返す
+    assert Linq([3, 1, 2]).median() == 2
+    assert Linq([4, 1, 3, 2]).median() == 2.5
+    assert Linq([1, 2, 3, 4, 5]).quantile(0) == 1
+
+    assert Linq([1, 2, 2, 3, 3, 3]).mode() == 3
+    assert Linq([]).mode() is None
+
+    with pytest.raises(ValueError):
+        stats.Quantile(1.5)
+
+
+def test_stats_stable_variance():
+    """大きな値を加えても、桁落ちせずに分散を求められる。"""
+    values = [1e9 + x for x in [4, 7, 13, 16]]
+    assert Linq(values).variance() == pytest.approx(30)
+
+
+def test_stats_streaming():
+    rng = random.Random(0)
+    values = [rng.gauss(100, 15) for _ in range(20000)]
+    quantiles = statistics.quantiles(values, n=100)
+
+    aggregators = dict(
+        n=stats.Count(),
+        mean=stats.Mean(),
+        std=stats.Std(),
+        median=stats.Median(),
+        p01=stats.Quantile(0.01),
+        p99=stats.Quantile(0.99),
+        low=stats.Min(),
+        high=stats.Max(),
+    )
+    result = Linq(iter(values)).aggregate(**aggregators)
+
+    assert result["n"] == 20000
+    assert result["mean"] == pytest.approx(statistics.mean(values))
+    assert result["std"] == pytest.approx(statistics.stdev(values))
+    assert result["median"] == pytest.approx(statistics.median(values), abs=1)
+    assert result["p01"] == pytest.approx(quantiles[0], abs=1)
+    assert result["p99"] == pytest.approx(quantiles[98], abs=1)
+    assert (result["low"], result["high"]) == (min(values), max(values))
+
+    # 渡した集計器の状態は変更されない
+    assert Linq([1, 2]).aggregate(**aggregators)["n"] == 2
+
+
+def test_stats_mode_capacity():
+    values = [1] * 50 + list(range(100, 200)) + [2] * 30
+    assert Linq(values).mode(capacity=10) == 1
+    assert Linq(values).aggregate(mode=stats.Mode(capacity=10)) == dict(mode=1)
+
+
+def test_stats_mode_buckets():
+    values = [random.randrange(50) for _ in range(2000)]
+    mode = stats.Mode(capacity=10)
+    for x in values:
+        mode.add(x)
+        assert mode.min_count == min(mode.counts.values())
+
+    # 出現回数毎のバケットは、値毎の出現回数と一致する
+    assert {
+        value: count for count, bucket in mode.buckets.items() for value in bucket
+    } == mode.counts
+    assert sum(mode.counts.values()) == len(values)
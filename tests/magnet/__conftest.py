@@ -2,9 +2,23 @@ from pytest import fixture
 from sqlalchemy_utils import database_exists
 
 from magnet.__main import app
-from magnet.database import Base, create_db, create_db_engine, drop_db, env, get_db
+from magnet.database import (
+    Base,
+    create_async_db_engine,
+    create_db,
+    create_db_engine,
+    create_get_async_db,
+    drop_db,
+    env,
+    get_async_db,
+    get_db,
+)
 
 engine, override_get_db = create_db_engine(env.sqlalchemy_database_test_url)
+async_engine, async_session_maker = create_async_db_engine(
+    env.sqlalchemy_database_async_test_url
+)
+override_get_async_db = create_get_async_db(async_session_maker)
 
 
 @fixture(scope="session", autouse=True)
@@ -14,6 +28,7 @@ def override_dependency():
 
     Base.metadata.create_all(bind=engine)
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 def test_db():
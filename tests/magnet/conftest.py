@@ -1,2 +1,24 @@
+import sqlalchemy as sa
+from pytest import fixture
+from sqlalchemy.orm import sessionmaker
+
 engine = None
 override_get_db = None
+
+
+@fixture
+def create_session():
+    """指定したモデルのテーブルのみを作成した、インメモリのsqliteのセッションを返す関数。"""
+    sessions = []
+
+    def create(*models):
+        engine = sa.create_engine("sqlite://", future=True)
+        for model in models:
+            model.__table__.create(engine)
+        session = sessionmaker(bind=engine, future=True)()
+        sessions.append(session)
+        return session
+
+    yield create
+    for session in sessions:
+        session.close()
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from magnet.database import create_get_async_db
+from magnet.domain.datastore.models import EtlJobResult
+
+
+class FakeAsyncSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def rollback(self):
+        self.log.append("rollback")
+
+    async def close(self):
+        self.log.append("close")
+
+
+class SyncBackedAsyncSession(AsyncSession):
+    """run_syncを、sqliteの同期セッションでそのまま実行する。"""
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.sync_session, *args, **kwargs)
+
+
+def test_get_async_db_commit():
+    log = []
+    get_async_db = create_get_async_db(lambda: FakeAsyncSession(log))
+
+    async def main():
+        agen = get_async_db()
+        db = await agen.__anext__()
+        with pytest.raises(StopAsyncIteration):
+            await agen.__anext__()
+        return db
+
+    assert isinstance(asyncio.run(main()), FakeAsyncSession)
+    assert log == ["commit", "close"]
+
+
+def test_get_async_db_rollback():
+    log = []
+    get_async_db = create_get_async_db(lambda: FakeAsyncSession(log))
+
+    async def main():
+        agen = get_async_db()
+        await agen.__anext__()
+        await agen.athrow(ValueError("failed"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+    assert log == ["rollback", "close"]
+
+
+def test_entity_helpers_accept_async_session(create_session):
+    session = create_session(EtlJobResult)
+    db = SyncBackedAsyncSession(session)
+    rep = EtlJobResult.as_rep()
+    values = dict(name="a", deleted=0, inserted=1, error_summary="", warning="")
+
+    async def main():
+        obj = await EtlJobResult(**values).create(db)
+        assert obj.id is not None
+        assert await rep.exist(db, id=obj.id)
+
+        await obj.update(db, inserted=2)
+        assert (await rep.get(db, id=obj.id)).inserted == 2
+
+        created = await rep.create(db, **{**values, "name": "b"})
+        assert await rep.delete(db, id=created.id) == 1
+        return obj
+
+    obj = asyncio.run(main())
+    assert session.query(EtlJobResult).one() is obj
+
+    # 同期のセッションでは、これまで通り値を返す
+    assert rep.get(session, id=obj.id) is obj
@@ -0,0 +1,92 @@
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from magnet.domain.trade import analyzers  # noqa: F401 アナライザを登録する
+from magnet.domain.trade import backtest
+
+
+def create_frame(closes, highs=None, lows=None, t_cross=None):
+    start = datetime.date(2020, 1, 1)
+    size = len(closes)
+    return pd.DataFrame(
+        dict(
+            close_time=[start + datetime.timedelta(days=i) for i in range(size)],
+            open_price=[closes[0]] + closes[:-1],
+            high_price=highs or closes,
+            low_price=lows or closes,
+            close_price=closes,
+            t_cross=t_cross or [0] * size,
+        )
+    )
+
+
+def create_profile(**kwargs):
+    values = dict(
+        id=1,
+        version=1,
+        name="test",
+        provider="cryptowatch",
+        market="bitflyer",
+        product="btcfxjpy",
+        periods=60 * 60 * 24,
+        analyzers=["t_cross"],
+        margin=1000,
+        ask_limit_rate=None,
+        ask_stop_rate=None,
+        bid_limit_rate=None,
+        bid_stop_rate=None,
+    )
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+def test_combine_signals():
+    a = np.array([np.nan, 1, np.nan])
+    b = np.array([-1, -1, np.nan])
+    result = backtest.combine_signals([a, b], 3)
+    np.testing.assert_array_equal(result, [-1, 1, np.nan])
+
+
+def test_backtest_signal():
+    frame = create_frame([100.0, 110.0, 120.0, 90.0], t_cross=[1, 0, -1, 0])
+    result = backtest.run_backtest(create_profile(), frame)
+
+    assert len(result.trades) == 1
+    trade = result.trades[0]
+    assert trade["side"] == 1
+    assert trade["size"] == 10
+    assert trade["entry_price"] == 100
+    assert trade["counter_price"] == 120
+    assert trade["fact_profit"] == 200
+    # 売りポジションの含み益を含む資産曲線
+    np.testing.assert_allclose(result.equity, [0, 100, 200, 200 + 30 * 8.33])
+    assert result.summary() == dict(
+        trades=1, fact_profit=200.0, max_drawdown=0.0, win_rate=1.0
+    )
+
+
+def test_backtest_limit_stop():
+    profile = create_profile(
+        analyzers=["always_buy"], ask_limit_rate=1.1, ask_stop_rate=0.9
+    )
+    frame = create_frame(
+        [100.0, 100.0, 100.0, 100.0],
+        highs=[100.0, 115.0, 100.0, 100.0],
+        lows=[100.0, 100.0, 80.0, 100.0],
+    )
+    result = backtest.run_backtest(profile, frame)
+
+    assert [(x["counter_reason"], x["counter_price"]) for x in result.trades] == [
+        ("limit", pytest.approx(110.0)),
+        ("stop", pytest.approx(90.0)),
+    ]
+
+
+def test_backtest_invert():
+    frame = create_frame([100.0, 90.0], t_cross=[1, 0])
+    result = backtest.run_backtest(create_profile(analyzers=["-t_cross"]), frame)
+    np.testing.assert_allclose(result.equity, [0, 100])
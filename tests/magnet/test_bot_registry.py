@@ -0,0 +1,80 @@
+import sqlalchemy as sa
+
+from magnet.domain.trade import topics  # noqa: F401 トピックを登録する
+from magnet.domain.trade.abc import BrokerImpl
+from magnet.domain.trade.bot import bot_registry
+from magnet.domain.trade.models import TradeBot, TradeProfile
+from magnet.domain.trade.repository import BrokerRepository
+from magnet.domain.trade.usecase import ScheduleBot
+
+
+@BrokerRepository.register
+class FakeRegistryBroker(BrokerImpl):
+    _name = "fake_registry"
+
+    def __init__(self):
+        pass
+
+
+def create_profile(db):
+    profile = TradeProfile(
+        name="bot",
+        description="",
+        provider="cryptowatch",
+        market="fake_registry",
+        product="btcjpy",
+        periods=60 * 60 * 24,
+        analyzers=[],
+    ).create(db)
+    TradeBot(profile_id=profile.id, is_active=False).create(db)
+    return profile
+
+
+def test_bot_registry_reuse_graph(create_session):
+    bot_registry.invalidate()
+    db = create_session(TradeProfile, TradeBot)
+    profile = create_profile(db)
+    action = ScheduleBot(profile_id=profile.id)
+
+    first = action.build(db)
+    second = action.build(db)
+    assert second.broker is first.broker
+    assert second.topics is first.topics
+    assert second.state is not first.state
+    assert bot_registry.stats() == dict(hits=1, misses=1, size=1)
+
+    # プロファイルのスナップショットは、セッションを閉じた後も参照できる
+    db.close()
+    assert second.profile.market == "fake_registry"
+
+
+def test_bot_registry_invalidate(create_session):
+    bot_registry.invalidate()
+    db = create_session(TradeProfile, TradeBot)
+    profile = create_profile(db)
+    action = ScheduleBot(profile_id=profile.id)
+    bot = action.build(db)
+    assert bot.profile.version == 1
+
+    # プロファイルを更新するとversionが増え、再構築される
+    profile.product = "ethjpy"
+    db.flush()
+    assert profile.version == 2
+    assert profile.id not in bot_registry.entries
+    bot = action.build(db)
+    assert bot.profile.product == "ethjpy"
+
+    # 他のプロセスでの更新は、versionの違いで検知する
+    db.execute(
+        sa.update(TradeProfile)
+        .where(TradeProfile.id == profile.id)
+        .values(version=TradeProfile.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.expire_all()
+    rebuilt = action.build(db)
+    assert rebuilt.broker is not bot.broker
+    assert rebuilt.profile.version == 3
+
+    action.switch(db, is_active=True)
+    assert profile.id not in bot_registry.entries
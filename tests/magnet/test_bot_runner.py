@@ -0,0 +1,76 @@
+import asyncio
+
+from magnet.domain.trade.abc import BrokerImpl, _account_locks, get_account_lock
+from magnet.domain.trade.runner import deal_concurrently
+
+
+class Running:
+    """同時に実行中のdeal_atの数と、その最大値を記録する。"""
+
+    def __init__(self):
+        self.count = 0
+        self.peak = 0
+
+
+class FakeBot:
+    def __init__(self, running, error=False):
+        self.running = running
+        self.error = error
+
+    async def deal_at(self, current_dt):
+        self.running.count += 1
+        self.running.peak = max(self.running.peak, self.running.count)
+        # 他のBOTに制御を渡し、並行して実行されていれば同時に実行中となる
+        for _ in range(3):
+            await asyncio.sleep(0)
+        self.running.count -= 1
+        if self.error:
+            raise Exception("failed")
+        return current_dt
+
+
+class FakeBroker(BrokerImpl):
+    _name = "fake"
+
+    def __init__(self, account):
+        self.account = account
+
+    def get_account(self):
+        return self.account
+
+
+def test_deal_concurrently():
+    running = Running()
+    bots = [FakeBot(running), FakeBot(running, error=True), FakeBot(running)]
+
+    results = asyncio.run(deal_concurrently(bots, current_dt=1, concurrency=3))
+
+    assert running.peak == 3
+    assert results[0] == 1 and results[2] == 1
+    assert isinstance(results[1], Exception)
+
+
+def test_deal_concurrently_limit():
+    running = Running()
+    bots = [FakeBot(running) for _ in range(4)]
+
+    results = asyncio.run(deal_concurrently(bots, current_dt=1, concurrency=2))
+
+    assert running.peak == 2
+    assert results == [1, 1, 1, 1]
+
+
+def test_account_lock():
+    async def main():
+        a = get_account_lock(FakeBroker("a"))
+        assert a is get_account_lock(FakeBroker("a"))
+        assert a is not get_account_lock(FakeBroker("b"))
+        return asyncio.get_running_loop()
+
+    loop = asyncio.run(main())
+    assert loop in _account_locks
+
+    # 終了したループのロックは、次のループでロックを取得した際に破棄される
+    asyncio.run(main())
+    assert loop not in _account_locks
+    assert len(_account_locks) == 1
@@ -0,0 +1,46 @@
+from magnet.domain.datastore.models import CryptoMarket, EtlJobResult
+from magnet.utils import bulk
+
+
+def test_chunked():
+    assert list(bulk.chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(bulk.chunked([], 2)) == []
+
+
+def test_to_copy_value():
+    assert bulk.to_copy_value(None) == "\\N"
+    assert bulk.to_copy_value(True) == "t"
+    assert bulk.to_copy_value("a\tb\\c\nd") == "a\\tb\\\\c\\nd"
+    assert bulk.to_copy_value({"a": [1]}) == '{"a": [1]}'
+
+
+def test_bulk_insert_fill_defaults(create_session):
+    db = create_session(EtlJobResult)
+    rows = [
+        dict(name=str(i), deleted=0, inserted=i, error_summary="", warning="")
+        for i in range(5)
+    ]
+    result = EtlJobResult.as_rep().bulk_insert(db, rows=iter(rows), chunk_size=2)
+
+    assert result.inserted == 5
+    assert not result.errors
+    assert db.query(EtlJobResult).count() == 5
+    obj = db.query(EtlJobResult).first()
+    assert obj.ignored == 0
+    assert obj.errors == []
+    assert obj.execute_at is not None
+
+
+def test_bulk_insert_rollback_failed_chunk(create_session):
+    db = create_session(CryptoMarket)
+    rows = [
+        dict(id=i % 3, provider="p", exchange="e", pair="btcjpy", active=True)
+        for i in range(6)
+    ]
+    result = CryptoMarket.as_rep().bulk_insert(db, rows=rows, chunk_size=3)
+
+    assert result.inserted == 3
+    assert result.ignored == 3
+    assert len(result.errors) == 1
+    assert result.errors[0].startswith("chunk 1 (3 rows)")
+    assert db.query(CryptoMarket).count() == 3
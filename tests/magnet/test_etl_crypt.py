@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from framework import DateTimeAware
+from magnet.domain.datastore import indicators
+from magnet.domain.datastore.caches import latest_ohlc_cache
+from magnet.domain.datastore.models import CryptoOhlc
+from magnet.etl.crypt import CryptoWatchOhlcExtractor
+from trade_api.exchanges.cryptowatch import CryptowatchAPI
+
+PARTITION = dict(
+    provider="cryptowatch", market="bitflyer", product="btcjpy", periods=86400
+)
+INDICATOR_COLUMNS = [
+    c.key for c in CryptoOhlc.__table__.columns if c.key.startswith(("wb_", "t_"))
+]
+
+
+def create_candles(days: int):
+    start = datetime.datetime(2020, 1, 2, tzinfo=datetime.timezone.utc)
+    candles = []
+    for i in range(days):
+        price = 100 + i + 10 * math.sin(i / 3)
+        candles.append(
+            SimpleNamespace(
+                close_time=start + datetime.timedelta(days=i),
+                open_price=price - 1,
+                high_price=price + 2,
+                low_price=price - 2,
+                close_price=price,
+                volume=1.0,
+                quote_volume=price,
+            )
+        )
+    return candles
+
+
+@pytest.fixture
+def cryptowatch(monkeypatch):
+    """list_ohlcをavailableのローソク足から、after以降を返すように置き換える。"""
+    api = SimpleNamespace(available=[], requested=[])
+
+    async def list_ohlc(self, market, product, periods, after):
+        api.requested.append(after)
+        return [x for x in api.available if x.close_time >= after]
+
+    monkeypatch.setattr(CryptowatchAPI, "list_ohlc", list_ohlc)
+    yield api
+    latest_ohlc_cache.invalidate()
+
+
+def run_job(db, incremental: bool):
+    job = CryptoWatchOhlcExtractor(
+        **PARTITION, after=DateTimeAware(2020, 1, 1), incremental=incremental
+    )
+    result = asyncio.run(job(db))
+    db.commit()
+    return result
+
+
+def select_all(db):
+    return db.query(CryptoOhlc).order_by(CryptoOhlc.close_time).all()
+
+
+def test_incremental_matches_full_reload(create_session, cryptowatch, monkeypatch):
+    candles = create_candles(260)
+
+    # 全件を取り込んだ結果を正とする
+    full_db = create_session(CryptoOhlc)
+    cryptowatch.available = candles
+    run_job(full_db, incremental=False)
+    expected = select_all(full_db)
+    assert len(expected) == 260
+
+    # 途中まで取り込んだ後、差分を取り込む
+    db = create_session(CryptoOhlc)
+    cryptowatch.available = candles[:240]
+    run_job(db, incremental=True)
+    last_close_time = max(x.close_time for x in select_all(db))
+    # 洗い替えられなかった行を判別するため、取り込み済みの行に印をつける
+    db.query(CryptoOhlc).update({"volume": -1})
+    db.commit()
+
+    warmups = []
+    select_warmup = CryptoOhlc.Q_select_warmup.__func__
+
+    def spy_warmup(cls, db, **kwargs):
+        rows = select_warmup(cls, db, **kwargs)
+        warmups.append((kwargs["until"], rows))
+        return rows
+
+    monkeypatch.setattr(CryptoOhlc, "Q_select_warmup", classmethod(spy_warmup))
+    cryptowatch.available = candles
+    result = run_job(db, incremental=True)
+
+    # 最新のローソク足の日から取得し直し、その末尾のみを洗い替える
+    assert cryptowatch.requested[-1] == DateTimeAware.combine(
+        last_close_time, datetime.time()
+    )
+    since = last_close_time
+    assert result.deleted == 1
+    assert result.inserted == 21
+
+    actual = select_all(db)
+    assert len(actual) == 260
+    for row in actual:
+        if row.close_time < since:
+            assert row.volume == -1
+        else:
+            assert row.volume == 1
+
+    # 指標の再計算には、since以前の直近のローソク足を利用する
+    [(until, rows)] = warmups
+    assert until == since
+    assert len(rows) == indicators.WARMUP_PERIODS
+    assert all(x.close_time < since for x in rows)
+    assert rows[-1].close_time == since - datetime.timedelta(days=1)
+
+    # 指標は全件を取り込んだ場合と一致する
+    for a, b in zip(actual, expected):
+        assert a.close_time == b.close_time
+        for name in INDICATOR_COLUMNS:
+            assert float(getattr(a, name)) == pytest.approx(float(getattr(b, name))), (
+                a.close_time,
+                name,
+            )
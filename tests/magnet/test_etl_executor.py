@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from magnet.commons import BulkResult
+from magnet.etl import executor
+
+
+class FakeSession:
+    def __init__(self, log):
+        self.log = log
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+
+def create_get_db(log):
+    def get_db():
+        yield FakeSession(log)
+
+    return get_db
+
+
+class Job:
+    def __init__(self, name, events, fail=False):
+        self.name = name
+        self.events = events
+        self.fail = fail
+
+    @property
+    def description(self):
+        return self.name
+
+    async def __call__(self, db):
+        self.events.append(("start", self.name))
+        await asyncio.sleep(0.01)
+        self.events.append(("end", self.name))
+        if self.fail:
+            raise Exception(f"{self.name} failed")
+        return BulkResult(inserted=1)
+
+
+class DependentJob(Job):
+    pass
+
+
+@pytest.fixture
+def dependencies():
+    yield executor.job_dependencies
+    executor.job_dependencies.clear()
+
+
+def test_run_jobs_concurrency(dependencies):
+    events = []
+    log = []
+    jobs = [Job(str(i), events) for i in range(4)]
+    results = asyncio.run(executor.run_jobs(jobs, 2, get_db=create_get_db(log)))
+
+    assert [x.description for x in results] == ["0", "1", "2", "3"]
+    assert all(x.inserted == 1 for x in results)
+    assert log == ["commit"] * 4
+    assert events[:3] == [("start", "0"), ("start", "1"), ("end", "0")]
+    assert results[3].queue_time > results[0].queue_time
+    assert all(x.wall_time > 0 for x in results)
+
+
+def test_run_jobs_dependencies(dependencies):
+    events = []
+    log = []
+    jobs = []
+    bot = executor.register(jobs, DependentJob("bot", events), depends=[Job])
+    executor.register(jobs, Job("a", events), depends=())
+    executor.register(jobs, Job("b", events), depends=())
+    asyncio.run(executor.run_jobs(jobs, 4, get_db=create_get_db(log)))
+
+    assert events.index(("start", "bot")) > events.index(("end", "a"))
+    assert events.index(("start", "bot")) > events.index(("end", "b"))
+    assert jobs[0] is bot
+
+
+def test_run_jobs_skip_when_dependency_failed(dependencies):
+    events = []
+    log = []
+    jobs = []
+    failed = executor.register(jobs, Job("a", events, fail=True), depends=())
+    executor.register(jobs, DependentJob("bot", events), depends=[failed])
+    a, bot = asyncio.run(executor.run_jobs(jobs, 4, get_db=create_get_db(log)))
+
+    assert a.error_summary == "a failed"
+    assert a.errors
+    assert bot.error_summary
+    assert ("start", "bot") not in events
+    assert log == ["rollback"]
+
+
+def test_run_jobs_circular_dependency(dependencies):
+    events = []
+    jobs = []
+    a = Job("a", events)
+    b = Job("b", events)
+    executor.register(jobs, a, depends=[b])
+    executor.register(jobs, b, depends=[a])
+
+    with pytest.raises(ValueError, match="Circular"):
+        asyncio.run(executor.run_jobs(jobs))
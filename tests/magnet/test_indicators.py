@@ -0,0 +1,63 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+
+from magnet.domain.datastore import indicators
+from magnet.domain.datastore.schemas import Ohlc
+
+
+def create_ohlc_arr(prices):
+    start = datetime.date(2021, 1, 1)
+    arr = []
+    for index, (open_price, close_price) in enumerate(prices):
+        arr.append(
+            Ohlc(
+                provider="cryptowatch",
+                market="bitflyer",
+                product="btcjpy",
+                periods=60 * 60 * 24,
+                open_time=start + datetime.timedelta(days=index),
+                close_time=start + datetime.timedelta(days=index + 1),
+                open_price=open_price,
+                high_price=max(open_price, close_price),
+                low_price=min(open_price, close_price),
+                close_price=close_price,
+                volume=1,
+                quote_volume=1,
+            )
+        )
+    return arr
+
+
+@pytest.mark.parametrize("size", [1, 2, 30, 250])
+def test_compute_indicators_same_as_legacy(size):
+    """一括計算の結果が、従来の行毎の計算結果と同一であること"""
+    prices = [(100 + (i * 7) % 13, 100 + (i * 11) % 17 + 0.5) for i in range(size)]
+
+    legacy = create_ohlc_arr(prices)
+    legacy = Ohlc.compute_sma_and_cross(legacy)
+    legacy = Ohlc.compute_wb_cs(legacy)
+    legacy = Ohlc.compute_rsi(legacy)
+
+    vectorized = Ohlc.compute_indicators(create_ohlc_arr(prices))
+
+    assert [x.dict() for x in legacy] == [x.dict() for x in vectorized]
+
+
+def test_compute_indicators_cross_deduplicated():
+    """同じクロス状態が続く場合は、最初の１件のみがクロスとして検出されること"""
+    prices = [(1, 1)] * 5 + [(1, 10)] * 5 + [(10, 1)] * 30
+    arr = Ohlc.compute_indicators(create_ohlc_arr(prices))
+    crosses = [x.t_cross for x in arr]
+
+    assert crosses.count(1) == 1
+    assert crosses.count(-1) == 1
+    assert crosses.index(1) < crosses.index(-1)
+
+
+def test_to_decimal():
+    """pydanticと同じくDecimal(str(v))として解釈し、四捨五入すること"""
+    point = Decimal("0.01")
+    assert indicators.to_decimal([1.005, 0.0], point) == [Decimal("1.01"), Decimal("0")]
+    assert indicators.to_decimal([0.57]) == [Decimal("0.57")]
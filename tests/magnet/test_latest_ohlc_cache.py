@@ -0,0 +1,74 @@
+import asyncio
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import sqlalchemy as sa
+
+from magnet.domain.datastore.caches import (
+    LatestOhlcCache,
+    latest_ohlc_cache,
+    partition_key,
+)
+from magnet.domain.datastore.models import CryptoOhlc
+from magnet.domain.datastore.schemas import Ohlc
+from magnet.domain.trade.topics import YesterdayOhlcProvider
+
+PARTITION = dict(
+    provider="cryptowatch", market="bitflyer", product="btcjpy", periods=86400
+)
+
+
+def create_ohlc(day: int, close_price: float = 100) -> Ohlc:
+    return Ohlc(
+        **PARTITION,
+        open_time=date(2021, 1, day),
+        close_time=date(2021, 1, day + 1),
+        open_price=100,
+        high_price=100,
+        low_price=100,
+        close_price=close_price,
+        volume=1,
+        quote_volume=1,
+    )
+
+
+def test_latest_ohlc_cache_put():
+    cache = LatestOhlcCache(size=3)
+    key = partition_key(**PARTITION)
+    cache.put(key, [create_ohlc(day) for day in range(1, 6)])
+    assert sorted(cache.partitions[key]) == [date(2021, 1, x) for x in (3, 4, 5)]
+    assert cache.get(key, date(2021, 1, 2)) is None
+
+    # 洗い替えられた範囲のローソク足は破棄して置き換える
+    cache.put(key, [create_ohlc(4, close_price=200)], since=date(2021, 1, 5))
+    assert sorted(cache.partitions[key]) == [date(2021, 1, 3), date(2021, 1, 4)]
+    assert cache.get(key, date(2021, 1, 4)).close_price == 200
+    assert cache.stats() == dict(hits=1, misses=1, size=1)
+
+
+def test_latest_ohlc_cache_put_on_commit(create_session):
+    cache = LatestOhlcCache()
+    key = partition_key(**PARTITION)
+    db = create_session(CryptoOhlc)
+
+    db.execute(sa.select(CryptoOhlc.id))
+    cache.put_on_commit(db, key, [create_ohlc(1)])
+    db.rollback()
+    db.commit()
+    assert cache.partitions == {}
+
+    cache.put_on_commit(db, key, [create_ohlc(1)])
+    assert cache.partitions == {}
+    db.commit()
+    assert cache.get(key, date(2021, 1, 1)) == create_ohlc(1)
+
+
+def test_yesterday_ohlc_provider_from_cache():
+    latest_ohlc_cache.invalidate()
+    latest_ohlc_cache.put(partition_key(**PARTITION), [create_ohlc(1)])
+    provider = YesterdayOhlcProvider(profile=SimpleNamespace(**PARTITION), broker=None)
+
+    # キャッシュに存在する場合は、データストアに問い合わせない
+    current_dt = datetime(2021, 1, 2, 9, tzinfo=timezone.utc)
+    assert asyncio.run(provider.get_topic(current_dt)) == create_ohlc(1)
+    latest_ohlc_cache.invalidate()
@@ -0,0 +1,44 @@
+import asyncio
+
+from magnet.domain.trade.caches import MarketDataCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_market_cache_ttl():
+    clock = Clock()
+    cache = MarketDataCache(ttl=1, stale_ttl=5, clock=clock)
+    calls = []
+
+    async def fetch():
+        calls.append(clock.now)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        # 同時に取得した場合は、１回の取得を共有する
+        values = await asyncio.gather(*[cache.get("ticker", fetch) for _ in range(3)])
+        assert values == [1, 1, 1]
+        assert await cache.get("ticker", fetch) == 1
+
+        # ttl切れ（stale）の場合は古い値を返し、バックグラウンドで再取得する
+        clock.now = 2
+        assert await cache.get("ticker", fetch) == 1
+        await asyncio.sleep(0.05)
+        assert await cache.get("ticker", fetch) == 2
+
+        # stale_ttlも過ぎた場合は、再取得を待つ
+        clock.now = 100
+        assert await cache.get("ticker", fetch) == 3
+
+    asyncio.run(main())
+    assert len(calls) == 3
+    assert cache.stats() == dict(
+        hits=2, stale_hits=1, coalesced=2, misses=2, hit_rate=5 / 7, size=1
+    )
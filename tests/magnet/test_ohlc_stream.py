@@ -0,0 +1,68 @@
+from datetime import date
+
+import pandas as pd
+
+from framework import DateTimeAware
+from magnet.domain.datastore.models import CryptoOhlc
+
+PARTITION = dict(
+    provider="cryptowatch", market="bitflyer", product="btcjpy", periods=86400
+)
+
+
+def create_ohlcs(db, days: int):
+    for day in range(1, days + 1):
+        CryptoOhlc(
+            **PARTITION,
+            open_time=date(2021, 1, day),
+            close_time=date(2021, 1, day + 1),
+            open_price=day,
+            high_price=day,
+            low_price=day,
+            close_price=day,
+            volume=1,
+            quote_volume=1,
+        ).create(db)
+    db.commit()
+    db.expunge_all()
+
+
+def test_stream_close_date_range(create_session):
+    db = create_session(CryptoOhlc)
+    create_ohlcs(db, 10)
+
+    batches = list(
+        CryptoOhlc.Q_stream_close_date_range_batches(
+            db,
+            **PARTITION,
+            until=date(2021, 1, 10),
+            order_by="desc",
+            columns=["close_time", "close_price"],
+            batch_size=4,
+        )
+    )
+    assert [len(x) for x in batches] == [4, 4, 1]
+    assert batches[0][0] == (date(2021, 1, 10), 9)
+
+    # ORMのエンティティを経由しない
+    rows = list(CryptoOhlc.Q_stream_close_date_range(db, **PARTITION))
+    assert len(rows) == 10
+    assert len(db.identity_map) == 0
+
+    frames = list(
+        CryptoOhlc.Q_stream_close_date_range_frames(db, **PARTITION, batch_size=3)
+    )
+    frame = pd.concat(frames, ignore_index=True)
+    assert [len(x) for x in frames] == [3, 3, 3, 1]
+    assert frame["close_price"].tolist() == list(range(1, 11))
+    assert "id" not in frame.columns
+
+
+def test_select_start_time(create_session):
+    db = create_session(CryptoOhlc)
+    create_ohlcs(db, 5)
+
+    result = CryptoOhlc.Q_select_start_time(
+        db, **PARTITION, until=date(2021, 1, 4), batch_size=2
+    )
+    assert list(result) == [DateTimeAware(2021, 1, x) for x in (1, 2, 3)]
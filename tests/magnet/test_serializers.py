@@ -0,0 +1,59 @@
+import datetime
+import json
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from framework import DateTimeAware
+from magnet.domain.datastore.schemas import Ohlc
+from magnet.domain.scaffold.models import Dummy
+from magnet.utils.serializers import FastJSONResponse, dumps
+
+
+def test_entity_dict(create_session):
+    db = create_session(Dummy)
+    obj = Dummy(name="a", date_naive=datetime.datetime(2021, 1, 1)).create(db)
+    db.commit()
+
+    # コミット後に失効した列も読み込む
+    assert obj.dict(excludes={"date_aware"}) == dict(
+        id=obj.id, name="a", date_naive=datetime.datetime(2021, 1, 1)
+    )
+
+
+def test_dumps_same_as_jsonable_encoder(create_session):
+    db = create_session(Dummy)
+    rows = [
+        Dummy(
+            name=f"name{i}",
+            date_naive=datetime.datetime(2021, 1, 1, microsecond=i),
+            date_aware=DateTimeAware(2021, 1, 1, i),
+        ).create(db)
+        for i in range(3)
+    ]
+    content = dict(
+        rows=rows,
+        ohlc=Ohlc(
+            provider="cryptowatch",
+            market="bitflyer",
+            product="btcjpy",
+            periods=86400,
+            open_time=datetime.date(2021, 1, 1),
+            close_time=datetime.date(2021, 1, 2),
+            open_price=1,
+            high_price=1,
+            low_price=1,
+            close_price=1,
+            volume=1,
+            quote_volume=1,
+            t_rsi_14=Decimal("12.5"),
+        ),
+        values={1: Decimal("0.1"), "delta": datetime.timedelta(hours=1)},
+    )
+
+    expected = json.loads(json.dumps(jsonable_encoder(content)))
+    assert json.loads(dumps(content)) == expected
+
+    response = FastJSONResponse(rows)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == jsonable_encoder(rows)
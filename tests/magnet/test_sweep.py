@@ -0,0 +1,84 @@
+import csv
+import datetime
+
+import pandas as pd
+import pytest
+
+from magnet.domain.trade import sweep
+
+
+def create_frame():
+    start = datetime.date(2020, 1, 1)
+    closes = [100.0, 110.0, 120.0, 90.0, 95.0, 130.0]
+    return pd.DataFrame(
+        dict(
+            close_time=[start + datetime.timedelta(days=i) for i in range(6)],
+            open_price=[100.0] + closes[:-1],
+            high_price=closes,
+            low_price=closes,
+            close_price=closes,
+            t_cross=[1, 0, -1, 0, 1, 0],
+        )
+    )
+
+
+def test_expand_grid():
+    grid = dict(margin=[1, 2], ask_limit_rate=[1.1, 1.2])
+    assert list(sweep.expand_grid(grid)) == [
+        dict(margin=1, ask_limit_rate=1.1),
+        dict(margin=1, ask_limit_rate=1.2),
+        dict(margin=2, ask_limit_rate=1.1),
+        dict(margin=2, ask_limit_rate=1.2),
+    ]
+
+    with pytest.raises(ValueError):
+        list(sweep.expand_grid(dict(name=["a"])))
+
+
+def test_shared_frame():
+    frame = create_frame()
+    with sweep.SharedFrame(frame) as shared:
+        shm, attached = sweep.attach_frame(shared.spec)
+        try:
+            assert list(attached.columns) == list(frame.columns)
+            assert attached["close_price"].tolist() == frame["close_price"].tolist()
+            assert attached["close_time"][0] == pd.Timestamp(2020, 1, 1)
+        finally:
+            del attached
+            shm.close()
+
+
+def test_shared_frame_intraday():
+    frame = create_frame()
+    frame["close_time"] = pd.date_range("2020-01-01 09:00:00.5", periods=6, freq="H")
+    with sweep.SharedFrame(frame) as shared:
+        shm, attached = sweep.attach_frame(shared.spec)
+        try:
+            # 日足未満の足も時刻を丸めずに参照できる
+            assert attached["close_time"].tolist() == frame["close_time"].tolist()
+        finally:
+            del attached
+            shm.close()
+
+
+def test_run_sweep(tmp_path):
+    base = dict(
+        ask_limit_rate=None,
+        ask_stop_rate=None,
+        bid_limit_rate=None,
+        bid_stop_rate=None,
+    )
+    grid = dict(analyzers=[["t_cross"], ["-t_cross"]], margin=[1000, 2000])
+    output = tmp_path / "sweep.csv"
+
+    ranked = sweep.run_sweep(create_frame(), base, grid, output=output, max_workers=2)
+
+    assert [x["rank"] for x in ranked] == [1, 2, 3, 4]
+    assert ranked[0]["analyzers"] == ["t_cross"]
+    assert ranked[0]["margin"] == 2000
+    assert ranked[0]["fact_profit"] >= ranked[-1]["fact_profit"]
+
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 4
+    assert {x["analyzers"] for x in rows} == {"t_cross", "-t_cross"}
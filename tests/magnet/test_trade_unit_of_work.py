@@ -0,0 +1,143 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from magnet.domain.trade import topics  # noqa: F401 トピックを登録する
+from magnet.domain.trade.abc import BrokerImpl
+from magnet.domain.trade.bot import Bot
+from magnet.domain.trade.models import TradeBot
+from magnet.domain.trade.repository import BrokerRepository
+from magnet.domain.trade.schemas import (
+    BuyAndSellSignal,
+    DealMessage,
+    OrderResult,
+    TradeResult,
+)
+
+
+class RecordingSession:
+    """実行した文を記録する。"""
+
+    def __init__(self):
+        self.statements = []
+        self.objects = []
+
+    def add_all(self, objects):
+        self.objects.extend(objects)
+        self.statements.extend(f"INSERT {x.__tablename__}" for x in objects)
+
+    async def execute(self, stmt):
+        self.statements.append(str(stmt).split()[0])
+
+    async def commit(self):
+        self.statements.append("COMMIT")
+
+    async def rollback(self):
+        self.statements.append("ROLLBACK")
+
+    async def close(self):
+        pass
+
+
+@BrokerRepository.register
+class FakeUnitOfWorkBroker(BrokerImpl):
+    _name = "fake_unit_of_work"
+
+    def __init__(self):
+        self.orders = []
+        self.fail_order = False
+
+    async def order(self, order):
+        if self.fail_order:
+            raise ConnectionError("failed")
+        self.orders.append(order)
+        return {"id": f"order{len(self.orders)}", "side": order.side}
+
+    async def order_cancel(self, status_data):
+        return {"id": status_data["id"], "canceled": True}
+
+    async def fetch_order_status(self, accepted_data):
+        return accepted_data
+
+    def is_completed(self, status_data) -> bool:
+        return True
+
+    async def finalize(self, status_data) -> TradeResult:
+        result = OrderResult(
+            average_price=Decimal("100"),
+            executed_size=Decimal("1"),
+            total_commission=Decimal("0"),
+        )
+        if status_data["side"] == 1:
+            return TradeResult(product_code_localized="BTC_JPY", buy=result)
+        return TradeResult(product_code_localized="BTC_JPY", sell=result)
+
+
+def create_bot(session):
+    profile = SimpleNamespace(
+        version=3,
+        analyzers=[],
+        market="fake_unit_of_work",
+        product="btcjpy",
+        margin=Decimal("1000"),
+        ask_limit_rate=None,
+        ask_stop_rate=None,
+        bid_limit_rate=None,
+        bid_stop_rate=None,
+    )
+    state = TradeBot(
+        id=1,
+        profile_id=1,
+        is_active=True,
+        is_stop_reverse=False,
+        product_code="btcjpy",
+        entry_at=datetime(2021, 1, 1, tzinfo=timezone.utc),
+        entry_order={"product_code": "btcjpy", "side": 1},
+        entry_order_accepted={"id": "entry", "side": 1},
+    )
+    return Bot(profile, state, session_maker=lambda: session)
+
+
+def test_trade_cycle_statements():
+    session = RecordingSession()
+    bot = create_bot(session)
+    decision = DealMessage(
+        buy_and_sell=BuyAndSellSignal.SELL, target_price=Decimal("100")
+    )
+
+    asyncio.run(bot.trade(datetime.now(timezone.utc), decision))
+
+    # キャンセル・反対売買・新規注文の受理直後にのみコミットする
+    assert Counter(session.statements) == {
+        "UPDATE": 3,
+        "INSERT trade_logs": 1,
+        "INSERT trade_orders": 1,
+        "COMMIT": 3,
+    }
+    assert len(bot.broker.orders) == 2
+    assert bot.state.is_empty
+
+    # BOTを構築したプロファイルのバージョンを記録する
+    (log,) = [x for x in session.objects if x.__tablename__ == "trade_logs"]
+    assert log.profile_version == 3
+
+
+def test_trade_cycle_rollback_uncommitted():
+    session = RecordingSession()
+    bot = create_bot(session)
+    bot.broker.fail_order = True
+    decision = DealMessage(
+        buy_and_sell=BuyAndSellSignal.CLOSE, target_price=Decimal("100")
+    )
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(bot.trade(datetime.now(timezone.utc), decision))
+
+    # 反対売買に失敗した場合は、キャンセルの結果のみ書き込まれている
+    assert session.statements == ["UPDATE", "COMMIT", "ROLLBACK"]
+    assert bot.state.entry_cancel_order_accepted == {"id": "entry", "canceled": True}
+    assert bot.state.entry_order_finalized is None
@@ -0,0 +1,82 @@
+import asyncio
+import gc
+import weakref
+
+import httpx
+import pytest
+
+from trade_api import clients
+
+
+def test_get_origin():
+    assert clients.get_origin("https://API.bitflyer.com/v1/ticker?a=1") == (
+        "https://api.bitflyer.com"
+    )
+    assert clients.get_origin("http://127.0.0.1:8000/") == "http://127.0.0.1:8000"
+
+    with pytest.raises(ValueError):
+        clients.get_origin("/v1/ticker")
+
+
+def test_registry_share_client_per_host():
+    registry = clients.ClientRegistry()
+
+    async def main():
+        a = registry.get("https://api.bitflyer.com/v1/ticker")
+        b = registry.get("https://api.bitflyer.com/v1/board")
+        c = registry.get("https://api.zaif.jp/api/1/ticker/btc_jpy")
+        assert a is b
+        assert a is not c
+
+        await registry.aclose()
+        assert a.is_closed and c.is_closed
+        assert registry.get("https://api.bitflyer.com/v1/ticker") is not a
+        await registry.aclose()
+
+    asyncio.run(main())
+
+
+def test_registry_client_per_event_loop():
+    registry = clients.ClientRegistry()
+
+    async def get():
+        return registry.get("https://api.cryptowat.ch/markets")
+
+    a = asyncio.run(get())
+    b = asyncio.run(get())
+    assert a is not b
+    assert len(registry.clients) == 1
+
+
+def test_registry_discard_closed_loop():
+    registry = clients.ClientRegistry()
+    loop = asyncio.new_event_loop()
+
+    async def get():
+        return registry.get("https://api.cryptowat.ch/markets")
+
+    loop.run_until_complete(get())
+    loop.close()
+    dead_loop = weakref.ref(loop)
+    del loop
+
+    # 別のループから取得した時点で、終了したループとそのクライアントを破棄する
+    asyncio.run(get())
+    gc.collect()
+    assert dead_loop() is None
+    assert len(registry.clients) == 1
+
+
+def test_registry_configure():
+    registry = clients.ClientRegistry(http2=False)
+    timeout = httpx.Timeout(1.0)
+    registry.configure("https://api.zaif.jp", timeout=timeout)
+
+    async def main():
+        zaif = registry.get("https://api.zaif.jp/tapi")
+        bitflyer = registry.get("https://api.bitflyer.com/v1/ticker")
+        assert zaif.timeout == timeout
+        assert bitflyer.timeout == clients.DEFAULT_TIMEOUT
+        await registry.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+import pytest
+
+from trade_api import clients, ratelimit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket():
+    clock = Clock()
+    bucket = ratelimit.TokenBucket(rate=2, capacity=2, clock=clock)
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock.now = 0.5
+    assert bucket.try_acquire() == 0
+
+    clock.now = 10
+    assert bucket.try_acquire(5) == 0  # 容量を超えるコストは容量に切り詰める
+    assert bucket.tokens == 0
+
+
+def test_token_bucket_observe():
+    clock = Clock()
+    bucket = ratelimit.TokenBucket(rate=1, capacity=10, clock=clock)
+
+    bucket.observe(remaining=3)
+    assert bucket.tokens == 3
+
+    bucket.observe(remaining=0, reset_after=30)
+    assert bucket.try_acquire() == 30
+
+    clock.now = 30
+    assert bucket.try_acquire() == pytest.approx(1)
+    clock.now = 31
+    assert bucket.try_acquire() == 0
+
+
+def test_observe_response():
+    limiter = ratelimit.RateLimiter()
+    bucket = limiter.get("bitflyer", "public")
+
+    response = httpx.Response(200, headers={"X-RateLimit-Remaining": "1"})
+    limiter.observe_response(bucket, response)
+    assert bucket.tokens <= 1
+
+    response = httpx.Response(429, headers={"Retry-After": "5"})
+    limiter.observe_response(bucket, response)
+    assert bucket.try_acquire() == pytest.approx(5, abs=0.1)
+
+
+def test_coalescer():
+    coalescer = ratelimit.Coalescer()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        results = await asyncio.gather(
+            *[coalescer.run("ticker", fetch) for _ in range(5)]
+        )
+        assert results == [1] * 5
+        assert await coalescer.run("ticker", fetch) == 2
+
+    asyncio.run(main())
+    assert len(calls) == 2
+    assert coalescer.coalesced == 4
+    assert not coalescer.inflight
+
+
+def test_request_coalesce_get():
+    received = []
+
+    async def handle(reader, writer):
+        while await reader.readuntil(b"\r\n\r\n"):
+            received.append(1)
+            await asyncio.sleep(0.05)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n"
+                b"X-RateLimit-Remaining: 100\r\n\r\n{}"
+            )
+            await writer.drain()
+
+    async def main():
+        server = await asyncio.start_server(handle, host="127.0.0.1", port=0)
+        host, port = server.sockets[0].getsockname()[:2]
+        url = f"http://{host}:{port}/v1/ticker"
+        try:
+            responses = await asyncio.gather(
+                *[
+                    ratelimit.request(
+                        "bitflyer", "public", "GET", url, params={"a": "1"}
+                    )
+                    for _ in range(3)
+                ],
+                ratelimit.request("bitflyer", "public", "GET", url, params={"a": "2"}),
+            )
+        finally:
+            await clients.shutdown()
+            server.close()
+            await server.wait_closed()
+
+        assert [x.status_code for x in responses] == [200] * 4
+        assert responses[0] is responses[1] is responses[2]
+        assert responses[0] is not responses[3]
+
+    asyncio.run(main())
+    assert len(received) == 2
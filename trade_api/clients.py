@@ -0,0 +1,105 @@
+"""
+取引所のホスト毎にhttpx.AsyncClientを１つだけ生成し、プロセス全体で共有する。
+クライアントはコネクションプールを持ち、keep-aliveされた接続を再利用するため、リクエスト毎のTCP・TLSハンドシェイクが不要になる。
+h2がインストールされている場合はHTTP/2を有効にする。
+クライアントは利用するイベントループ毎に生成し、終了時にはshutdownでクローズすること。
+クローズされずに終了したループのクライアントは、別のループから取得した時点で破棄する。
+"""
+import asyncio
+import importlib.util
+from typing import Dict, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+
+def get_origin(url: Union[str, httpx.URL]) -> str:
+    """URLからスキーム・ホスト・ポートを取り出す。クライアントはこの単位で共有される。"""
+    parts = urlsplit(str(url))
+    if not parts.scheme or not parts.netloc:
+        raise ValueError(f"Absolute url is required: {url}")
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class ClientRegistry:
+    """ホスト毎のhttpx.AsyncClientを管理する。"""
+
+    def __init__(
+        self,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        http2: bool = HTTP2_AVAILABLE,
+    ):
+        self.limits = limits
+        self.timeout = timeout
+        self.http2 = http2
+        self.options: Dict[str, dict] = {}
+        self.clients: Dict[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]] = {}
+
+    def configure(
+        self,
+        url: str,
+        *,
+        limits: httpx.Limits = None,
+        timeout: httpx.Timeout = None,
+        http2: bool = None,
+    ):
+        """ホスト毎にプールの上限とタイムアウトを設定する。生成済みのクライアントには反映されない。"""
+        options = self.options.setdefault(get_origin(url), {})
+        if limits is not None:
+            options["limits"] = limits
+        if timeout is not None:
+            options["timeout"] = timeout
+        if http2 is not None:
+            options["http2"] = http2
+
+    def create_client(self, origin: str) -> httpx.AsyncClient:
+        options = dict(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        options.update(self.options.get(origin, {}))
+        return httpx.AsyncClient(**options)
+
+    def get(self, url: Union[str, httpx.URL]) -> httpx.AsyncClient:
+        """URLのホストに対応するクライアントを返す。存在しない場合は生成する。"""
+        # コネクションはイベントループに紐づくため、ループ毎にクライアントを生成する
+        loop = asyncio.get_running_loop()
+        clients = self.clients.get(loop)
+        if clients is None:
+            self.discard_closed_loops()
+            clients = self.clients[loop] = {}
+
+        origin = get_origin(url)
+        client = clients.get(origin)
+        if client is None or client.is_closed:
+            client = clients[origin] = self.create_client(origin)
+        return client
+
+    def discard_closed_loops(self):
+        """終了したイベントループのクライアントを破棄し、ループへの参照を解放する。"""
+        for loop in [x for x in self.clients if x.is_closed()]:
+            del self.clients[loop]
+
+    async def aclose(self):
+        """現在のイベントループで生成したクライアントをクローズする。他のループのクライアントは破棄する。"""
+        clients, self.clients = self.clients, {}
+        for client in clients.get(asyncio.get_running_loop(), {}).values():
+            await client.aclose()
+
+
+registry = ClientRegistry()
+
+
+def get_client(url: Union[str, httpx.URL]) -> httpx.AsyncClient:
+    return registry.get(url)
+
+
+def configure(url: str, **kwargs):
+    registry.configure(url, **kwargs)
+
+
+async def shutdown():
+    await registry.aclose()
@@ -13,7 +13,7 @@ from pydantic import BaseModel, parse_obj_as
 from framework import DateTimeAware
 from libs import decorators
 
-from .. import enums
+from .. import enums, ratelimit
 from ..utils import create_params
 
 
@@ -92,15 +92,21 @@ class BitflyerPublicAPI:
         url = "https://api.bitflyer.com" + path
         headers = {"Content-Type": "application/json"}
 
-        async with httpx.AsyncClient() as client:
-            if method == "GET":
-                response = await client.get(url, headers=headers, params=body)
-            elif method == "POST":
-                response = await client.post(
-                    url, headers=headers, data=json.dumps(body)
-                )
-            else:
-                raise Exception(f"Unkwon http method: {method}")
+        if method == "GET":
+            response = await ratelimit.request(
+                self.name.value, "public", method, url, headers=headers, params=body
+            )
+        elif method == "POST":
+            response = await ratelimit.request(
+                self.name.value,
+                "public",
+                method,
+                url,
+                headers=headers,
+                data=json.dumps(body),
+            )
+        else:
+            raise Exception(f"Unkwon http method: {method}")
 
         try:
             response.raise_for_status()
@@ -133,14 +139,24 @@ class BitflyerPublicAPI:
             "Content-Type": "application/json",
         }
 
-        async with httpx.AsyncClient() as client:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                data = json.dumps(body)
-                response = await client.post(url, headers=headers, data=data)
-            else:
-                raise Exception(f"Unkwon http method: {method}")
+        # 認証の要否に関わらず署名して送信されるため、流量制御の区分はパスで判断する
+        endpoint = "private" if path.startswith("/v1/me/") else "public"
+        if method == "GET":
+            response = await ratelimit.request(
+                self.name.value,
+                endpoint,
+                method,
+                url,
+                credential=self.api_key,
+                headers=headers,
+            )
+        elif method == "POST":
+            data = json.dumps(body)
+            response = await ratelimit.request(
+                self.name.value, endpoint, method, url, headers=headers, data=data
+            )
+        else:
+            raise Exception(f"Unkwon http method: {method}")
 
         try:
             # 200番台でなければ例外を発生させる
@@ -5,6 +5,8 @@ from typing import Dict, List, Mapping, Tuple
 import httpx
 from pydantic import BaseModel, parse_obj_as
 
+from .. import ratelimit
+
 
 class Allowance(BaseModel):
     cost: float
@@ -44,26 +46,35 @@ class Ohlc(BaseModel):
 class CryptowatchAPI:
     last_allowance: Allowance = Allowance(cost=0, remaining=1000000, upgrade="")
 
+    def update_allowance(self, dic: dict):
+        """残りのクレジットから、あと何回リクエストできるかを見積もり、流量制御に反映する。"""
+        if "allowance" not in dic:
+            return
+        self.last_allowance = allowance = Allowance(**dic["allowance"])
+        if allowance.cost > 0:
+            ratelimit.limiter.get("cryptowatch", "public").observe(
+                remaining=allowance.remaining // allowance.cost
+            )
+
     async def get_markets(self):
         url = "https://api.cryptowat.ch/markets"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+        response = await ratelimit.request("cryptowatch", "public", "GET", url)
 
-            try:
-                response.raise_for_status()
-            except httpx._exceptions.HTTPError as err:
-                raise err
+        try:
+            response.raise_for_status()
+        except httpx._exceptions.HTTPError as err:
+            raise err
 
-            dic = json.loads(response.text)
-            result = parse_obj_as(List[Market], dic["result"])
-            return result
+        dic = json.loads(response.text)
+        self.update_allowance(dic)
+        result = parse_obj_as(List[Market], dic["result"])
+        return result
 
     async def get_pairs(self) -> List[Pairs]:
         url = "https://api.cryptowat.ch/pairs"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+        response = await ratelimit.request("cryptowatch", "public", "GET", url)
 
         try:
             response.raise_for_status()
@@ -71,6 +82,7 @@ class CryptowatchAPI:
             raise err
 
         dic = json.loads(response.text)
+        self.update_allowance(dic)
         result = parse_obj_as(List[Pairs], dic["result"])
         return result
 
@@ -84,8 +96,7 @@ class CryptowatchAPI:
         after_ = int(after.timestamp())
         url = f"https://api.cryptowat.ch/markets/{market}/{product}/ohlc?periods={periods}&after={after_}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+        response = await ratelimit.request("cryptowatch", "public", "GET", url)
 
         try:
             response.raise_for_status()
@@ -93,7 +104,7 @@ class CryptowatchAPI:
             raise err
 
         result = json.loads(response.text)
-        self.last_allowance = Allowance(**result["allowance"])
+        self.update_allowance(result)
         arr = result["result"][str(periods)]
 
         return list(
@@ -4,12 +4,11 @@ import hmac
 from typing import Literal, Optional
 from urllib.parse import urlencode
 
-import httpx
 from pydantic import BaseModel
 
 from libs import decorators
 
-from .. import enums
+from .. import enums, ratelimit
 
 
 def remove_none_value_from_dic(**kwargs):
@@ -95,8 +94,9 @@ class ZaifPublicAPI:
         # if response.status_code != 200:
         #     raise Exception("return status is {}".format(response.status_code))
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, data=encoded_params)
+        response = await ratelimit.request(
+            self.name.value, "public", "POST", url, headers=headers, data=encoded_params
+        )
 
         return response
 
@@ -114,8 +114,14 @@ class ZaifPublicAPI:
         # if response.status_code != 200:
         #     raise Exception("return status is {}".format(response.status_code))
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, data=encoded_params)
+        response = await ratelimit.request(
+            self.name.value,
+            "private",
+            "POST",
+            url,
+            headers=headers,
+            data=encoded_params,
+        )
 
         return response
 
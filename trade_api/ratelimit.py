@@ -0,0 +1,192 @@
+"""
+取引所毎・エンドポイント種別（public/private）毎のトークンバケットでリクエストを流量制御する。
+レスポンスのヘッダ（X-RateLimit-Remaining等）やボディ（cryptowatchのallowance）から残りの許容量を読み取り、バケットに反映する。
+また、同一のGETリクエストが処理中の場合は上流へのリクエストを１つにまとめ、その結果を全ての呼び出し元で共有する。
+"""
+import asyncio
+import email.utils
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import httpx
+
+from .clients import get_client
+
+# 429を受け取り、Retry-Afterが指定されていない場合の待機秒数
+DEFAULT_RETRY_AFTER = 10.0
+
+# (取引所, エンドポイント種別) -> (１秒当たりの補充量, バケットの容量)
+DEFAULT_LIMITS: Dict[Tuple[str, str], Tuple[float, float]] = {
+    # 同一IPから5分間に500回
+    ("bitflyer", "public"): (500 / 300, 20),
+    # 同一APIキーから5分間に500回
+    ("bitflyer", "private"): (500 / 300, 20),
+    ("zaif", "public"): (1, 10),
+    ("zaif", "private"): (1, 10),
+    # 実際の上限はクレジット制のため、allowanceで補正する
+    ("cryptowatch", "public"): (5, 10),
+}
+FALLBACK_LIMIT = (1, 10)
+
+
+class TokenBucket:
+    """
+    rate（個/秒）で補充され、capacity個まで貯まるトークンバケット。
+    asyncioのシングルスレッド上で利用する前提のため、ロックは持たない。
+    """
+
+    def __init__(
+        self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic
+    ):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be greater than 0.")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+        self.blocked_until = 0.0
+
+    def refill(self) -> float:
+        now = self.clock()
+        elapsed = max(now - max(self.updated_at, self.blocked_until), 0)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = max(now, self.updated_at)
+        return now
+
+    def try_acquire(self, cost: float = 1) -> float:
+        """トークンを取得できた場合は0を、できない場合は取得できるまでの待機秒数を返す。"""
+        cost = min(cost, self.capacity)
+        now = self.refill()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate
+
+    async def acquire(self, cost: float = 1):
+        while (delay := self.try_acquire(cost)) > 0:
+            await asyncio.sleep(delay)
+
+    def observe(self, remaining: float = None, reset_after: float = None):
+        """
+        取引所が通知した残りの許容量をバケットに反映する。
+        許容量を使い切っている場合は、reset_after秒の間トークンを払い出さない。
+        """
+        now = self.refill()
+        if remaining is None:
+            return
+        self.tokens = max(min(self.tokens, remaining), 0)
+        if remaining <= 0 and reset_after is not None:
+            self.blocked_until = max(self.blocked_until, now + reset_after)
+
+
+class RateLimiter:
+    """(取引所, エンドポイント種別)毎のトークンバケットを管理する。"""
+
+    def __init__(self, limits: Dict[Tuple[str, str], Tuple[float, float]] = None):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def configure(self, exchange: str, endpoint: str, rate: float, capacity: float):
+        self.limits[(exchange, endpoint)] = (rate, capacity)
+        self.buckets.pop((exchange, endpoint), None)
+
+    def get(self, exchange: str, endpoint: str) -> TokenBucket:
+        key = (exchange, endpoint)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            rate, capacity = self.limits.get(key, FALLBACK_LIMIT)
+            bucket = self.buckets[key] = TokenBucket(rate, capacity)
+        return bucket
+
+    def observe_response(self, bucket: TokenBucket, response: httpx.Response):
+        """レスポンスヘッダから残りの許容量を読み取る。"""
+        headers = response.headers
+        if response.status_code == 429:
+            bucket.observe(remaining=0, reset_after=parse_retry_after(headers))
+            return
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            return
+
+        reset_after = None
+        reset = headers.get("X-RateLimit-Reset")
+        if reset is not None:
+            # bitflyerはリセットされるUNIX時刻を返す
+            reset_after = max(float(reset) - time.time(), 0)
+
+        bucket.observe(remaining=float(remaining), reset_after=reset_after)
+
+
+def parse_retry_after(headers: httpx.Headers) -> float:
+    value = headers.get("Retry-After")
+    if value is None:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(parsed.timestamp() - time.time(), 0)
+
+
+class Coalescer:
+    """同一キーの処理中のリクエストを１つにまとめる。"""
+
+    def __init__(self):
+        self.inflight: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]):
+        # Futureはイベントループに紐づくため、ループ毎に管理する
+        key = (id(asyncio.get_running_loop()), key)
+        future = self.inflight.get(key)
+        if future is None:
+            future = self.inflight[key] = asyncio.ensure_future(factory())
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # 呼び出し元がキャンセルされても、他の呼び出し元のリクエストは継続させる
+        return await asyncio.shield(future)
+
+
+limiter = RateLimiter()
+coalescer = Coalescer()
+
+
+async def send(
+    exchange: str, endpoint: str, method: str, url: str, cost: float = 1, **kwargs
+) -> httpx.Response:
+    bucket = limiter.get(exchange, endpoint)
+    await bucket.acquire(cost)
+    response = await get_client(url).request(method, url, **kwargs)
+    limiter.observe_response(bucket, response)
+    return response
+
+
+async def request(
+    exchange: str,
+    endpoint: str,
+    method: str,
+    url: str,
+    *,
+    cost: float = 1,
+    credential: Hashable = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    流量制御した上でリクエストを送信する。
+    GETリクエストは、同一の取引所・URL・クエリ・credentialのリクエストが処理中であれば、そのレスポンスを共有する。
+    署名のようにリクエスト毎に異なるヘッダはキーに含めないため、認証が必要な場合はcredentialにAPIキーを指定すること。
+    """
+    if method != "GET":
+        return await send(exchange, endpoint, method, url, cost, **kwargs)
+
+    key = (exchange, endpoint, str(httpx.URL(url, params=kwargs.get("params"))))
+    return await coalescer.run(
+        (*key, credential),
+        lambda: send(exchange, endpoint, method, url, cost, **kwargs),
+    )